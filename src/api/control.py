@@ -0,0 +1,130 @@
+import asyncio
+import contextlib
+from typing import Any, Callable, Iterator, Optional
+import uvicorn
+from fastapi import Depends, FastAPI, Header, HTTPException
+from pydantic import BaseModel, Field
+
+from src.domain.value_objects import AnyIPAddress, RefreshOutcome
+from src.infra.loggers.interface import Logger
+from src.services.coalescing import RecordRefreshStatus, RefreshCoordinator
+
+class RefreshRequest(BaseModel):
+    hostname: Optional[str] = Field(default=None, description="Record to refresh. Every managed record when omitted")
+    wait: bool = Field(default=False, description="Answer once the refresh completed, with its outcome")
+
+class IpPush(RefreshRequest):
+    ip: AnyIPAddress = Field(..., description="The new external IPv4 or IPv6 address, e.g. as seen by the router")
+
+class RefreshResponse(BaseModel):
+    hostnames: list[str] = Field(..., description="Records whose refresh was scheduled")
+    outcomes: Optional[dict[str, RefreshOutcome]] = Field(default=None, description="Outcome per record, when waited for")
+
+class StatusResponse(BaseModel):
+    requests: int = Field(..., description="Refresh requests received")
+    refreshes: int = Field(..., description="Refreshes run. Lower than the requests when bursts were coalesced")
+    records: list[RecordRefreshStatus]
+
+def create_control_api(coordinator: RefreshCoordinator, logger: Logger, token: Optional[str] = None, is_leader: Optional[Callable[[], bool]] = None) -> FastAPI:
+    """
+    Local HTTP API letting routers and DHCP hooks trigger a refresh as soon as the WAN address changes.
+
+    - `POST /refresh`: refreshes one record (`hostname`) or all of them, looking the external IP up.
+    - `POST /ip` (or `GET /ip?ip=...` for routers only able to call a URL): refreshes with the IP given, without any lookup.
+      An IPv4 address refreshes the A records, an IPv6 one the AAAA records.
+    - `GET /status`: last outcome of each record and whether a refresh is in flight.
+
+    Refreshes are scheduled in the background and answered with 202, unless `wait` is set. Bursts are
+    coalesced by the `RefreshCoordinator`, so a noisy router cannot multiply the nameserver calls.
+
+    Arguments:
+        token (Optional[str]): When set, every request must carry `Authorization: Bearer <token>`.
+        is_leader (Optional[Callable[[], bool]]): With leader election, refreshes are refused with 503
+            while this replica follows, so the caller retries against the leader.
+    """
+    api = FastAPI(title="LipaDNS control API")
+    background: set[asyncio.Task[Any]] = set()
+
+    def authorize(authorization: Optional[str] = Header(default=None)):
+        if token is not None and authorization != f"Bearer {token}":
+            raise HTTPException(status_code=401, detail="Missing or invalid token")
+
+    async def schedule(request: RefreshRequest, ip: Optional[AnyIPAddress]) -> RefreshResponse:
+        if is_leader is not None and not is_leader():
+            raise HTTPException(status_code=503, detail="This replica is not the leader")
+        hostnames: list[str] = coordinator.domain_names
+        if request.hostname is not None:
+            hostname: Optional[str] = coordinator.resolve(request.hostname)
+            if hostname is None:
+                raise HTTPException(status_code=404, detail=f"{request.hostname} is not managed by LipaDNS")
+            hostnames = [hostname]
+
+        logger.info("Refresh of %s requested through the control API%s", ", ".join(hostnames), f" with IP {ip}" if ip else "")
+        refresh = coordinator.refresh(hostnames, logger, ip=ip)
+        if request.wait:
+            return RefreshResponse(hostnames=hostnames, outcomes=await refresh)
+        task: asyncio.Task[dict[str, RefreshOutcome]] = asyncio.create_task(refresh)
+        # Referenced until done, so the task is not garbage collected midway
+        background.add(task)
+        task.add_done_callback(background.discard)
+        return RefreshResponse(hostnames=hostnames)
+
+    @api.post("/refresh", status_code=202, dependencies=[Depends(authorize)])
+    async def refresh(request: Optional[RefreshRequest] = None) -> RefreshResponse:
+        return await schedule(request or RefreshRequest(), ip=None)
+
+    @api.post("/ip", status_code=202, dependencies=[Depends(authorize)])
+    async def push_ip(push: IpPush) -> RefreshResponse:
+        return await schedule(push, ip=push.ip)
+
+    @api.get("/ip", status_code=202, dependencies=[Depends(authorize)])
+    async def push_ip_from_url(ip: AnyIPAddress, hostname: Optional[str] = None, wait: bool = False) -> RefreshResponse:
+        return await schedule(IpPush(ip=ip, hostname=hostname, wait=wait), ip=ip)
+
+    @api.get("/status", dependencies=[Depends(authorize)])
+    async def status() -> StatusResponse:
+        return StatusResponse(requests=coordinator.requests, refreshes=coordinator.refreshes, records=coordinator.status())
+
+    return api
+
+class _EmbeddedServer(uvicorn.Server):
+    """Leaves the signals to the application it runs in."""
+    @contextlib.contextmanager
+    def capture_signals(self) -> Iterator[None]:
+        yield
+
+    def install_signal_handlers(self):
+        pass
+
+class ControlServer:
+    """Serves the control API from the running event loop, alongside the refresh loop."""
+    _server: _EmbeddedServer
+    _task: Optional[asyncio.Task[None]]
+
+    def __init__(self, api: FastAPI, port: int, host: str = "127.0.0.1"):
+        self._server = _EmbeddedServer(uvicorn.Config(api, host=host, port=port, log_config=None, access_log=False, lifespan="off"))
+        self._task = None
+
+    async def start(self, logger: Logger) -> bool:
+        self._task = asyncio.create_task(self._serve())
+        while not self._server.started and not self._task.done():
+            await asyncio.sleep(0.05)
+        if not self._server.started:
+            logger.error("Could not serve the control API on %s:%s", self._server.config.host, self._server.config.port)
+            return False
+        logger.info("Serving the control API on http://%s:%s", self._server.config.host, self._server.config.port)
+        return True
+
+    async def _serve(self):
+        try:
+            await self._server.serve()
+        except SystemExit:
+            # Uvicorn exits when it cannot bind: the refresh loop must keep running
+            pass
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._server.should_exit = True
+        await self._task
+        self._task = None
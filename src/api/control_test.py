@@ -0,0 +1,44 @@
+import asyncio
+from ipaddress import IPv4Address
+from typing import Any
+import httpx
+
+from src.infra.http import create_async_client
+from src.infra.ip.ipify import AsyncIpify
+from src.infra.nameserver.cloudflare.cloudflare_async import AsyncCloudflareNameserver
+from src.infra.loggers.standard import Logger, StandardLogger, LogLevel
+from src.services.coalescing import RefreshCoordinator
+from src.api.control import create_control_api
+from src.benchmarks.fakes import FakeCloudflareApi, FakeIpify, fake_transport
+
+def test_control_api_pushes_ip_without_lookup():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    cloudflare = FakeCloudflareApi()
+    cloudflare.add_record("home.example.com", "198.51.100.1")
+    cloudflare.add_record("vpn.example.com", "198.51.100.1")
+    ipify = FakeIpify(ip=IPv4Address("198.51.100.7"))
+
+    async def run() -> list[httpx.Response]:
+        async with create_async_client(transport=fake_transport(cloudflare, ipify)) as client:
+            nameserver = AsyncCloudflareNameserver(cloudflare_api_key="key", cloudflare_zone_id=cloudflare.zone_id, client=client)
+            coordinator = RefreshCoordinator(AsyncIpify(client=client), nameserver, ["home.example.com", "vpn.example.com"])
+            api = create_control_api(coordinator, logger, token="secret")
+            headers: dict[str, str] = {"Authorization": "Bearer secret"}
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api), base_url="http://lipadns") as control:
+                return [
+                    await control.post("/refresh"),
+                    await control.post("/ip", json={"ip": "203.0.113.5", "hostname": "HOME.example.com", "wait": True}, headers=headers),
+                    await control.get("/ip", params={"ip": "203.0.113.5", "hostname": "unknown.example.com"}, headers=headers),
+                    await control.get("/status", headers=headers),
+                ]
+
+    unauthorized, pushed, unknown, status = asyncio.run(run())
+
+    assert unauthorized.status_code == 401
+    assert pushed.status_code == 202
+    assert pushed.json()["outcomes"]["home.example.com"]["status"] == "changed"
+    assert unknown.status_code == 404
+    records: dict[str, Any] = {record["name"]: record for record in status.json()["records"]}
+    assert records["home.example.com"]["last_status"] == "changed" and records["vpn.example.com"]["last_status"] is None
+    assert cloudflare.content_of("home.example.com") == "203.0.113.5"
+    assert ipify.calls == 0
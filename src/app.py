@@ -1,59 +1,365 @@
 import os
 import sys
+import socket
+import time
 import asyncio
+import contextlib
+from datetime import datetime
 from dotenv import load_dotenv
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional
 
-from src.infra.ip.interface import ExternalIpInterface
-from src.infra.nameserver.interface import NameserverInterface
-from src.infra.loggers.interface import Logger
-from src.infra.ip.ipify import Ipify
-from src.infra.nameserver.cloudflare.cloudflare import CloudflareNameserver
-from src.infra.loggers.standard import StandardLogger, LogLevel
+from src.domain.value_objects import AnyIPAddress, RecordType, ReconciliationResult, RefreshOutcome, RefreshStatus
 
-from src.services.services import refresh_service
+from src.infra.http import create_async_client, create_network_transport
+from src.infra.resilience import ResilientTransport, deadline
+from src.infra.ratelimit import RateLimitedScheduler
+from src.infra.metrics.instruments import CHANGES_DETECTED, record_tick
+from src.infra.metrics.server import MetricsServer
+from src.infra.nameserver.cache import RecordCache
+from src.infra.ip.interface import AsyncExternalIpInterface
+from src.infra.nameserver.interface import AsyncNameserverInterface
+from src.infra.loggers.interface import Logger, LogLevel
+from src.infra.ip.quorum import QuorumIpResolver
+from src.infra.nameserver.fanout import FanOutNameserver
+from src.infra.providers import PROVIDERS, ProviderUnavailableError
+from src.infra.watchers.interface import ChangeWatcher
+from src.infra.watchers.netlink import NetlinkAddressWatcher
+from src.infra.state.interface import StateStore
+from src.infra.state.sqlite import SqliteStateStore
+from src.infra.lease.interface import LeaseBackend
 
-async def refresh_service_task(external_ip_service: ExternalIpInterface, nameserver: NameserverInterface, domain_name: str, refresh_rate: int, logger: Logger):
+from src.services.coalescing import RefreshCoordinator
+from src.services.dampening import WriteDampener
+from src.services.leadership import LeaderElector, run_as_leader
+from src.services.services import async_refresh_service, async_reconcile_service, reconciliation_outcome
+from src.services.scheduler import RefreshScheduler, ScheduleDecision
+
+if TYPE_CHECKING:
+    from src.api.control import ControlServer
+
+async def wait_next_refresh(delay: float, watcher: Optional[ChangeWatcher]):
+    """
+    Waits `delay` seconds, or less if the watcher reports a change first.
+    """
+    if watcher is None:
+        await asyncio.sleep(delay)
+        return
+    if await watcher.wait_for_change(timeout=delay):
+        CHANGES_DETECTED.inc("watcher")
+
+async def scheduled_task(run: Callable[[], Awaitable[RefreshOutcome]], scheduler: RefreshScheduler, logger: Logger, watcher: Optional[ChangeWatcher] = None,
+                         tick_deadline: Optional[float] = None):
     """
-    Runs the DNS synchronization task asynchronously, refreshing at the specified interval.
+    Runs `run` forever, waiting between runs as long as the scheduler decides, or until the watcher (if any) reports a change.
+    The provider calls of each run share `tick_deadline` seconds, if set.
     """
+    decision: ScheduleDecision = scheduler.initial_delay()
+    await wait_next_refresh(decision.delay, watcher)
     while True:
-        refresh_service(external_ip_service, nameserver, domain_name, logger)
-        await asyncio.sleep(refresh_rate)
+        started: float = time.perf_counter()
+        try:
+            with deadline(tick_deadline):
+                outcome: RefreshOutcome = await run()
+        except Exception as e:
+            logger.error("Unexpected error during the refresh: %r", e)
+            outcome = RefreshOutcome(status=RefreshStatus.FAILED)
+        record_tick(outcome.status, time.perf_counter() - started)
+        decision = scheduler.next_run(outcome)
+        logger.info("Refresh %s. Next refresh in %.1fs at %s (%s)", outcome.status.value, decision.delay, datetime.fromtimestamp(decision.run_at).strftime("%H:%M:%S"), decision.reason)
+        await wait_next_refresh(decision.delay, watcher)
+
+async def refresh_service_task(external_ip_service: AsyncExternalIpInterface, nameserver: AsyncNameserverInterface, domain_name: str, refresh_rate: int, logger: Logger, watcher: Optional[ChangeWatcher] = None, scheduler: Optional[RefreshScheduler] = None, state: Optional[StateStore] = None,
+                               dampener: Optional[WriteDampener] = None, tick_deadline: Optional[float] = None, ipv6_service: Optional[AsyncExternalIpInterface] = None):
+    """
+    Runs the DNS synchronization task asynchronously. The scheduler adapts the interval around
+    `refresh_rate`, and the watcher (if any) triggers a refresh as soon as it reports a change.
+    The AAAA record is refreshed alongside the A record when `ipv6_service` is set.
+    """
+    await scheduled_task(run=lambda: async_refresh_service(external_ip_service, nameserver, domain_name, logger, state, dampener, ipv6_service),
+                         scheduler=scheduler if scheduler is not None else RefreshScheduler(interval=refresh_rate),
+                         logger=logger,
+                         watcher=watcher,
+                         tick_deadline=tick_deadline)
+
+async def reconcile_service_task(external_ip_service: AsyncExternalIpInterface, nameserver: AsyncNameserverInterface, domain_names: list[str], refresh_rate: int, logger: Logger, watcher: Optional[ChangeWatcher] = None, scheduler: Optional[RefreshScheduler] = None, state: Optional[StateStore] = None,
+                                 dampener: Optional[WriteDampener] = None, tick_deadline: Optional[float] = None, ipv6_service: Optional[AsyncExternalIpInterface] = None):
+    """
+    Runs the zone-wide reconciliation asynchronously. The scheduler adapts the interval around
+    `refresh_rate`, and the watcher (if any) triggers a refresh as soon as it reports a change.
+    The AAAA records are reconciled alongside the A records when `ipv6_service` is set.
+    """
+    async def run() -> RefreshOutcome:
+        result: Optional[ReconciliationResult] = await async_reconcile_service(external_ip_service, nameserver, domain_names, logger, state, dampener, ipv6_service)
+        return reconciliation_outcome(result, nameserver, dampener)
+
+    await scheduled_task(run=run,
+                         scheduler=scheduler if scheduler is not None else RefreshScheduler(interval=refresh_rate),
+                         logger=logger,
+                         watcher=watcher,
+                         tick_deadline=tick_deadline)
+
+def resume_external_ips(state: StateStore, dampeners: list[WriteDampener], logger: Logger):
+    """
+    Hands the external IPs saved before the restart to the dampeners, so the time they were already
+    observed counts towards `DAMPEN_MIN_STABLE` instead of starting over.
+    """
+    for record_type in RecordType:
+        last_external_ip: Optional[tuple[AnyIPAddress, float]] = state.last_external_ip(record_type)
+        if last_external_ip is None:
+            continue
+        ip, observed_at = last_external_ip
+        logger.info("Resuming. Last external %s address: %s, observed since %s", record_type.value, ip, datetime.fromtimestamp(observed_at).strftime("%Y-%m-%d %H:%M:%S"))
+        for dampener in dampeners:
+            dampener.resume(ip, observed_for=time.time() - observed_at)
+
+def create_ip_service(names: list[str], quorum: int, logger: Logger, **arguments: Any) -> Optional[AsyncExternalIpInterface]:
+    """
+    The external IP service built from the IP sources of names. Several sources are combined by a
+    `QuorumIpResolver`, leaving out the ones that are unavailable.
+
+    Returns:
+        Optional[AsyncExternalIpInterface]: None if none of the sources is available.
+    """
+    sources: dict[str, AsyncExternalIpInterface] = {}
+    for name in names:
+        source: Optional[AsyncExternalIpInterface] = PROVIDERS.create("ip", name, logger, **arguments)
+        if source is not None:
+            sources[name] = source
+    if not sources:
+        return None
+    if len(names) == 1:
+        return sources[names[0]]
+    return QuorumIpResolver(sources=sources, quorum=quorum)
 
 async def main():
     """
     Initialize dependencies
     """
     load_dotenv()
-    logger = StandardLogger(log_level=LogLevel.INFO)
+    try:
+        # Records are written by a background thread, so a slow disk or stdout never delays a refresh
+        logger: Logger = PROVIDERS.load("logger", os.getenv("LOGGER", "standard").lower())(log_level=LogLevel.INFO, queued=True,
+                                                                                         json_lines=os.getenv("LOG_FORMAT", "text").lower() == "json")
+    except ProviderUnavailableError as e:
+        sys.exit(str(e))
     
     DOMAIN_NAME: Optional[str] = os.getenv("DOMAIN_NAME")
+    DOMAIN_NAMES: list[str] = [name.strip() for name in os.getenv("DOMAIN_NAMES", "").split(",") if name.strip()]
+    NAMESERVERS: list[str] = [name.strip().lower() for name in os.getenv("NAMESERVER", "cloudflare").split(",") if name.strip()]
+    NAMESERVER_TIMEOUT: float = float(os.getenv("NAMESERVER_TIMEOUT", "60"))
     CLOUDFLARE_API_TOKEN: Optional[str] = os.getenv("CLOUDFLARE_API_TOKEN")
     CLOUDFLARE_ZONE_ID: Optional[str] = os.getenv("CLOUDFLARE_ZONE_ID")
     REFRESH_RATE: Optional[int] = int(os.getenv("REFRESH_RATE", "0"))
+    RECORD_CACHE_TTL: int = int(os.getenv("RECORD_CACHE_TTL", "0"))
+    IP_QUORUM: int = int(os.getenv("IP_QUORUM", "0"))
+    IP_SOURCES: list[str] = [name.strip().lower() for name in os.getenv("IP_SOURCES", "ipify,icanhazip,amazon,opendns" if IP_QUORUM > 0 else "ipify").split(",") if name.strip()]
+    IPV6: bool = os.getenv("IPV6", "false").lower() in ("1", "true", "yes")
+    IPV6_SOURCES: list[str] = [name.strip().lower() for name in os.getenv("IPV6_SOURCES", "ipify6,icanhazip6,opendns6" if IP_QUORUM > 0 else "ipify6").split(",") if name.strip()]
+    NETLINK_WATCH: bool = os.getenv("NETLINK_WATCH", "false").lower() in ("1", "true", "yes")
+    NETLINK_INTERFACE: Optional[str] = os.getenv("NETLINK_INTERFACE") or None
+    IDLE_REFRESH_RATE: Optional[int] = int(os.getenv("IDLE_REFRESH_RATE", "0")) or None
+    MAX_BACKOFF: int = int(os.getenv("MAX_BACKOFF", "900"))
+    CLOUDFLARE_RATE_LIMIT: int = int(os.getenv("CLOUDFLARE_RATE_LIMIT", "1200"))
+    STATE_PATH: Optional[str] = os.getenv("STATE_PATH") or None
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "0"))
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "127.0.0.1")
+    CONTROL_PORT: int = int(os.getenv("CONTROL_PORT", "0"))
+    CONTROL_HOST: str = os.getenv("CONTROL_HOST", "127.0.0.1")
+    CONTROL_TOKEN: Optional[str] = os.getenv("CONTROL_TOKEN") or None
+    DAMPEN_MIN_STABLE: float = float(os.getenv("DAMPEN_MIN_STABLE", "0"))
+    DAMPEN_WINDOW: float = float(os.getenv("DAMPEN_WINDOW", "0"))
+    DAMPEN_MAX_WRITES_PER_HOUR: int = int(os.getenv("DAMPEN_MAX_WRITES_PER_HOUR", "0"))
+    TICK_DEADLINE: float = float(os.getenv("TICK_DEADLINE", "30"))
+    CIRCUIT_FAILURES: int = int(os.getenv("CIRCUIT_FAILURES", "5"))
+    CIRCUIT_RESET: float = float(os.getenv("CIRCUIT_RESET", "30"))
+    HEDGE_QUANTILE: float = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+    LEASE_BACKEND: Optional[str] = (os.getenv("LEASE_BACKEND") or "").lower() or None
+    LEASE_PATH: Optional[str] = os.getenv("LEASE_PATH") or None
+    LEASE_DURATION: float = float(os.getenv("LEASE_DURATION", "15"))
+    LEASE_HOLDER: str = os.getenv("LEASE_HOLDER") or f"{socket.gethostname()}-{os.getpid()}"
+    RFC2136_ZONE: Optional[str] = os.getenv("RFC2136_ZONE") or None
+    RFC2136_SERVER: Optional[str] = os.getenv("RFC2136_SERVER") or None
+    RFC2136_PORT: int = int(os.getenv("RFC2136_PORT", "53"))
+    RFC2136_TSIG_KEY_NAME: Optional[str] = os.getenv("RFC2136_TSIG_KEY_NAME") or None
+    RFC2136_TSIG_SECRET: Optional[str] = os.getenv("RFC2136_TSIG_SECRET") or None
+    RFC2136_TSIG_ALGORITHM: str = os.getenv("RFC2136_TSIG_ALGORITHM", "hmac-sha256")
+    RFC2136_TTL: int = int(os.getenv("RFC2136_TTL", "300"))
     try:
-        if CLOUDFLARE_API_TOKEN is None:
+        if not NAMESERVERS or any(name not in PROVIDERS.names("nameserver") for name in NAMESERVERS):
+            raise ValueError(f"Environment variable 'NAMESERVER' must list some of: {', '.join(PROVIDERS.names('nameserver'))}")
+        if not IP_SOURCES or any(name not in PROVIDERS.names("ip") for name in IP_SOURCES + IPV6_SOURCES):
+            raise ValueError(f"Environment variables 'IP_SOURCES' and 'IPV6_SOURCES' must list some of: {', '.join(PROVIDERS.names('ip'))}")
+        if "cloudflare" in NAMESERVERS and CLOUDFLARE_API_TOKEN is None:
             raise ValueError("Environment variable 'CLOUDFLARE_API_TOKEN' cannot be None")
-        if CLOUDFLARE_ZONE_ID is None:
+        if "cloudflare" in NAMESERVERS and CLOUDFLARE_ZONE_ID is None:
             raise ValueError("Environment variable 'CLOUDFLARE_ZONE_ID' cannot be None")
-        if DOMAIN_NAME is None:
-            raise ValueError("Environment variable 'DOMAIN_NAME' cannot be None")
+        if "rfc2136" in NAMESERVERS and (RFC2136_ZONE is None or RFC2136_SERVER is None):
+            raise ValueError("Environment variables 'RFC2136_ZONE' and 'RFC2136_SERVER' cannot be None")
+        if (RFC2136_TSIG_KEY_NAME is None) != (RFC2136_TSIG_SECRET is None):
+            raise ValueError("Environment variables 'RFC2136_TSIG_KEY_NAME' and 'RFC2136_TSIG_SECRET' must be set together")
+        if DOMAIN_NAME is None and not DOMAIN_NAMES:
+            raise ValueError("Either environment variable 'DOMAIN_NAME' or 'DOMAIN_NAMES' must be set")
         if REFRESH_RATE == 0:
             raise ValueError("Environment variable 'REFRESH_RATE' cannot be 0")
+        if CLOUDFLARE_RATE_LIMIT <= 0:
+            raise ValueError("Environment variable 'CLOUDFLARE_RATE_LIMIT' must be positive")
+        if TICK_DEADLINE < 0 or CIRCUIT_FAILURES < 0 or CIRCUIT_RESET < 0:
+            raise ValueError("Environment variables 'TICK_DEADLINE', 'CIRCUIT_FAILURES' and 'CIRCUIT_RESET' cannot be negative")
+        if not 0 <= HEDGE_QUANTILE < 1:
+            raise ValueError("Environment variable 'HEDGE_QUANTILE' must be between 0 and 1")
+        if LEASE_BACKEND is not None and LEASE_BACKEND not in PROVIDERS.names("lease"):
+            raise ValueError(f"Environment variable 'LEASE_BACKEND' must be one of: {', '.join(PROVIDERS.names('lease'))}")
+        if LEASE_BACKEND is not None and LEASE_PATH is None:
+            raise ValueError("Environment variable 'LEASE_PATH' cannot be None when 'LEASE_BACKEND' is set")
+        if LEASE_DURATION <= 0:
+            raise ValueError("Environment variable 'LEASE_DURATION' must be positive")
+        if DAMPEN_MIN_STABLE < 0 or DAMPEN_WINDOW < 0 or DAMPEN_MAX_WRITES_PER_HOUR < 0:
+            raise ValueError("Environment variables 'DAMPEN_MIN_STABLE', 'DAMPEN_WINDOW' and 'DAMPEN_MAX_WRITES_PER_HOUR' cannot be negative")
     except ValueError as e:
-        logger.critical(f"{e}")
+        logger.critical("%s", e)
+        logger.close()
         sys.exit(1)
 
-    ip_service = Ipify()
-    nameserver = CloudflareNameserver(cloudflare_api_key=CLOUDFLARE_API_TOKEN, 
-                                      cloudflare_zone_id=CLOUDFLARE_ZONE_ID)
-    
-    await refresh_service_task(external_ip_service=ip_service,
-                               nameserver=nameserver,
-                               domain_name=DOMAIN_NAME,
-                               refresh_rate=REFRESH_RATE,
-                               logger=logger)
+    state: Optional[StateStore] = None
+    if STATE_PATH is not None:
+        state = SqliteStateStore(STATE_PATH)
+        if RECORD_CACHE_TTL <= 0:
+            logger.warning("'STATE_PATH' is set but 'RECORD_CACHE_TTL' is not: DNS Records will not be persisted")
+
+    # A single pooled client for the whole process: connections to every provider are kept alive between ticks
+    transport = ResilientTransport(create_network_transport(), failure_threshold=CIRCUIT_FAILURES, reset_timeout=CIRCUIT_RESET, hedge_quantile=HEDGE_QUANTILE)
+    async with create_async_client(transport=transport) as client:
+        ip_service: Optional[AsyncExternalIpInterface] = create_ip_service(IP_SOURCES, IP_QUORUM, logger, client=client)
+        ipv6_service: Optional[AsyncExternalIpInterface] = None
+        if IPV6:
+            # Dual-stack: the AAAA records follow the IPv6 address, looked up alongside the IPv4 one
+            ipv6_service = create_ip_service(IPV6_SOURCES, IP_QUORUM, logger, client=client)
+        # Only the selected providers are imported, so their optional dependencies are only needed when selected
+        nameserver_arguments: dict[str, dict[str, Any]] = {
+            "cloudflare": {
+                "cloudflare_api_key": CLOUDFLARE_API_TOKEN,
+                "cloudflare_zone_id": CLOUDFLARE_ZONE_ID,
+                "client": client,
+                "cache": RecordCache(ttl=RECORD_CACHE_TTL, store=state) if RECORD_CACHE_TTL > 0 else None,
+                # Cloudflare's budget is per API token: every nameserver using the token must share this limiter
+                "rate_limiter": RateLimitedScheduler(budget=CLOUDFLARE_RATE_LIMIT, window=300)
+            },
+            "rfc2136": {
+                "zone": RFC2136_ZONE,
+                "server": RFC2136_SERVER,
+                "port": RFC2136_PORT,
+                "tsig_key_name": RFC2136_TSIG_KEY_NAME,
+                "tsig_secret": RFC2136_TSIG_SECRET,
+                "tsig_algorithm": RFC2136_TSIG_ALGORITHM,
+                "ttl": RFC2136_TTL
+            }
+        }
+        providers: dict[str, Optional[AsyncNameserverInterface]] = {name: PROVIDERS.create("nameserver", name, logger, **nameserver_arguments.get(name, {}))
+                                                                    for name in NAMESERVERS}
+        if ip_service is None or (IPV6 and ipv6_service is None) or None in providers.values():
+            logger.critical("Some of the selected providers are unavailable")
+            if state is not None:
+                state.close()
+            logger.close()
+            sys.exit(1)
+        nameserver: AsyncNameserverInterface = next(iter(providers.values())) # type: ignore
+        if len(providers) > 1:
+            # Every provider is reconciled concurrently from the same external IP
+            nameserver = FanOutNameserver(providers, timeout=NAMESERVER_TIMEOUT) # type: ignore
+            if not DOMAIN_NAMES:
+                DOMAIN_NAMES = [DOMAIN_NAME] # type: ignore
+
+        watcher: Optional[ChangeWatcher] = None
+        if NETLINK_WATCH:
+            watcher = NetlinkAddressWatcher(interface=NETLINK_INTERFACE)
+            if not watcher.start(logger):
+                watcher = None
+
+        metrics_server: Optional[MetricsServer] = None
+        if METRICS_PORT > 0:
+            metrics_server = MetricsServer(port=METRICS_PORT, host=METRICS_HOST)
+            if not await metrics_server.start(logger):
+                metrics_server = None
+
+        dampener: Optional[WriteDampener] = None
+        if DAMPEN_MIN_STABLE > 0 or DAMPEN_WINDOW > 0 or DAMPEN_MAX_WRITES_PER_HOUR > 0:
+            dampener = WriteDampener(min_stable=DAMPEN_MIN_STABLE, window=DAMPEN_WINDOW, max_writes_per_hour=DAMPEN_MAX_WRITES_PER_HOUR)
+        if state is not None:
+            resume_external_ips(state, [dampener] if dampener is not None else [], logger)
+
+        elector: Optional[LeaderElector] = None
+        lease_backend: Optional[LeaseBackend] = None
+        if LEASE_BACKEND is not None:
+            lease_backend = PROVIDERS.create("lease", LEASE_BACKEND, logger, path=LEASE_PATH)
+            elector = LeaderElector(lease_backend, holder=LEASE_HOLDER, lease_duration=LEASE_DURATION) # type: ignore
+
+        control_server: Optional["ControlServer"] = None
+        if CONTROL_PORT > 0:
+            try:
+                # FastAPI and uvicorn are only imported when the control API is served
+                from src.api.control import ControlServer, create_control_api
+            except ImportError as e:
+                logger.error("The control API is missing a dependency: %s. Install it with `pip install -r requirements-control.txt`", e)
+            else:
+                coordinator = RefreshCoordinator(ip_service, nameserver, DOMAIN_NAMES or [DOMAIN_NAME], state, dampener, ipv6_service) # type: ignore
+                control_server = ControlServer(create_control_api(coordinator, logger, token=CONTROL_TOKEN, is_leader=(lambda: elector.is_leader) if elector is not None else None),
+                                               port=CONTROL_PORT, host=CONTROL_HOST)
+                if not await control_server.start(logger):
+                    control_server = None
+
+        scheduler = RefreshScheduler(interval=REFRESH_RATE, idle_interval=IDLE_REFRESH_RATE, max_backoff=MAX_BACKOFF)
+
+        async def refresh_loop():
+            if DOMAIN_NAMES:
+                await reconcile_service_task(external_ip_service=ip_service,
+                                             nameserver=nameserver,
+                                             domain_names=DOMAIN_NAMES,
+                                             refresh_rate=REFRESH_RATE,
+                                             logger=logger,
+                                             watcher=watcher,
+                                             scheduler=scheduler,
+                                             state=state,
+                                             dampener=dampener,
+                                             tick_deadline=TICK_DEADLINE,
+                                             ipv6_service=ipv6_service)
+                return
+
+            await refresh_service_task(external_ip_service=ip_service,
+                                       nameserver=nameserver,
+                                       domain_name=DOMAIN_NAME,
+                                       refresh_rate=REFRESH_RATE,
+                                       logger=logger,
+                                       watcher=watcher,
+                                       scheduler=scheduler,
+                                       state=state,
+                                       dampener=dampener,
+                                       tick_deadline=TICK_DEADLINE,
+                                       ipv6_service=ipv6_service)
+
+        election: Optional[asyncio.Task[None]] = None
+        try:
+            if elector is None:
+                await refresh_loop()
+                return
+            # Only the replica holding the lease polls and writes; the others wait to take it over
+            election = asyncio.create_task(elector.run(logger))
+            await run_as_leader(elector, refresh_loop, logger)
+        finally:
+            if election is not None:
+                election.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await election
+            if lease_backend is not None:
+                lease_backend.close()
+            if watcher is not None:
+                watcher.stop()
+            if metrics_server is not None:
+                await metrics_server.stop()
+            if control_server is not None:
+                await control_server.stop()
+            if state is not None:
+                state.close()
+            logger.close()
 
 if __name__ == '__main__':
     asyncio.run(main())
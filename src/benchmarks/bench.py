@@ -0,0 +1,161 @@
+"""
+Measures the cost of a refresh tick against local stand-ins of Cloudflare and Ipify, without any network access.
+
+    python -m src.benchmarks.bench --records 1 100 10000 --ticks 50 --latency 0.02
+
+For each zone size and mode, reports the p50/p99 latency of a tick, the calls it made to Cloudflare and to
+the IP source, the CPU time it used and the peak memory it allocated. Every `--change-every` ticks the external IP
+changes, so both steady-state ticks and ticks that write are part of the figures.
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from ipaddress import IPv4Address
+from typing import Awaitable, Callable, Optional
+
+from src.infra.http import create_async_client
+from src.infra.ip.ipify import AsyncIpify
+from src.infra.loggers.standard import Logger, LogLevel, StandardLogger
+from src.infra.nameserver.cache import RecordCache
+from src.infra.nameserver.cloudflare.cloudflare_async import AsyncCloudflareNameserver
+from src.services.services import async_refresh_service, async_reconcile_service
+
+from src.benchmarks.fakes import FakeCloudflareApi, FakeIpify, fake_transport
+
+MODES: tuple[str, ...] = ("refresh", "reconcile")
+"""refresh: one `async_refresh_service` per record, run concurrently. reconcile: one `async_reconcile_service` for the whole zone."""
+
+class TickStats:
+    __slots__ = ("latency", "cloudflare_calls", "ip_calls", "cpu", "peak_memory")
+
+    def __init__(self, latency: float, cloudflare_calls: int, ip_calls: int, cpu: float, peak_memory: int):
+        self.latency = latency
+        self.cloudflare_calls = cloudflare_calls
+        self.ip_calls = ip_calls
+        self.cpu = cpu
+        self.peak_memory = peak_memory
+
+    @property
+    def api_calls(self) -> int:
+        return self.cloudflare_calls + self.ip_calls
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile."""
+    ordered: list[float] = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(fraction * len(ordered) + 0.5) - 1))]
+
+def summarize(mode: str, records: int, ticks: list[TickStats]) -> dict[str, float | int | str]:
+    return {
+        "mode": mode,
+        "records": records,
+        "ticks": len(ticks),
+        "p50_ms": percentile([tick.latency for tick in ticks], 0.5) * 1000,
+        "p99_ms": percentile([tick.latency for tick in ticks], 0.99) * 1000,
+        "cloudflare_calls_per_tick": sum(tick.cloudflare_calls for tick in ticks) / len(ticks),
+        "ip_calls_per_tick": sum(tick.ip_calls for tick in ticks) / len(ticks),
+        "calls_per_tick": sum(tick.api_calls for tick in ticks) / len(ticks),
+        "max_calls_per_tick": max(tick.api_calls for tick in ticks),
+        "cpu_ms_per_tick": sum(tick.cpu for tick in ticks) / len(ticks) * 1000,
+        "peak_kib_per_tick": max(tick.peak_memory for tick in ticks) / 1024,
+    }
+
+async def run_benchmark(mode: str, records: int, ticks: int, latency: float, change_every: int, cache_ttl: float,
+                        rate_limit_every: int, logger: Logger) -> dict[str, float | int | str]:
+    cloudflare = FakeCloudflareApi(latency=latency)
+    ipify = FakeIpify(ip=IPv4Address("198.51.100.1"), latency=latency)
+    domain_names: list[str] = [f"host-{index}.example.com" for index in range(records)]
+    for domain_name in domain_names:
+        cloudflare.add_record(domain_name, ipify.ip)
+
+    async with create_async_client(transport=fake_transport(cloudflare, ipify)) as client:
+        nameserver = AsyncCloudflareNameserver(cloudflare_api_key="benchmark", cloudflare_zone_id=cloudflare.zone_id, client=client,
+                                               cache=RecordCache(ttl=cache_ttl) if cache_ttl > 0 else None)
+        ip_service = AsyncIpify(client=client)
+
+        async def tick():
+            if mode == "refresh":
+                await asyncio.gather(*(async_refresh_service(ip_service, nameserver, domain_name, logger) for domain_name in domain_names))
+            else:
+                await async_reconcile_service(ip_service, nameserver, domain_names, logger)
+
+        async def measure(index: int, trace_memory: bool) -> TickStats:
+            if change_every > 0 and index > 0 and index % change_every == 0:
+                ipify.ip = IPv4Address(int(ipify.ip) + 1)
+            if rate_limit_every > 0 and index > 0 and index % rate_limit_every == 0:
+                cloudflare.inject_rate_limit()
+            return await measure_tick(tick, cloudflare, ipify, trace_memory)
+
+        # Warm-up: connections and caches in the state a long-running process would have them
+        await tick()
+        timed: list[TickStats] = [await measure(index, trace_memory=False) for index in range(ticks)]
+        # tracemalloc slows allocations down a lot, so memory is measured in separate ticks
+        traced: list[TickStats] = [await measure(ticks + index, trace_memory=True) for index in range(min(ticks, 5))]
+
+    summary: dict[str, float | int | str] = summarize(mode, records, timed)
+    summary["peak_kib_per_tick"] = max(tick.peak_memory for tick in traced) / 1024 if traced else 0
+    for domain_name in domain_names:
+        if cloudflare.content_of(domain_name) != str(ipify.ip):
+            logger.warning("%s does not point to %s at the end of the run", domain_name, ipify.ip)
+    return summary
+
+async def measure_tick(tick: Callable[[], Awaitable[None]], cloudflare: FakeCloudflareApi, ipify: FakeIpify,
+                       trace_memory: bool) -> TickStats:
+    cloudflare_calls_before: int = sum(cloudflare.calls.values())
+    ip_calls_before: int = ipify.calls
+    if trace_memory:
+        tracemalloc.start()
+    cpu_before: float = time.process_time()
+    started: float = time.perf_counter()
+    await tick()
+    latency: float = time.perf_counter() - started
+    cpu: float = time.process_time() - cpu_before
+    peak_memory: int = 0
+    if trace_memory:
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return TickStats(latency=latency, cloudflare_calls=sum(cloudflare.calls.values()) - cloudflare_calls_before,
+                     ip_calls=ipify.calls - ip_calls_before, cpu=cpu, peak_memory=peak_memory)
+
+def print_table(summaries: list[dict[str, float | int | str]]):
+    columns: list[str] = ["mode", "records", "ticks", "p50_ms", "p99_ms", "cloudflare_calls_per_tick", "ip_calls_per_tick", "calls_per_tick",
+                          "max_calls_per_tick", "cpu_ms_per_tick", "peak_kib_per_tick"]
+    rows: list[list[str]] = [[f"{summary[column]:.2f}" if isinstance(summary[column], float) else str(summary[column]) for column in columns]
+                             for summary in summaries]
+    widths: list[int] = [max(len(column), *(len(row[index]) for row in rows)) for index, column in enumerate(columns)]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, nargs="+", default=[1, 100, 10000], help="Zone sizes to benchmark")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES), help="Services to drive")
+    parser.add_argument("--ticks", type=int, default=30, help="Measured ticks per benchmark")
+    parser.add_argument("--latency", type=float, default=0, help="Seconds each stand-in response is delayed by")
+    parser.add_argument("--change-every", type=int, default=10, help="Change the external IP every N ticks (0: never)")
+    parser.add_argument("--cache-ttl", type=float, default=0, help="TTL of the record cache (0: no cache)")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer 429 to the first request of every N-th tick (0: never)")
+    parser.add_argument("--max-refresh-records", type=int, default=1000, help="Skip the refresh mode above this many records, as it makes one lookup per record")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per benchmark instead of a table")
+    arguments = parser.parse_args(argv)
+
+    logger: Logger = StandardLogger(LogLevel.CRITICAL)
+    summaries: list[dict[str, float | int | str]] = []
+    for records in arguments.records:
+        for mode in arguments.modes:
+            if mode == "refresh" and records > arguments.max_refresh_records:
+                continue
+            summary = asyncio.run(run_benchmark(mode=mode, records=records, ticks=arguments.ticks, latency=arguments.latency,
+                                                change_every=arguments.change_every, cache_ttl=arguments.cache_ttl,
+                                                rate_limit_every=arguments.rate_limit_every, logger=logger))
+            summaries.append(summary)
+            if arguments.json:
+                print(json.dumps(summary))
+
+    if not arguments.json:
+        print_table(summaries)
+
+if __name__ == "__main__":
+    main()
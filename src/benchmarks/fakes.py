@@ -0,0 +1,310 @@
+import asyncio
+import itertools
+import json
+import re
+from collections import Counter
+from ipaddress import IPv4Address, IPv6Address
+from typing import Any, Optional
+import dns.exception
+import dns.flags
+import dns.message
+import dns.name
+import dns.opcode
+import dns.rcode
+import dns.rdataclass
+import dns.rdatatype
+import dns.rrset
+import dns.tsig
+import dns.tsigkeyring
+import httpx
+
+CLOUDFLARE_HOST: str = "api.cloudflare.com"
+IPIFY_HOST: str = "api.ipify.org"
+IPIFY6_HOST: str = "api6.ipify.org"
+
+RECORDS_PATH = re.compile(r"^/client/v4/zones/(?P<zone>[^/]+)/dns_records(?:/(?P<record>[^/]+))?$")
+
+class FakeCloudflareApi:
+    """
+    In-memory stand-in for the DNS records endpoints of the Cloudflare API, served through an httpx transport.
+
+    Supports listing (filters and pagination), creation, update and batches, like the real API. Every
+    response can be delayed by `latency` seconds, and `inject_rate_limit` makes the next requests answer 429.
+    Requests are counted per endpoint in `calls`.
+
+    Arguments:
+        zone_id (str): The only zone served. Requests for any other zone answer 404.
+        latency (float): Seconds each response is delayed by, to simulate the network round trip.
+        max_per_page (int): Largest page size honoured when listing.
+    """
+    host: str = CLOUDFLARE_HOST
+    zone_id: str
+    latency: float
+    max_per_page: int
+    records: dict[str, dict[str, Any]]
+    calls: Counter[str]
+    _ids: itertools.count
+    _rate_limited_requests: int
+    _retry_after: float
+
+    def __init__(self, zone_id: str = "zone", latency: float = 0, max_per_page: int = 5000):
+        self.zone_id = zone_id
+        self.latency = latency
+        self.max_per_page = max_per_page
+        self.records = {}
+        self.calls = Counter()
+        self._ids = itertools.count(1)
+        self._rate_limited_requests = 0
+        self._retry_after = 1
+
+    def add_record(self, name: str, content: IPv4Address | IPv6Address | str, type: str = "A") -> str:
+        record_id: str = f"{next(self._ids):032x}"
+        self.records[record_id] = {"id": record_id, "name": name, "type": type, "content": str(content), "proxied": True}
+        return record_id
+
+    def inject_rate_limit(self, requests: int = 1, retry_after: float = 1):
+        """Answers the next `requests` requests with 429 Too Many Requests."""
+        self._rate_limited_requests = requests
+        self._retry_after = retry_after
+
+    def content_of(self, name: str, type: str = "A") -> Optional[str]:
+        for record in self.records.values():
+            if record["name"] == name and record["type"] == type:
+                return record["content"]
+        return None
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+
+        match = RECORDS_PATH.match(request.url.path)
+        if match is None or match["zone"] != self.zone_id:
+            self.calls["unknown"] += 1
+            return _error(404, 7003, "Could not route to the requested path")
+
+        endpoint: str = f"{request.method} {'batch' if match['record'] == 'batch' else 'record' if match['record'] else 'records'}"
+        self.calls[endpoint] += 1
+        if self._rate_limited_requests > 0:
+            self._rate_limited_requests -= 1
+            return httpx.Response(429, headers={"Retry-After": f"{self._retry_after:g}"}, json=_envelope(None, success=False))
+
+        match endpoint:
+            case "GET records":
+                return self._list(request)
+            case "POST records":
+                return httpx.Response(200, json=_envelope(self._create(json.loads(request.content))))
+            case "PATCH record":
+                updated: Optional[dict[str, Any]] = self._update(match["record"], json.loads(request.content))
+                return httpx.Response(200, json=_envelope(updated)) if updated is not None else _error(404, 81044, "Record not found")
+            case "POST batch":
+                return self._batch(json.loads(request.content))
+            case _:
+                return _error(405, 10000, "Method not allowed")
+
+    def _list(self, request: httpx.Request) -> httpx.Response:
+        filters: dict[str, str] = {field: request.url.params[field] for field in ("name", "type", "content") if field in request.url.params}
+        matching: list[dict[str, Any]] = [record for record in self.records.values()
+                                          if all(record[field] == value for field, value in filters.items())]
+        page: int = int(request.url.params.get("page", "1"))
+        per_page: int = min(int(request.url.params.get("per_page", "100")), self.max_per_page)
+        result: list[dict[str, Any]] = matching[(page - 1) * per_page:page * per_page]
+        return httpx.Response(200, json={
+            **_envelope(result),
+            "result_info": {"count": len(result), "page": page, "per_page": per_page,
+                            "total_count": len(matching), "total_pages": -(-len(matching) // per_page)}
+        })
+
+    def _create(self, body: dict[str, Any]) -> dict[str, Any]:
+        record_id: str = self.add_record(body["name"], body["content"], body.get("type", "A"))
+        return self.records[record_id]
+
+    def _update(self, record_id: str, body: dict[str, Any]) -> Optional[dict[str, Any]]:
+        record: Optional[dict[str, Any]] = self.records.get(record_id)
+        if record is None:
+            return None
+        record.update({field: body[field] for field in ("name", "type", "content", "proxied") if field in body})
+        return record
+
+    def _batch(self, body: dict[str, Any]) -> httpx.Response:
+        # Like the real endpoint, the batch is applied atomically: validated first, then written
+        patches: list[dict[str, Any]] = body.get("patches", [])
+        if any(patch.get("id") not in self.records for patch in patches):
+            return _error(400, 81044, "Record not found")
+        posted: list[dict[str, Any]] = [self._create(post) for post in body.get("posts", [])]
+        patched: list[dict[str, Any]] = [self._update(patch["id"], patch) for patch in patches] # type: ignore
+        return httpx.Response(200, json=_envelope({"deletes": [], "patches": patched, "puts": [], "posts": posted}))
+
+class FakeIpify:
+    """Stand-in for api.ipify.org (or api6.ipify.org with `host=IPIFY6_HOST`), answering `ip` as plain text."""
+    host: str
+    ip: IPv4Address | IPv6Address
+    latency: float
+    calls: int
+
+    def __init__(self, ip: IPv4Address | IPv6Address, latency: float = 0, host: str = IPIFY_HOST):
+        self.host = host
+        self.ip = ip
+        self.latency = latency
+        self.calls = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        self.calls += 1
+        return httpx.Response(200, text=str(self.ip))
+
+class FakeDnsServer:
+    """
+    Authoritative stand-in for a zone, listening on 127.0.0.1 over UDP and TCP. Answers queries, dynamic
+    updates (RFC 2136, applied atomically, prerequisites not checked) and zone transfers (AXFR, TCP only).
+
+    When a keyring is given, UPDATE and AXFR messages must be signed with one of its TSIG keys, like on
+    a real primary. Messages are counted in `calls`, e.g. "QUERY A", "UPDATE", "AXFR".
+
+    Arguments:
+        zone (str): The only zone served.
+        keyring (Optional[dict[str, str]]): TSIG key names and their base64 secrets (hmac-sha256).
+    """
+    zone: dns.name.Name
+    records: dict[tuple[dns.name.Name, str], list[str]]
+    calls: Counter[str]
+    _keyring: Optional[dict[dns.name.Name, dns.tsig.Key]]
+    _serial: int
+    _udp: Optional[asyncio.DatagramTransport]
+    _tcp: Optional[asyncio.Server]
+
+    def __init__(self, zone: str, keyring: Optional[dict[str, str]] = None):
+        self.zone = dns.name.from_text(zone)
+        self.records = {}
+        self.calls = Counter()
+        self._keyring = dns.tsigkeyring.from_text({name: ("hmac-sha256", secret) for name, secret in keyring.items()}) if keyring else None
+        self._serial = 1
+        self._udp = None
+        self._tcp = None
+
+    @property
+    def port(self) -> int:
+        if self._udp is None:
+            raise RuntimeError("The stand-in DNS server is not started")
+        return self._udp.get_extra_info("sockname")[1]
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        server = self
+
+        class Protocol(asyncio.DatagramProtocol):
+            def datagram_received(self, data: bytes, addr: tuple[str, int]):
+                response: Optional[bytes] = server._answer(data, tcp=False)
+                if response is not None and server._udp is not None:
+                    server._udp.sendto(response, addr)
+
+        self._udp, _ = await loop.create_datagram_endpoint(Protocol, local_addr=("127.0.0.1", 0))
+        self._tcp = await asyncio.start_server(self._serve_tcp, "127.0.0.1", self.port)
+
+    async def close(self):
+        if self._udp is not None:
+            self._udp.close()
+        if self._tcp is not None:
+            self._tcp.close()
+            await self._tcp.wait_closed()
+
+    def add_record(self, name: str, content: IPv4Address | IPv6Address | str, type: str = "A"):
+        self.records.setdefault((dns.name.from_text(name), type), []).append(str(content))
+
+    def content_of(self, name: str, type: str = "A") -> Optional[str]:
+        contents: list[str] = self.records.get((dns.name.from_text(name), type), [])
+        return contents[0] if contents else None
+
+    async def _serve_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                length: int = int.from_bytes(await reader.readexactly(2), "big")
+                response: Optional[bytes] = self._answer(await reader.readexactly(length), tcp=True)
+                if response is not None:
+                    writer.write(len(response).to_bytes(2, "big") + response)
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _answer(self, wire: bytes, tcp: bool) -> Optional[bytes]:
+        try:
+            message: dns.message.Message = dns.message.from_wire(wire, keyring=self._keyring)
+        except dns.exception.DNSException:
+            # Malformed, or signed with an unknown key or a wrong secret
+            self.calls["rejected"] += 1
+            return None
+
+        response: dns.message.Message = dns.message.make_response(message)
+        response.flags |= dns.flags.AA
+        signed: bool = message.had_tsig or self._keyring is None
+        if message.opcode() == dns.opcode.UPDATE:
+            self.calls["UPDATE"] += 1
+            response.set_rcode(self._update(message) if signed else dns.rcode.REFUSED)
+            return response.to_wire()
+
+        question: dns.rrset.RRset = message.question[0]
+        self.calls[f"QUERY {dns.rdatatype.to_text(question.rdtype)}"] += 1
+        if question.rdtype == dns.rdatatype.AXFR:
+            if not tcp or not signed or question.name != self.zone:
+                response.set_rcode(dns.rcode.REFUSED)
+                return response.to_wire()
+            soa: dns.rrset.RRset = self._soa()
+            response.answer.append(soa)
+            response.answer.extend(dns.rrset.from_text_list(name, 300, "IN", type, contents) for (name, type), contents in self.records.items())
+            response.answer.append(soa)
+            return response.to_wire()
+
+        contents: list[str] = self.records.get((question.name, dns.rdatatype.to_text(question.rdtype)), [])
+        if contents:
+            response.answer.append(dns.rrset.from_text_list(question.name, 300, "IN", question.rdtype, contents))
+        elif not any(name == question.name for name, _ in self.records):
+            response.set_rcode(dns.rcode.NXDOMAIN)
+        return response.to_wire(max_size=65535 if tcp else 512)
+
+    def _update(self, message: dns.message.Message) -> dns.rcode.Rcode:
+        if not message.question or message.question[0].name != self.zone:
+            return dns.rcode.NOTAUTH
+        # Applied to a copy, so a rejected update leaves the zone untouched
+        records: dict[tuple[dns.name.Name, str], list[str]] = {key: list(contents) for key, contents in self.records.items()}
+        for rrset in message.authority:
+            if not rrset.name.is_subdomain(self.zone):
+                return dns.rcode.NOTZONE
+            type: str = dns.rdatatype.to_text(rrset.rdtype)
+            if rrset.deleting == dns.rdataclass.ANY:
+                # Deletes the whole RRset, or every RRset of the name
+                for key in [key for key in records if key[0] == rrset.name and (rrset.rdtype == dns.rdatatype.ANY or key[1] == type)]:
+                    del records[key]
+            elif rrset.deleting == dns.rdataclass.NONE:
+                contents: list[str] = records.get((rrset.name, type), [])
+                for rdata in rrset:
+                    if rdata.to_text() in contents:
+                        contents.remove(rdata.to_text())
+            else:
+                contents = records.setdefault((rrset.name, type), [])
+                contents.extend(rdata.to_text() for rdata in rrset if rdata.to_text() not in contents)
+        self.records = {key: contents for key, contents in records.items() if contents}
+        self._serial += 1
+        return dns.rcode.NOERROR
+
+    def _soa(self) -> dns.rrset.RRset:
+        return dns.rrset.from_text(self.zone, 300, "IN", "SOA", f"ns1.{self.zone} hostmaster.{self.zone} {self._serial} 3600 600 86400 300")
+
+def fake_transport(*fakes: FakeCloudflareApi | FakeIpify) -> httpx.MockTransport:
+    """Transport routing each request to the fake serving its host. Unknown hosts answer 502."""
+    by_host: dict[str, FakeCloudflareApi | FakeIpify] = {fake.host: fake for fake in fakes}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        fake: Optional[FakeCloudflareApi | FakeIpify] = by_host.get(request.url.host)
+        if fake is None:
+            return httpx.Response(502, text=f"No stand-in for {request.url.host}")
+        return await fake.handle(request)
+
+    return httpx.MockTransport(handler)
+
+def _envelope(result: Any, success: bool = True) -> dict[str, Any]:
+    return {"success": success, "errors": [], "messages": [], "result": result}
+
+def _error(status_code: int, code: int, message: str) -> httpx.Response:
+    return httpx.Response(status_code, json={**_envelope(None, success=False), "errors": [{"code": code, "message": message}]})
@@ -0,0 +1,82 @@
+import asyncio
+from ipaddress import IPv4Address
+
+from src.domain.value_objects import DNSRecord, ReconciliationResult
+from src.infra.http import create_async_client
+from src.infra.ip.ipify import AsyncIpify
+from src.infra.nameserver.cloudflare.cloudflare_async import AsyncCloudflareNameserver
+from src.infra.loggers.standard import Logger, StandardLogger, LogLevel
+
+from src.benchmarks.bench import run_benchmark
+from src.benchmarks.fakes import FakeCloudflareApi, FakeIpify, fake_transport
+
+def test_nameserver_against_the_stand_ins():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    cloudflare = FakeCloudflareApi(max_per_page=2)
+    ipify = FakeIpify(ip=IPv4Address("198.51.100.7"))
+    for index in range(5):
+        cloudflare.add_record(f"host-{index}.example.com", "198.51.100.1")
+
+    async def run() -> tuple[IPv4Address | None, ReconciliationResult | None, float | None]:
+        async with create_async_client(transport=fake_transport(cloudflare, ipify)) as client:
+            nameserver = AsyncCloudflareNameserver(cloudflare_api_key="key", cloudflare_zone_id=cloudflare.zone_id, client=client)
+            ip: IPv4Address | None = await AsyncIpify(client=client).get_ip(logger)
+            assert ip is not None
+            result: ReconciliationResult | None = await nameserver.reconcile(
+                [DNSRecord(ip=ip, name=f"host-{index}.example.com") for index in range(6)], logger)
+
+            cloudflare.inject_rate_limit(retry_after=7)
+            assert await nameserver.get_record_by_name("host-0.example.com", logger) is None
+            retry_after: float | None = nameserver.retry_after()
+            return ip, result, retry_after
+
+    ip, result, retry_after = asyncio.run(run())
+
+    assert ip == IPv4Address("198.51.100.7")
+    assert result is not None and len(result.updated) == 5 and len(result.created) == 1
+    assert retry_after is not None and 6 < retry_after <= 7
+    assert all(cloudflare.content_of(f"host-{index}.example.com") == "198.51.100.7" for index in range(6))
+    # 5 records, 2 per page: 3 pages, then a single batch, then the rate limited lookup
+    assert cloudflare.calls == {"GET records": 4, "POST batch": 1}
+
+def test_benchmark_reports_every_metric():
+    logger: Logger = StandardLogger(LogLevel.CRITICAL)
+    summary = asyncio.run(run_benchmark(mode="reconcile", records=10, ticks=4, latency=0, change_every=2, cache_ttl=0,
+                                        rate_limit_every=0, logger=logger))
+
+    assert summary["ticks"] == 4
+    # Every tick looks the ip up and lists the zone once, and the ticks where the ip changed send a batch too
+    assert summary["ip_calls_per_tick"] == 1
+    assert 1 < summary["cloudflare_calls_per_tick"] < 2
+    assert summary["calls_per_tick"] == summary["ip_calls_per_tick"] + summary["cloudflare_calls_per_tick"]
+    assert summary["max_calls_per_tick"] == 3
+    assert 0 < summary["p50_ms"] <= summary["p99_ms"]
+    assert summary["peak_kib_per_tick"] > 0
+
+def test_iter_records_streams_filtered_pages():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    cloudflare = FakeCloudflareApi(max_per_page=3)
+    for index in range(10):
+        cloudflare.add_record(f"host-{index}.example.com", "198.51.100.1" if index % 2 else "198.51.100.2")
+
+    async def run() -> tuple[list[str], list[str], int, int]:
+        async with create_async_client(transport=fake_transport(cloudflare)) as client:
+            nameserver = AsyncCloudflareNameserver(cloudflare_api_key="key", cloudflare_zone_id=cloudflare.zone_id, client=client)
+            everything: list[str] = [record.name async for record in nameserver.iter_records(logger, page_size=3)]
+            filtered: list[str] = [record.name async for record in nameserver.iter_records(logger, content=IPv4Address("198.51.100.1"), page_size=3)]
+
+            listing_calls: int = cloudflare.calls["GET records"]
+            async for _ in nameserver.iter_records(logger, page_size=3):
+                break
+            # Let the cancelled prefetch settle
+            await asyncio.sleep(0)
+            return everything, filtered, listing_calls, cloudflare.calls["GET records"] - listing_calls
+
+    everything, filtered, listing_calls, calls_for_first_record = asyncio.run(run())
+
+    assert everything == [f"host-{index}.example.com" for index in range(10)]
+    assert filtered == [f"host-{index}.example.com" for index in range(1, 10, 2)]
+    # 4 pages, then 2 pages filtered by content on the server
+    assert listing_calls == 6
+    # The first page and, at most, the prefetched second one
+    assert calls_for_first_record <= 2
@@ -0,0 +1,380 @@
+"""
+Replays an external IP trace through the refresh loop on simulated time, to compare refresh policies
+without waiting for the hours they need to show their cost.
+
+    python -m src.benchmarks.simulation --days 7 --changes-per-day 2 --flaps-per-day 6 --outages-per-day 1
+    python -m src.benchmarks.simulation --trace uplink.jsonl --policy "eager:refresh_rate=30" --policy "lazy:refresh_rate=600,cache_ttl=3600"
+
+Each policy runs the real `refresh_service_task` (scheduler, dampener, record cache, deadlines) on a
+`VirtualClock`, against an in-memory IP source following the trace and the local Cloudflare stand-in.
+A simulated week takes seconds. For each policy, reports:
+- The time to convergence after each change of the external IP (p50/p90/p99/max), and the changes
+  `missed`: superseded by the next one before the record caught up.
+- `stale_s_per_day`: seconds per day during which the record did not hold the external IP.
+- The Cloudflare API calls, record writes and IP lookups per simulated day.
+
+A trace is a JSON lines file of events, by time in seconds from the start:
+
+    {"at": 0, "ip": "198.51.100.1"}
+    {"at": 3600, "ip": "203.0.113.7"}
+    {"at": 7200, "outage": "ip", "duration": 300}
+    {"at": 9000, "latency": "nameserver", "seconds": 8, "duration": 600}
+
+`outage` makes the IP source (`ip`) or the nameserver (`nameserver`) fail for `duration` seconds, and
+`latency` slows its answers down. Without `--trace`, a trace is generated from the rates given.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field, fields, replace
+from ipaddress import IPv4Address
+from typing import Any, Optional
+import httpx
+
+from src.app import refresh_service_task
+from src.domain.value_objects import AnyIPAddress
+from src.infra.clock import Clock, VirtualClock
+from src.infra.http import create_async_client
+from src.infra.ip.interface import AsyncExternalIpInterface
+from src.infra.loggers.interface import Logger, LogLevel
+from src.infra.nameserver.cache import RecordCache
+from src.infra.nameserver.cloudflare.cloudflare_async import AsyncCloudflareNameserver
+from src.infra.resilience import ResilientTransport
+from src.services.dampening import WriteDampener
+from src.services.scheduler import RefreshScheduler
+from src.benchmarks.bench import percentile
+from src.benchmarks.fakes import FakeCloudflareApi
+
+DAY: float = 86400
+DOMAIN_NAME: str = "home.example.com"
+
+@dataclass(slots=True, frozen=True)
+class TraceEvent:
+    """
+    Something happening at `at` seconds: the external IP changes to `ip`, or the `target` provider
+    ("ip" or "nameserver") fails (`outage`) or answers `seconds` slower (`latency`) for `duration` seconds.
+    """
+    at: float
+    ip: Optional[AnyIPAddress] = None
+    outage: Optional[str] = None
+    latency: Optional[str] = None
+    seconds: float = 0
+    duration: float = 0
+
+@dataclass(slots=True, frozen=True)
+class Policy:
+    """A refresh configuration, as set through the environment variables of the same names."""
+    name: str
+    refresh_rate: float = 300
+    idle_refresh_rate: Optional[float] = None
+    max_backoff: float = 900
+    cache_ttl: float = 0
+    dampen_min_stable: float = 0
+    dampen_window: float = 0
+    tick_deadline: float = 30
+
+DEFAULT_POLICIES: tuple[Policy, ...] = (
+    Policy("poll-300", refresh_rate=300),
+    Policy("poll-60", refresh_rate=60),
+    Policy("poll-60-cached", refresh_rate=60, cache_ttl=3600),
+    Policy("poll-60-dampened", refresh_rate=60, dampen_min_stable=120, dampen_window=600),
+)
+
+def parse_policy(text: str) -> Policy:
+    """Parses `name:field=value,field=value`, e.g. `eager:refresh_rate=30,cache_ttl=600`."""
+    name, _, settings = text.partition(":")
+    known: set[str] = {policy_field.name for policy_field in fields(Policy)} - {"name"}
+    values: dict[str, float] = {}
+    for setting in filter(None, settings.split(",")):
+        key, _, value = setting.partition("=")
+        if key.strip() not in known:
+            raise ValueError(f"Unknown policy setting '{key}'. Known: {', '.join(sorted(known))}")
+        values[key.strip()] = float(value)
+    return replace(Policy(name), **values)
+
+def load_trace(path: str) -> list[TraceEvent]:
+    """Reads a JSON lines trace, see the module documentation. Raises ValueError if an event is malformed."""
+    events: list[TraceEvent] = []
+    with open(path) as trace:
+        for line in filter(str.strip, trace):
+            event: dict[str, Any] = json.loads(line)
+            if "ip" in event:
+                event["ip"] = IPv4Address(event["ip"])
+            events.append(TraceEvent(**event))
+    return sorted(events, key=lambda event: event.at)
+
+def synthetic_trace(duration: float, changes_per_day: float, flaps_per_day: float = 0, flap_length: float = 60, outages_per_day: float = 0,
+                    outage_length: float = 600, spikes_per_day: float = 0, spike_latency: float = 10, spike_length: float = 600,
+                    rng: Optional[random.Random] = None) -> list[TraceEvent]:
+    """
+    A trace of `duration` seconds where each kind of event arrives as a Poisson process of the rate given.
+    A change moves to a new IP for good, a flap moves to a backup IP and back after `flap_length` seconds.
+    Outages and latency spikes hit the IP source and the nameserver alike.
+    """
+    rng = rng if rng is not None else random.Random(0)
+    addresses = (IPv4Address(int(IPv4Address("203.0.113.1")) + index) for index in range(1 << 16))
+    backup: IPv4Address = IPv4Address("198.51.100.254")
+
+    def arrivals(per_day: float) -> list[float]:
+        times: list[float] = []
+        at: float = rng.expovariate(per_day / DAY) if per_day > 0 else duration
+        while at < duration:
+            times.append(at)
+            at += rng.expovariate(per_day / DAY)
+        return times
+
+    events: list[tuple[float, str]] = sorted([(at, "change") for at in arrivals(changes_per_day)] + [(at, "flap") for at in arrivals(flaps_per_day)])
+    trace: list[TraceEvent] = [TraceEvent(at=0, ip=next(addresses))]
+    current: AnyIPAddress = trace[0].ip # type: ignore
+    for at, kind in events:
+        if kind == "change":
+            current = next(addresses)
+            trace.append(TraceEvent(at=at, ip=current))
+        else:
+            trace += [TraceEvent(at=at, ip=backup), TraceEvent(at=at + flap_length, ip=current)]
+    for at in arrivals(outages_per_day):
+        trace.append(TraceEvent(at=at, outage=rng.choice(("ip", "nameserver")), duration=outage_length))
+    for at in arrivals(spikes_per_day):
+        trace.append(TraceEvent(at=at, latency=rng.choice(("ip", "nameserver")), seconds=spike_latency, duration=spike_length))
+    return sorted(trace, key=lambda event: event.at)
+
+class SilentLogger(Logger):
+    """Discards everything: outages of the trace are expected, and a simulated week logs thousands of them."""
+    def __init__(self, log_level: LogLevel = LogLevel.CRITICAL):
+        pass
+
+    def _log(self, level: LogLevel, message: str, *args: Any, **kwargs: Any):
+        pass
+
+    def debug(self, message: str, *args: Any, **kwargs: Any):
+        pass
+
+    def info(self, message: str, *args: Any, **kwargs: Any):
+        pass
+
+    def warning(self, message: str, *args: Any, **kwargs: Any):
+        pass
+
+    def error(self, message: str, *args: Any, **kwargs: Any):
+        pass
+
+    def critical(self, message: str, *args: Any, **kwargs: Any):
+        pass
+
+class TraceIpSource(AsyncExternalIpInterface):
+    """In-memory external IP source answering the IP of the trace, failing during its outages."""
+    ip: AnyIPAddress
+    latency: float
+    down_until: float
+    calls: int
+    _clock: Clock
+
+    def __init__(self, ip: AnyIPAddress, clock: Clock):
+        self.ip = ip
+        self.latency = 0
+        self.down_until = 0
+        self.calls = 0
+        self._clock = clock
+
+    async def get_ip(self, logger: Logger) -> Optional[AnyIPAddress]:
+        self.calls += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        if self._clock.now() < self.down_until:
+            logger.error("The external IP source is down")
+            return None
+        return self.ip
+
+class SimulatedNameserverApi:
+    """
+    The Cloudflare stand-in, answering 503 during the outages of the trace, and recording every
+    content the record took, with its time.
+    """
+    host: str
+    cloudflare: FakeCloudflareApi
+    down_until: float
+    history: list[tuple[float, Optional[str]]]
+    _clock: Clock
+
+    def __init__(self, cloudflare: FakeCloudflareApi, clock: Clock):
+        self.host = cloudflare.host
+        self.cloudflare = cloudflare
+        self.down_until = 0
+        self.history = [(clock.now(), cloudflare.content_of(DOMAIN_NAME))]
+        self._clock = clock
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if self._clock.now() < self.down_until:
+            if self.cloudflare.latency > 0:
+                await asyncio.sleep(self.cloudflare.latency)
+            return httpx.Response(503, json={"success": False, "errors": [{"code": 10000, "message": "Service unavailable"}], "messages": [], "result": None})
+        response: httpx.Response = await self.cloudflare.handle(request)
+        content: Optional[str] = self.cloudflare.content_of(DOMAIN_NAME)
+        if content != self.history[-1][1]:
+            self.history.append((self._clock.now(), content))
+        return response
+
+@dataclass(slots=True)
+class SimulationResult:
+    policy: Policy
+    duration: float
+    convergence: list[float] = field(default_factory=list)
+    """Seconds from each change of the external IP to the record holding it."""
+    missed: int = 0
+    stale: float = 0
+    api_calls: int = 0
+    writes: int = 0
+    ip_lookups: int = 0
+    wall: float = 0
+
+def simulate(policy: Policy, trace: list[TraceEvent], duration: float, seed: int = 0) -> SimulationResult:
+    """Runs `refresh_service_task` with policy for `duration` simulated seconds, replaying trace."""
+    clock = VirtualClock()
+    logger: Logger = SilentLogger()
+    initial_ip: AnyIPAddress = next(event.ip for event in trace if event.ip is not None)
+    cloudflare = FakeCloudflareApi()
+    cloudflare.add_record(DOMAIN_NAME, initial_ip)
+
+    async def run() -> tuple[TraceIpSource, SimulatedNameserverApi]:
+        ip_source = TraceIpSource(initial_ip, clock)
+        api = SimulatedNameserverApi(cloudflare, clock)
+        transport = ResilientTransport(httpx.MockTransport(api.handle), clock=clock)
+        async with create_async_client(transport=transport) as client:
+            nameserver = AsyncCloudflareNameserver(cloudflare_api_key="simulation", cloudflare_zone_id=cloudflare.zone_id, client=client,
+                                                   cache=RecordCache(ttl=policy.cache_ttl, clock=clock) if policy.cache_ttl > 0 else None)
+            dampener: Optional[WriteDampener] = None
+            if policy.dampen_min_stable > 0 or policy.dampen_window > 0:
+                dampener = WriteDampener(min_stable=policy.dampen_min_stable, window=policy.dampen_window, clock=clock)
+            scheduler = RefreshScheduler(interval=policy.refresh_rate, idle_interval=policy.idle_refresh_rate, max_backoff=policy.max_backoff,
+                                         clock=clock, rng=random.Random(seed))
+            task: asyncio.Task[None] = asyncio.create_task(refresh_service_task(ip_source, nameserver, DOMAIN_NAME, int(policy.refresh_rate), logger,
+                                                                                scheduler=scheduler, dampener=dampener, tick_deadline=policy.tick_deadline or None))
+            try:
+                await replay(trace, duration, clock, ip_source, api)
+            finally:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        return ip_source, api
+
+    started: float = time.perf_counter()
+    ip_source, api = clock.run(run())
+    result = SimulationResult(policy=policy, duration=duration, wall=time.perf_counter() - started)
+    result.api_calls = sum(cloudflare.calls.values())
+    result.writes = len(api.history) - 1
+    result.ip_lookups = ip_source.calls
+    measure_staleness(result, trace, api.history)
+    return result
+
+async def replay(trace: list[TraceEvent], duration: float, clock: Clock, ip_source: TraceIpSource, api: SimulatedNameserverApi):
+    """Applies the events of trace at their time, then waits until duration."""
+    restores: list[tuple[float, str]] = []
+    for event in (event for event in trace if event.at < duration):
+        await clock.sleep(max(0.0, event.at - clock.now()))
+        if event.ip is not None:
+            ip_source.ip = event.ip
+        if event.outage == "ip":
+            ip_source.down_until = max(ip_source.down_until, event.at + event.duration)
+        elif event.outage == "nameserver":
+            api.down_until = max(api.down_until, event.at + event.duration)
+        if event.latency is not None:
+            set_latency(event.latency, event.seconds, ip_source, api)
+            restores.append((event.at + event.duration, event.latency))
+        for at, target in [restore for restore in restores if restore[0] <= clock.now()]:
+            set_latency(target, 0, ip_source, api)
+            restores.remove((at, target))
+    await clock.sleep(max(0.0, duration - clock.now()))
+
+def set_latency(target: str, seconds: float, ip_source: TraceIpSource, api: SimulatedNameserverApi):
+    if target == "ip":
+        ip_source.latency = seconds
+    else:
+        api.cloudflare.latency = seconds
+
+def measure_staleness(result: SimulationResult, trace: list[TraceEvent], history: list[tuple[float, Optional[str]]]):
+    """Compares the IP of the trace with the content of the record over time."""
+    changes: list[tuple[float, str]] = [(event.at, str(event.ip)) for event in trace if event.ip is not None and event.at < result.duration]
+    for index, (at, ip) in enumerate(changes):
+        until: float = changes[index + 1][0] if index + 1 < len(changes) else result.duration
+        held_at_change: Optional[str] = next((content for written_at, content in reversed(history) if written_at <= at), None)
+        if held_at_change == ip:
+            if index > 0:
+                result.convergence.append(0)
+            continue
+        written_at: Optional[float] = next((written_at for written_at, content in history if at <= written_at < until and content == ip), None)
+        if written_at is None:
+            result.missed += 1
+        else:
+            result.convergence.append(written_at - at)
+
+    # The record is stale whenever its content differs from the IP of the trace: walk both step functions
+    instants: list[float] = sorted({at for at, _ in changes} | {at for at, _ in history if at < result.duration} | {result.duration})
+    for start, end in zip(instants, instants[1:]):
+        ip: Optional[str] = next((ip for at, ip in reversed(changes) if at <= start), None)
+        content: Optional[str] = next((content for at, content in reversed(history) if at <= start), None)
+        if ip != content:
+            result.stale += end - start
+
+def summarize(result: SimulationResult) -> dict[str, float | int | str]:
+    days: float = result.duration / DAY
+    convergence: list[float] = result.convergence or [0]
+    return {
+        "policy": result.policy.name,
+        "changes": len(result.convergence) + result.missed,
+        "p50_s": percentile(convergence, 0.5),
+        "p90_s": percentile(convergence, 0.9),
+        "p99_s": percentile(convergence, 0.99),
+        "max_s": max(convergence),
+        "missed": result.missed,
+        "stale_s_per_day": result.stale / days,
+        "api_calls_per_day": result.api_calls / days,
+        "writes_per_day": result.writes / days,
+        "ip_lookups_per_day": result.ip_lookups / days,
+        "speedup": result.duration / result.wall if result.wall > 0 else 0,
+    }
+
+def print_table(summaries: list[dict[str, float | int | str]]):
+    columns: list[str] = list(summaries[0])
+    rows: list[list[str]] = [[f"{summary[column]:.1f}" if isinstance(summary[column], float) else str(summary[column]) for column in columns]
+                             for summary in summaries]
+    widths: list[int] = [max(len(column), *(len(row[index]) for row in rows)) for index, column in enumerate(columns)]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--policy", dest="policies", type=parse_policy, action="append", default=[],
+                        help="Policy to simulate, as name:field=value,... Repeatable. Defaults to a few polling, caching and dampening policies")
+    parser.add_argument("--trace", help="JSON lines trace to replay, instead of a synthetic one")
+    parser.add_argument("--days", type=float, default=7, help="Simulated days")
+    parser.add_argument("--changes-per-day", type=float, default=2, help="Synthetic trace: lasting changes of the external IP per day")
+    parser.add_argument("--flaps-per-day", type=float, default=0, help="Synthetic trace: short failovers to a backup IP per day")
+    parser.add_argument("--flap-length", type=float, default=60, help="Synthetic trace: seconds before a flap goes back")
+    parser.add_argument("--outages-per-day", type=float, default=0, help="Synthetic trace: outages of the IP source or of the nameserver per day")
+    parser.add_argument("--outage-length", type=float, default=600, help="Synthetic trace: seconds an outage lasts")
+    parser.add_argument("--spikes-per-day", type=float, default=0, help="Synthetic trace: latency spikes of the IP source or of the nameserver per day")
+    parser.add_argument("--spike-latency", type=float, default=10, help="Synthetic trace: seconds added to each answer during a spike")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic trace and of the scheduler's jitter")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per policy instead of a table")
+    arguments = parser.parse_args(argv)
+
+    duration: float = arguments.days * DAY
+    trace: list[TraceEvent] = load_trace(arguments.trace) if arguments.trace else synthetic_trace(
+        duration, arguments.changes_per_day, flaps_per_day=arguments.flaps_per_day, flap_length=arguments.flap_length,
+        outages_per_day=arguments.outages_per_day, outage_length=arguments.outage_length,
+        spikes_per_day=arguments.spikes_per_day, spike_latency=arguments.spike_latency, rng=random.Random(arguments.seed))
+
+    summaries: list[dict[str, float | int | str]] = []
+    for policy in arguments.policies or DEFAULT_POLICIES:
+        summary = summarize(simulate(policy, trace, duration, seed=arguments.seed))
+        summaries.append(summary)
+        if arguments.json:
+            print(json.dumps(summary))
+
+    if not arguments.json:
+        print_table(summaries)
+
+if __name__ == "__main__":
+    main()
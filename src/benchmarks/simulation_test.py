@@ -0,0 +1,33 @@
+import asyncio
+import time
+from ipaddress import IPv4Address
+
+from src.infra.clock import VirtualClock
+from src.benchmarks.simulation import DAY, Policy, TraceEvent, simulate
+
+def test_virtual_clock_skips_the_waits():
+    clock = VirtualClock(start=1000)
+
+    async def run() -> float:
+        await asyncio.sleep(3600)
+        try:
+            async with asyncio.timeout(50):
+                await clock.sleep(600)
+        except TimeoutError:
+            pass
+        return clock.now()
+
+    started: float = time.perf_counter()
+    assert clock.run(run()) == 1000 + 3600 + 50
+    assert time.perf_counter() - started < 1
+
+def test_changes_converge_within_a_refresh():
+    trace: list[TraceEvent] = [TraceEvent(at=0, ip=IPv4Address("198.51.100.1")), TraceEvent(at=3600, ip=IPv4Address("198.51.100.2")),
+                               TraceEvent(at=5000, outage="ip", duration=600), TraceEvent(at=7000, ip=IPv4Address("198.51.100.3"))]
+
+    result = simulate(Policy("poll-60", refresh_rate=60), trace, duration=DAY / 4)
+
+    assert result.missed == 0 and len(result.convergence) == 2
+    assert all(0 < seconds <= 60 * 1.25 for seconds in result.convergence)
+    assert result.writes == 2
+    assert result.stale == sum(result.convergence)
@@ -0,0 +1,133 @@
+"""
+Measures how fast a fresh LipaDNS process gets to its first tick, and how much memory it holds once idle.
+
+    python -m src.benchmarks.startup --runs 10 --idle 2
+
+Each run starts a new interpreter which imports `src.app`, builds the default providers (ipify and Cloudflare)
+through the provider registry and runs one refresh against inline stand-ins, without any network access.
+Reports the median, over the runs, of:
+- `import_ms`: importing `src.app`.
+- `first_tick_ms`: from the start of the process (interpreter startup included) to the end of the first tick.
+- `modules`: modules loaded at the first tick, and `optional`: the optional dependencies among them.
+- `idle_rss_kib`: resident memory after `--idle` seconds without work.
+
+`--import` adds modules to import before the first tick, e.g. `--import src.api.control` to measure what the
+control API costs.
+"""
+import argparse
+import asyncio
+import gc
+import importlib
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Optional
+
+OPTIONAL_PACKAGES: tuple[str, ...] = ("dns", "fastapi", "uvicorn", "starlette", "requests", "orjson")
+"""Top-level packages of the optional requirement groups, which the default configuration must not import."""
+
+STAND_IN_IP: str = "198.51.100.1"
+DOMAIN_NAME: str = "home.example.com"
+
+def resident_memory() -> int:
+    """Resident set size of the process, in KiB."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    # Peak rather than current outside Linux, which is still an upper bound
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def child(imports: list[str], idle: float):
+    """One measured process. Prints a JSON line at the first tick, then another one once idle."""
+    started: float = time.perf_counter()
+    import src.app # noqa: F401
+    imported: float = time.perf_counter()
+    for module in imports:
+        importlib.import_module(module)
+
+    import httpx
+    from src.infra.http import create_async_client
+    from src.infra.loggers.interface import LogLevel
+    from src.infra.providers import PROVIDERS
+    from src.services.services import async_refresh_service
+
+    def stand_in(request: httpx.Request) -> httpx.Response:
+        # Steady state: the record already points to the external IP, so the tick writes nothing
+        if request.url.host == "api.ipify.org":
+            return httpx.Response(200, text=STAND_IN_IP)
+        record: dict[str, Any] = {"id": "1", "name": DOMAIN_NAME, "type": "A", "content": STAND_IN_IP, "proxied": True}
+        return httpx.Response(200, json={"success": True, "errors": [], "messages": [], "result": [record],
+                                         "result_info": {"count": 1, "page": 1, "per_page": 100, "total_count": 1, "total_pages": 1}})
+
+    async def first_tick():
+        logger = PROVIDERS.load("logger", "standard")(log_level=LogLevel.CRITICAL)
+        async with create_async_client(transport=httpx.MockTransport(stand_in)) as client:
+            ip_service = PROVIDERS.create("ip", "ipify", logger, client=client)
+            nameserver = PROVIDERS.create("nameserver", "cloudflare", logger, cloudflare_api_key="startup", cloudflare_zone_id="zone", client=client)
+            await async_refresh_service(ip_service, nameserver, DOMAIN_NAME, logger)
+
+    asyncio.run(first_tick())
+    loaded: list[str] = sorted({name.split(".")[0] for name in sys.modules} & set(OPTIONAL_PACKAGES))
+    print(json.dumps({"import_ms": (imported - started) * 1000, "modules": len(sys.modules), "optional": loaded}), flush=True)
+
+    gc.collect()
+    time.sleep(idle)
+    print(json.dumps({"idle_rss_kib": resident_memory()}), flush=True)
+
+def measure(imports: list[str], idle: float) -> dict[str, Any]:
+    """Runs one child process and times its first tick from the parent's side, interpreter startup included."""
+    command: list[str] = [sys.executable, "-m", "src.benchmarks.startup", "--child", "--idle", str(idle)]
+    for module in imports:
+        command += ["--import", module]
+    spawned: float = time.perf_counter()
+    with subprocess.Popen(command, stdout=subprocess.PIPE, text=True) as process:
+        assert process.stdout is not None
+        first_tick: dict[str, Any] = json.loads(process.stdout.readline())
+        first_tick["first_tick_ms"] = (time.perf_counter() - spawned) * 1000
+        first_tick.update(json.loads(process.stdout.readline()))
+    if process.returncode != 0:
+        raise RuntimeError(f"The measured process exited with {process.returncode}")
+    return first_tick
+
+def summarize(runs: list[dict[str, Any]]) -> dict[str, Any]:
+    return {
+        "runs": len(runs),
+        "import_ms": statistics.median(run["import_ms"] for run in runs),
+        "first_tick_ms": statistics.median(run["first_tick_ms"] for run in runs),
+        "modules": round(statistics.median(run["modules"] for run in runs)),
+        "idle_rss_kib": round(statistics.median(run["idle_rss_kib"] for run in runs)),
+        "optional": ",".join(runs[-1]["optional"]) or "-",
+    }
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Processes to start")
+    parser.add_argument("--idle", type=float, default=1, help="Seconds each process idles before its memory is measured")
+    parser.add_argument("--import", dest="imports", action="append", default=[], help="Module to import before the first tick. Repeatable")
+    parser.add_argument("--json", action="store_true", help="Print a JSON object instead of a table")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    arguments = parser.parse_args(argv)
+
+    if arguments.child:
+        child(arguments.imports, arguments.idle)
+        return
+
+    summary: dict[str, Any] = summarize([measure(arguments.imports, arguments.idle) for _ in range(arguments.runs)])
+    if arguments.json:
+        print(json.dumps(summary))
+        return
+    columns: list[str] = list(summary)
+    values: list[str] = [f"{summary[column]:.1f}" if isinstance(summary[column], float) else str(summary[column]) for column in columns]
+    widths: list[int] = [max(len(column), len(value)) for column, value in zip(columns, values)]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    print("  ".join(value.rjust(width) for value, width in zip(values, widths)))
+
+if __name__ == "__main__":
+    main()
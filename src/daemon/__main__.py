@@ -0,0 +1,24 @@
+"""
+Serves many accounts from a configuration file, sharded across worker processes.
+
+    python -m src.daemon accounts.toml
+"""
+import argparse
+import sys
+
+from src.daemon.supervisor import Supervisor
+from src.infra.loggers.standard import StandardLogger, LogLevel
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("config", help="TOML file describing the accounts")
+    arguments = parser.parse_args()
+
+    logger = StandardLogger(log_level=LogLevel.INFO, queued=True)
+    try:
+        return Supervisor(arguments.config, logger).run()
+    finally:
+        logger.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
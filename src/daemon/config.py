@@ -0,0 +1,72 @@
+import tomllib
+from typing import Optional
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+
+class ZoneConfig(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    zone_id: str = Field(..., min_length=1, description="Cloudflare id of the zone")
+    domain_names: list[str] = Field(..., min_length=1, description="FQDNs of the zone pointed to the external IP")
+
+class AccountConfig(BaseModel):
+    """A customer: one Cloudflare token and the zones it manages."""
+    model_config = ConfigDict(frozen=True)
+
+    name: str = Field(..., min_length=1, description="Unique name of the account, used in logs and metrics")
+    cloudflare_api_token: str = Field(..., min_length=1, description="API token allowed to edit the DNS records of every zone of the account")
+    zones: list[ZoneConfig] = Field(..., min_length=1)
+    max_concurrency: int = Field(default=2, ge=1, description="Zones of the account reconciled at the same time")
+    rate_limit: int = Field(default=1200, ge=1, description="Cloudflare API requests allowed per 5 minutes for the token")
+
+    @property
+    def weight(self) -> int:
+        """Rough cost of the account per refresh, used to balance the shards."""
+        return sum(len(zone.domain_names) for zone in self.zones)
+
+class DaemonConfig(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    workers: int = Field(default=2, ge=1, description="Worker processes the accounts are sharded across")
+    refresh_rate: int = Field(default=300, ge=1, description="Seconds between refreshes of every account")
+    record_cache_ttl: int = Field(default=0, ge=0, description="Seconds the DNS Records are cached. Disabled when 0")
+    metrics_port: int = Field(default=0, ge=0, description="Worker N serves its metrics on metrics_port + N. Disabled when 0")
+    metrics_host: str = Field(default="127.0.0.1")
+    ipv6: bool = Field(default=False, description="Also point an AAAA record of every hostname to the external IPv6 address")
+    state_path: Optional[str] = Field(default=None, description="SQLite file the workers persist the cached DNS Records and the external IPs to. Disabled when unset")
+    dampen_min_stable: float = Field(default=0, ge=0, description="Seconds a new external IP must be observed before the records are pointed to it")
+    dampen_window: float = Field(default=0, ge=0, description="Least seconds between two writes of a record")
+    dampen_max_writes_per_hour: int = Field(default=0, ge=0, description="Most writes of each record per hour. Unlimited when 0")
+    accounts: list[AccountConfig] = Field(..., min_length=1)
+
+    @model_validator(mode="after")
+    def unique_account_names(self) -> "DaemonConfig":
+        names: list[str] = [account.name for account in self.accounts]
+        if len(names) != len(set(names)):
+            raise ValueError("Account names must be unique")
+        return self
+
+def load_config(path: str) -> DaemonConfig:
+    """
+    Reads the accounts served by the daemon from a TOML file:
+
+        workers = 4
+        refresh_rate = 300
+
+        [[accounts]]
+        name = "acme"
+        cloudflare_api_token = "..."
+        max_concurrency = 4
+
+        [[accounts.zones]]
+        zone_id = "..."
+        domain_names = ["home.acme.com", "vpn.acme.com"]
+
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If it is not valid TOML or does not describe a valid configuration.
+    """
+    with open(path, "rb") as config_file:
+        try:
+            return DaemonConfig.model_validate(tomllib.load(config_file))
+        except tomllib.TOMLDecodeError as e:
+            raise ValueError(f"Invalid TOML in {path}: {e}") from e
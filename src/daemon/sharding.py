@@ -0,0 +1,23 @@
+import heapq
+
+from src.daemon.config import AccountConfig
+
+def assign_shards(accounts: list[AccountConfig], workers: int) -> list[list[AccountConfig]]:
+    """
+    Splits the accounts into `workers` shards of similar weight (number of hostnames).
+
+    Heaviest accounts first, each to the lightest shard so far. The result only depends on the
+    accounts, not on their order in the configuration, so reloading an unchanged file moves nothing.
+
+    Returns:
+        list[list[AccountConfig]]: One list of accounts per worker, each sorted by name. Some may be
+        empty when there are fewer accounts than workers.
+    """
+    shards: list[list[AccountConfig]] = [[] for _ in range(workers)]
+    # (weight, index) of every shard, lightest first
+    loads: list[tuple[int, int]] = [(0, index) for index in range(workers)]
+    for account in sorted(accounts, key=lambda account: (-account.weight, account.name)):
+        weight, index = heapq.heappop(loads)
+        shards[index].append(account)
+        heapq.heappush(loads, (weight + account.weight, index))
+    return [sorted(shard, key=lambda account: account.name) for shard in shards]
@@ -0,0 +1,18 @@
+from src.daemon.config import AccountConfig, ZoneConfig
+from src.daemon.sharding import assign_shards
+
+def _account(name: str, hostnames: int) -> AccountConfig:
+    return AccountConfig(name=name, cloudflare_api_token="token",
+                         zones=[ZoneConfig(zone_id=f"{name}-zone", domain_names=[f"host-{index}.{name}.com" for index in range(hostnames)])])
+
+def test_assign_shards_balances_and_ignores_order():
+    accounts: list[AccountConfig] = [_account("big", 100)] + [_account(f"small-{index}", 10) for index in range(12)]
+
+    shards: list[list[AccountConfig]] = assign_shards(accounts, workers=2)
+
+    weights: list[int] = sorted(sum(account.weight for account in shard) for shard in shards)
+    assert weights == [110, 110]
+    assert sum(len(shard) for shard in shards) == len(accounts)
+    assert assign_shards(list(reversed(accounts)), workers=2) == shards
+    # More workers than accounts leaves some shards empty
+    assert [len(shard) for shard in assign_shards(accounts[:2], workers=3)].count(0) == 1
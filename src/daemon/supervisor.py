@@ -0,0 +1,183 @@
+import multiprocessing
+import multiprocessing.context
+import multiprocessing.process
+import os
+import signal
+import time
+from types import FrameType
+from typing import Callable, Optional
+
+from src.daemon.config import AccountConfig, DaemonConfig, load_config
+from src.daemon.sharding import assign_shards
+from src.daemon.worker import run_worker
+from src.infra.loggers.interface import Logger
+
+WorkerTarget = Callable[[int, list[AccountConfig], DaemonConfig], None]
+
+class WorkerSlot:
+    """A shard and the process currently serving it."""
+    __slots__ = ("index", "accounts", "process", "started_at", "restart_at", "backoff")
+
+    def __init__(self, index: int, accounts: list[AccountConfig]):
+        self.index = index
+        self.accounts = accounts
+        self.process: Optional[multiprocessing.process.BaseProcess] = None
+        self.started_at: float = 0
+        self.restart_at: float = 0
+        self.backoff: float = 0
+
+class Supervisor:
+    """
+    Shards the accounts of a configuration file across worker processes and keeps them running.
+
+    - A worker that exits is restarted, after a delay doubling on each crash that follows shortly after
+      a start (up to `max_backoff`), so a worker crashing on startup does not spin.
+    - The configuration file is reloaded when it changes (or on SIGHUP). The accounts are sharded again,
+      and only the workers whose shard changed are restarted.
+    - SIGINT and SIGTERM stop every worker, then the supervisor.
+
+    Arguments:
+        config_path (str): TOML file describing the accounts, see `load_config`.
+        poll_interval (float): Seconds between checks of the workers and of the configuration file.
+        max_backoff (float): Longest delay before restarting a crashing worker.
+        stable_after (float): Seconds after which a running worker is considered healthy, resetting its backoff.
+        target (WorkerTarget): Function run by each worker process.
+    """
+    _config_path: str
+    _logger: Logger
+    _poll_interval: float
+    _max_backoff: float
+    _stable_after: float
+    _target: WorkerTarget
+    _context: multiprocessing.context.SpawnContext
+    _config: Optional[DaemonConfig]
+    _config_mtime: float
+    _slots: list[WorkerSlot]
+    _stopping: bool
+    _reload_requested: bool
+
+    def __init__(self, config_path: str, logger: Logger, poll_interval: float = 1, max_backoff: float = 60, stable_after: float = 60,
+                 target: WorkerTarget = run_worker):
+        self._config_path = config_path
+        self._logger = logger
+        self._poll_interval = poll_interval
+        self._max_backoff = max_backoff
+        self._stable_after = stable_after
+        self._target = target
+        # Workers never inherit the supervisor's threads, sockets or event loop
+        self._context = multiprocessing.get_context("spawn")
+        self._config = None
+        self._config_mtime = 0
+        self._slots = []
+        self._stopping = False
+        self._reload_requested = False
+
+    @property
+    def slots(self) -> list[WorkerSlot]:
+        return list(self._slots)
+
+    def run(self) -> int:
+        """Blocks until stopped. Returns the exit code of the daemon."""
+        if not self.reload():
+            return 1
+        signal.signal(signal.SIGINT, self._on_stop_signal)
+        signal.signal(signal.SIGTERM, self._on_stop_signal)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self._on_reload_signal)
+        try:
+            while not self._stopping:
+                time.sleep(self._poll_interval)
+                self.check()
+        finally:
+            self.stop()
+        return 0
+
+    def check(self):
+        """Reloads the configuration if needed and restarts the workers that exited."""
+        if self._reload_requested or self._config_changed():
+            self._reload_requested = False
+            self.reload()
+
+        now: float = time.monotonic()
+        for slot in self._slots:
+            if slot.process is not None and slot.process.is_alive():
+                if now - slot.started_at >= self._stable_after:
+                    slot.backoff = 0
+                continue
+            if slot.process is not None:
+                slot.backoff = min(self._max_backoff, max(1.0, slot.backoff * 2))
+                slot.restart_at = now + slot.backoff
+                self._logger.error("Worker %s exited with code %s. Restarting it in %.0fs", slot.index, slot.process.exitcode, slot.backoff)
+                slot.process = None
+            if now >= slot.restart_at:
+                self._start(slot)
+
+    def reload(self) -> bool:
+        """Loads the configuration file and applies it. On error the current configuration is kept."""
+        try:
+            self._config_mtime = os.stat(self._config_path).st_mtime
+            config: DaemonConfig = load_config(self._config_path)
+        except (OSError, ValueError) as e:
+            self._logger.critical("Could not load the accounts from %s: %s", self._config_path, e)
+            return False
+        self._apply(config)
+        return True
+
+    def stop(self):
+        self._stopping = True
+        for slot in self._slots:
+            self._terminate(slot)
+        self._slots = []
+
+    def _apply(self, config: DaemonConfig):
+        shards: list[list[AccountConfig]] = [shard for shard in assign_shards(config.accounts, config.workers) if shard]
+        settings_changed: bool = self._config is None or config.model_copy(update={"accounts": []}) != self._config.model_copy(update={"accounts": []})
+        self._config = config
+
+        for index, shard in enumerate(shards):
+            if index < len(self._slots):
+                slot: WorkerSlot = self._slots[index]
+                if shard == slot.accounts and not settings_changed:
+                    continue
+                self._terminate(slot)
+                slot.accounts = shard
+                slot.backoff = 0
+                slot.restart_at = 0
+            else:
+                self._slots.append(WorkerSlot(index, shard))
+            self._start(self._slots[index])
+        for slot in self._slots[len(shards):]:
+            self._terminate(slot)
+        self._slots = self._slots[:len(shards)]
+        self._logger.info("Serving %s account(s) with %s worker(s). Hostnames per worker: %s", len(config.accounts), len(self._slots),
+                          [sum(account.weight for account in slot.accounts) for slot in self._slots])
+
+    def _start(self, slot: WorkerSlot):
+        if self._config is None:
+            return
+        slot.process = self._context.Process(target=self._target, args=(slot.index, slot.accounts, self._config), name=f"lipadns-worker-{slot.index}")
+        slot.process.start()
+        slot.started_at = time.monotonic()
+
+    def _terminate(self, slot: WorkerSlot):
+        if slot.process is None:
+            return
+        if slot.process.is_alive():
+            slot.process.terminate()
+            slot.process.join(timeout=10)
+            if slot.process.is_alive():
+                slot.process.kill()
+                slot.process.join()
+        slot.process = None
+
+    def _config_changed(self) -> bool:
+        try:
+            return os.stat(self._config_path).st_mtime != self._config_mtime
+        except OSError:
+            return False
+
+    def _on_stop_signal(self, signal_number: int, frame: Optional[FrameType]):
+        self._stopping = True
+
+    def _on_reload_signal(self, signal_number: int, frame: Optional[FrameType]):
+        self._reload_requested = True
@@ -0,0 +1,60 @@
+import sys
+import time
+from pathlib import Path
+
+from src.daemon.config import AccountConfig, DaemonConfig
+from src.daemon.supervisor import Supervisor
+from src.infra.loggers.standard import Logger, StandardLogger, LogLevel
+
+CONFIG: str = """
+workers = {workers}
+
+[[accounts]]
+name = "acme"
+cloudflare_api_token = "token"
+[[accounts.zones]]
+zone_id = "acme-zone"
+domain_names = ["home.acme.com", "vpn.acme.com"]
+
+[[accounts]]
+name = "globex"
+cloudflare_api_token = "token"
+[[accounts.zones]]
+zone_id = "globex-zone"
+domain_names = ["home.globex.com"]
+"""
+
+def crash_or_sleep(index: int, accounts: list[AccountConfig], config: DaemonConfig):
+    """Worker crashing right away for the shard holding acme, running for the others."""
+    if any(account.name == "acme" for account in accounts):
+        sys.exit(3)
+    time.sleep(60)
+
+def test_supervisor_restarts_crashed_workers_and_rebalances(tmp_path: Path):
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    config_path: Path = tmp_path / "accounts.toml"
+    config_path.write_text(CONFIG.format(workers=2))
+    supervisor = Supervisor(str(config_path), logger, poll_interval=0.05, max_backoff=0.5, target=crash_or_sleep)
+
+    try:
+        assert supervisor.reload()
+        assert [[account.name for account in slot.accounts] for slot in supervisor.slots] == [["acme"], ["globex"]]
+        stable_pid = supervisor.slots[1].process.pid # type: ignore
+        crashed_pids: set[int] = set()
+        deadline: float = time.monotonic() + 10
+        while len(crashed_pids) < 2 and time.monotonic() < deadline:
+            process = supervisor.slots[0].process
+            if process is not None:
+                crashed_pids.add(process.pid) # type: ignore
+            supervisor.check()
+            time.sleep(0.05)
+        # The crashing worker was started again, the other one was left alone
+        assert len(crashed_pids) == 2
+        assert supervisor.slots[1].process.pid == stable_pid # type: ignore
+
+        config_path.write_text(CONFIG.format(workers=1).replace("home.globex.com", "home.globex.com\", \"vpn.globex.com"))
+        supervisor.reload()
+        assert [[account.name for account in slot.accounts] for slot in supervisor.slots] == [["acme", "globex"]]
+    finally:
+        supervisor.stop()
+    assert supervisor.slots == []
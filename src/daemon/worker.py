@@ -0,0 +1,156 @@
+import asyncio
+import signal
+from os.path import join
+from types import FrameType
+from typing import Optional
+import httpx
+
+from src.app import resume_external_ips, scheduled_task
+from src.daemon.config import AccountConfig, DaemonConfig, ZoneConfig
+from src.domain.value_objects import AnyIPAddress, ReconciliationResult, RefreshOutcome, RefreshStatus
+from src.infra.http import create_async_client
+from src.infra.ip.interface import AsyncExternalIpInterface
+from src.infra.ip.ipify import AsyncIpify
+from src.infra.loggers.interface import Logger
+from src.infra.loggers.standard import StandardLogger, LogLevel
+from src.infra.metrics.server import MetricsServer
+from src.infra.nameserver.cache import RecordCache
+from src.infra.nameserver.cloudflare.cloudflare_async import AsyncCloudflareNameserver
+from src.infra.ratelimit import RateLimitedScheduler
+from src.infra.state.interface import StateStore
+from src.infra.state.sqlite import SqliteStateStore
+from src.services.dampening import WriteDampener
+from src.services.scheduler import RefreshScheduler
+from src.services.services import async_reconcile_service, merge_outcomes, reconciliation_outcome
+
+class ObservedIp(AsyncExternalIpInterface):
+    """Answers the address looked up once for the whole refresh, so every zone is reconciled from the same lookup."""
+    _ip: Optional[AnyIPAddress]
+
+    def __init__(self, ip: Optional[AnyIPAddress]):
+        self._ip = ip
+
+    async def get_ip(self, logger: Logger) -> Optional[AnyIPAddress]:
+        return self._ip
+
+class AccountRunner:
+    """
+    Reconciles the zones of one account through `async_reconcile_service`, like the single-tenant mode. At most
+    `max_concurrency` of them are in flight at once, so an account with many zones cannot take every connection
+    and event loop turn of its worker.
+    """
+    _account: AccountConfig
+    _semaphore: asyncio.Semaphore
+    _nameservers: list[tuple[ZoneConfig, AsyncCloudflareNameserver]]
+    _state: Optional[StateStore]
+    _dampener: Optional[WriteDampener]
+
+    def __init__(self, account: AccountConfig, client: httpx.AsyncClient, record_cache_ttl: int = 0, state: Optional[StateStore] = None,
+                 dampener: Optional[WriteDampener] = None):
+        self._account = account
+        self._semaphore = asyncio.Semaphore(account.max_concurrency)
+        self._state = state
+        self._dampener = dampener
+        # Cloudflare's budget is per API token: every zone of the account shares this limiter
+        rate_limiter = RateLimitedScheduler(budget=account.rate_limit, window=300, name=account.name)
+        self._nameservers = [(zone, AsyncCloudflareNameserver(cloudflare_api_key=account.cloudflare_api_token,
+                                                              cloudflare_zone_id=zone.zone_id,
+                                                              client=client,
+                                                              cache=RecordCache(ttl=record_cache_ttl, store=state) if record_cache_ttl > 0 else None,
+                                                              rate_limiter=rate_limiter))
+                             for zone in account.zones]
+
+    @property
+    def name(self) -> str:
+        return self._account.name
+
+    async def reconcile(self, ip_service: AsyncExternalIpInterface, logger: Logger, ipv6_service: Optional[AsyncExternalIpInterface] = None) -> list[RefreshOutcome]:
+        """Points every hostname of the account to the external IPs. Returns the outcome of each zone."""
+        return await asyncio.gather(*(self._reconcile_zone(zone, nameserver, ip_service, ipv6_service, logger) for zone, nameserver in self._nameservers))
+
+    async def _reconcile_zone(self, zone: ZoneConfig, nameserver: AsyncCloudflareNameserver, ip_service: AsyncExternalIpInterface,
+                              ipv6_service: Optional[AsyncExternalIpInterface], logger: Logger) -> RefreshOutcome:
+        async with self._semaphore:
+            result: Optional[ReconciliationResult] = await async_reconcile_service(ip_service, nameserver, zone.domain_names, logger, self._state,
+                                                                                   self._dampener, ipv6_service)
+        if result is None:
+            logger.error("Account %s: could not reconcile the zone %s", self._account.name, zone.zone_id)
+        elif result.failed:
+            logger.error("Account %s: failed to write %s DNS Records of the zone %s", self._account.name, len(result.failed), zone.zone_id)
+        return reconciliation_outcome(result, nameserver, self._dampener)
+
+async def reconcile_accounts(runners: list[AccountRunner], external_ip_service: AsyncExternalIpInterface, logger: Logger,
+                             ipv6_service: Optional[AsyncExternalIpInterface] = None) -> RefreshOutcome:
+    """
+    Reconciles every account concurrently from a single lookup of each external IP.
+
+    Returns:
+        RefreshOutcome: Failed (or rate limited) only when every zone failed, so a single broken account never
+        slows down the refreshes of the others. Otherwise the outcomes of the other zones, see `merge_outcomes`.
+    """
+    services: list[AsyncExternalIpInterface] = [external_ip_service] + ([ipv6_service] if ipv6_service is not None else [])
+    lookups: list[Optional[AnyIPAddress]] = await asyncio.gather(*(service.get_ip(logger) for service in services))
+    if all(external_ip is None for external_ip in lookups):
+        logger.critical("Could not obtain a valid IP address from the External IP Service")
+        return RefreshOutcome(status=RefreshStatus.FAILED)
+    observed_ipv6: Optional[AsyncExternalIpInterface] = ObservedIp(lookups[1]) if ipv6_service is not None else None
+
+    outcomes: list[RefreshOutcome] = [outcome for account_outcomes in
+                                      await asyncio.gather(*(runner.reconcile(ObservedIp(lookups[0]), logger, observed_ipv6) for runner in runners))
+                                      for outcome in account_outcomes]
+    failures: list[RefreshOutcome] = [outcome for outcome in outcomes if outcome.status in (RefreshStatus.FAILED, RefreshStatus.RATE_LIMITED)]
+    successes: list[RefreshOutcome] = [outcome for outcome in outcomes if outcome.status not in (RefreshStatus.FAILED, RefreshStatus.RATE_LIMITED)]
+    changed: int = sum(1 for outcome in successes if outcome.status == RefreshStatus.CHANGED)
+    logger.info("Reconciled %s zone(s) of %s account(s). Changed: %s, failed: %s", len(outcomes), len(runners), changed, len(failures))
+    if outcomes and not successes:
+        return merge_outcomes(failures)
+    return merge_outcomes(successes)
+
+async def worker_main(index: int, accounts: list[AccountConfig], config: DaemonConfig, logger: Logger):
+    state: Optional[StateStore] = SqliteStateStore(config.state_path) if config.state_path is not None else None
+    async with create_async_client() as client:
+        ip_service: AsyncExternalIpInterface = AsyncIpify(client=client)
+        ipv6_service: Optional[AsyncExternalIpInterface] = AsyncIpify(client=client, version=6) if config.ipv6 else None
+        dampeners: list[Optional[WriteDampener]] = [create_dampener(config) for _ in accounts]
+        runners: list[AccountRunner] = [AccountRunner(account, client, config.record_cache_ttl, state, dampener) for account, dampener in zip(accounts, dampeners)]
+        if state is not None:
+            resume_external_ips(state, [dampener for dampener in dampeners if dampener is not None], logger)
+
+        metrics_server: Optional[MetricsServer] = None
+        if config.metrics_port > 0:
+            metrics_server = MetricsServer(port=config.metrics_port + index, host=config.metrics_host)
+            if not await metrics_server.start(logger):
+                metrics_server = None
+
+        logger.info("Worker %s serving %s account(s): %s", index, len(runners), ", ".join(runner.name for runner in runners))
+        try:
+            await scheduled_task(run=lambda: reconcile_accounts(runners, ip_service, logger, ipv6_service),
+                                 scheduler=RefreshScheduler(interval=config.refresh_rate),
+                                 logger=logger)
+        finally:
+            if metrics_server is not None:
+                await metrics_server.stop()
+            if state is not None:
+                state.close()
+
+def create_dampener(config: DaemonConfig) -> Optional[WriteDampener]:
+    """A dampener per account: each one tracks the writes of its own records."""
+    if config.dampen_min_stable > 0 or config.dampen_window > 0 or config.dampen_max_writes_per_hour > 0:
+        return WriteDampener(min_stable=config.dampen_min_stable, window=config.dampen_window, max_writes_per_hour=config.dampen_max_writes_per_hour)
+    return None
+
+def _exit_on_signal(signal_number: int, frame: Optional[FrameType]):
+    raise SystemExit(0)
+
+def run_worker(index: int, accounts: list[AccountConfig], config: DaemonConfig):
+    """
+    Entry point of a worker process: runs the refresh loop of its shard until the supervisor terminates it.
+    """
+    # Ctrl+C reaches the whole process group: only the supervisor reacts, and stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, _exit_on_signal)
+    logger = StandardLogger(log_level=LogLevel.INFO, queued=True, log_directory=join("logs", f"worker-{index}"))
+    try:
+        asyncio.run(worker_main(index, accounts, config, logger))
+    finally:
+        logger.close()
@@ -0,0 +1,38 @@
+import asyncio
+from ipaddress import IPv4Address, IPv6Address
+
+from src.daemon.config import AccountConfig, ZoneConfig
+from src.daemon.worker import AccountRunner, reconcile_accounts
+from src.domain.value_objects import RefreshOutcome, RefreshStatus
+from src.infra.http import create_async_client
+from src.infra.ip.ipify import AsyncIpify
+from src.infra.loggers.standard import Logger, StandardLogger, LogLevel
+from src.infra.state.sqlite import SqliteStateStore
+from src.benchmarks.fakes import IPIFY6_HOST, FakeCloudflareApi, FakeIpify, fake_transport
+
+def test_accounts_are_reconciled_dual_stack_from_a_single_lookup():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    cloudflare = FakeCloudflareApi()
+    cloudflare.add_record("home.acme.com", "198.51.100.1")
+    ipify = FakeIpify(ip=IPv4Address("198.51.100.7"))
+    ipify6 = FakeIpify(ip=IPv6Address("2001:db8::7"), host=IPIFY6_HOST)
+    state = SqliteStateStore(":memory:")
+    accounts: list[AccountConfig] = [
+        AccountConfig(name="acme", cloudflare_api_token="token", zones=[ZoneConfig(zone_id=cloudflare.zone_id, domain_names=["home.acme.com"])]),
+        # The stand-in serves a single zone: this one answers 404, which must not fail the refresh of acme
+        AccountConfig(name="globex", cloudflare_api_token="token", zones=[ZoneConfig(zone_id="unknown", domain_names=["home.globex.com"])]),
+    ]
+
+    async def run() -> RefreshOutcome:
+        async with create_async_client(transport=fake_transport(cloudflare, ipify, ipify6)) as client:
+            runners: list[AccountRunner] = [AccountRunner(account, client, record_cache_ttl=300, state=state) for account in accounts]
+            return await reconcile_accounts(runners, AsyncIpify(client=client), logger, AsyncIpify(client=client, version=6))
+
+    outcome = asyncio.run(run())
+
+    assert outcome.status == RefreshStatus.CHANGED
+    assert ipify.calls == 1 and ipify6.calls == 1
+    assert cloudflare.content_of("home.acme.com") == "198.51.100.7"
+    assert cloudflare.content_of("home.acme.com", "AAAA") == "2001:db8::7"
+    assert {record.type.value for record in state.load_records()} == {"A", "AAAA"}
+    state.close()
@@ -0,0 +1,36 @@
+from typing import Iterable, Mapping
+
+from src.domain.value_objects import DNSRecord, RecordChanges, RecordType
+
+RecordKey = tuple[str, RecordType]
+
+def record_key(name: str, record_type: RecordType) -> RecordKey:
+    """Key under which a record is indexed. Names are compared case-insensitively and without the root dot."""
+    return (name.lower().rstrip('.'), record_type)
+
+def diff_records(existing: Mapping[RecordKey, DNSRecord], desired: Iterable[DNSRecord]) -> RecordChanges:
+    """
+    Compares the desired records against an index of the records currently held by a zone.
+
+    Arguments:
+        existing (Mapping[RecordKey, DNSRecord]): Records in the zone, indexed with `record_key`.
+        desired (Iterable[DNSRecord]): Records the zone should hold. Duplicated keys keep the last one.
+
+    Returns:
+        RecordChanges: The records to create, the records to update and the ones already up to date.
+    """
+    desired_index: dict[RecordKey, DNSRecord] = {record_key(r.name, r.type): r for r in desired}
+
+    creates: list[DNSRecord] = []
+    updates: list[DNSRecord] = []
+    unchanged: list[DNSRecord] = []
+    for key, dns_record in desired_index.items():
+        current: DNSRecord | None = existing.get(key)
+        if current is None:
+            creates.append(dns_record)
+        elif current.ip != dns_record.ip:
+            updates.append(dns_record)
+        else:
+            unchanged.append(dns_record)
+
+    return RecordChanges(creates=creates, updates=updates, unchanged=unchanged)
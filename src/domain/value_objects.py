@@ -1,14 +1,75 @@
-from pydantic import BaseModel, Field, ConfigDict
-from ipaddress import IPv4Address
+from enum import Enum
+from typing import Any, Optional
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+from ipaddress import IPv4Address, IPv6Address, ip_address
+
+AnyIPAddress = IPv4Address | IPv6Address
+
+class RecordType(str, Enum):
+    A = "A"
+    AAAA = "AAAA"
+
+    @staticmethod
+    def of(ip: AnyIPAddress) -> "RecordType":
+        """The type of the records holding ip: A for an IPv4 address, AAAA for an IPv6 one."""
+        return RecordType.A if ip.version == 4 else RecordType.AAAA
 
 class DNSRecord(BaseModel):
     model_config = ConfigDict(frozen=True)
 
-    ip: IPv4Address = Field(..., description="IP address associated with the DNS Record")
+    ip: AnyIPAddress = Field(..., description="IP address associated with the DNS Record")
     name: str = Field(..., max_length=255, description="The name of the DNS Record")
+    type: RecordType = Field(default=RecordType.A, description="The type of the DNS Record. Follows the version of ip when omitted")
+
+    @model_validator(mode="before")
+    @classmethod
+    def type_of_ip(cls, data: Any) -> Any:
+        if isinstance(data, dict) and data.get("type") is None and data.get("ip") is not None:
+            try:
+                return {**data, "type": RecordType.of(ip_address(str(data["ip"])))}
+            except ValueError:
+                pass
+        return data
+
+    @model_validator(mode="after")
+    def ip_matches_type(self) -> "DNSRecord":
+        if RecordType.of(self.ip) != self.type:
+            raise ValueError(f"A {self.type.value} record cannot hold the IPv{self.ip.version} address {self.ip}")
+        return self
 
 class IPAddress(BaseModel):
     model_config = ConfigDict(frozen=True)
-    externalIp: IPv4Address = Field(..., description="IP address of the server as seen from an specific external element")
-    nameserverIp: IPv4Address = Field(..., description="IP address of the server according to the nameserver")
-    
\ No newline at end of file
+    externalIp: AnyIPAddress = Field(..., description="IP address of the server as seen from an specific external element")
+    nameserverIp: AnyIPAddress = Field(..., description="IP address of the server according to the nameserver")
+
+class RecordChanges(BaseModel):
+    """Difference between the records a zone currently holds and the records it should hold."""
+    model_config = ConfigDict(frozen=True)
+
+    creates: list[DNSRecord] = Field(default_factory=list, description="Desired records missing from the zone")
+    updates: list[DNSRecord] = Field(default_factory=list, description="Desired records present in the zone with a different ip")
+    unchanged: list[DNSRecord] = Field(default_factory=list, description="Desired records already up to date")
+
+class ReconciliationResult(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    created: list[DNSRecord] = Field(default_factory=list, description="Records created in the zone")
+    updated: list[DNSRecord] = Field(default_factory=list, description="Records whose ip was updated")
+    unchanged: list[DNSRecord] = Field(default_factory=list, description="Records that were already up to date")
+    failed: list[DNSRecord] = Field(default_factory=list, description="Records that could not be written")
+    deferred: list[DNSRecord] = Field(default_factory=list, description="Records whose write was held back by dampening")
+
+class RefreshStatus(str, Enum):
+    UNCHANGED = "unchanged"
+    CHANGED = "changed"
+    FAILED = "failed"
+    RATE_LIMITED = "rate_limited"
+    DEFERRED = "deferred"
+    """A write was held back by dampening"""
+
+class RefreshOutcome(BaseModel):
+    """What a refresh run observed, used to decide when the next one should happen."""
+    model_config = ConfigDict(frozen=True)
+
+    status: RefreshStatus
+    retry_after: Optional[float] = Field(default=None, ge=0, description="Seconds the nameserver asked to wait when rate limited, or until a deferred write may go")
@@ -0,0 +1,106 @@
+import asyncio
+import selectors
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Coroutine, Optional, TypeVar
+
+T = TypeVar("T")
+
+class Clock(ABC):
+    """
+    Source of time for every component that expires, schedules or measures something.\n
+    Injecting it (instead of calling `time` directly) lets tests and simulations control time.
+    """
+    @abstractmethod
+    def now(self) -> float:
+        """Current time, in seconds since the epoch."""
+        pass
+
+    @abstractmethod
+    async def sleep(self, seconds: float):
+        pass
+
+class SystemClock(Clock):
+    def now(self) -> float:
+        return time.time()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+class ManualClock(Clock):
+    """Clock that only moves when told to. Sleeping advances it instantly (yielding to the event loop once)."""
+    current: float
+
+    def __init__(self, start: float = 0):
+        self.current = start
+
+    def now(self) -> float:
+        return self.current
+
+    async def sleep(self, seconds: float):
+        self.current += seconds
+        await asyncio.sleep(0)
+
+class _VirtualSelector(selectors.DefaultSelector):
+    """Polls the real file descriptors without waiting: a wait for a timer moves the loop's time instead."""
+    _loop: "VirtualTimeLoop"
+
+    def __init__(self, loop: "VirtualTimeLoop"):
+        super().__init__()
+        self._loop = loop
+
+    def select(self, timeout: Optional[float] = None) -> list[tuple[selectors.SelectorKey, int]]:
+        ready: list[tuple[selectors.SelectorKey, int]] = super().select(0)
+        if ready or timeout == 0:
+            return ready
+        if timeout is None:
+            # No timer pending: only another thread can wake the loop up
+            return super().select(None)
+        self._loop.advance(timeout)
+        return []
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """
+    Event loop running on simulated time: whenever every task waits for a timer, the time jumps to the
+    next one instead of sleeping until it. `asyncio.sleep`, `asyncio.timeout` and `asyncio.wait_for` are
+    therefore instant, while the order of events is that of a real run.\n
+    Meant for in-memory stand-ins: real I/O is still polled, but time does not pass while it is in flight.
+    """
+    _time: float
+
+    def __init__(self):
+        self._time = 0
+        super().__init__(selector=_VirtualSelector(self))
+
+    def time(self) -> float:
+        return self._time
+
+    def advance(self, seconds: float):
+        self._time += seconds
+
+class VirtualClock(Clock):
+    """
+    Clock of a simulation run by `run` on a `VirtualTimeLoop`: hours of refreshes take a fraction of a second.
+    The components sleeping through `asyncio` and through this clock share the same simulated time.
+
+    Arguments:
+        start (float): Time at which the simulation starts, in seconds since the epoch.
+    """
+    _start: float
+    _loop: Optional[VirtualTimeLoop]
+
+    def __init__(self, start: float = 0):
+        self._start = start
+        self._loop = None
+
+    def now(self) -> float:
+        return self._start + (self._loop.time() if self._loop is not None else 0)
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+    def run(self, main: Coroutine[Any, Any, T]) -> T:
+        """Runs main on a new `VirtualTimeLoop`, like `asyncio.run`."""
+        with asyncio.Runner(loop_factory=VirtualTimeLoop) as runner:
+            self._loop = runner.get_loop() # type: ignore
+            return runner.run(main)
@@ -0,0 +1,53 @@
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+import httpx
+
+try:
+    import h2 # type: ignore # noqa: F401
+    HTTP2_AVAILABLE: bool = True
+except ImportError:
+    HTTP2_AVAILABLE: bool = False # type: ignore
+
+DEFAULT_TIMEOUT: float = 5
+KEEPALIVE_EXPIRY: float = 300
+"""Seconds an idle connection is kept open. Longer than any sensible refresh rate, so ticks reuse it."""
+LIMITS: httpx.Limits = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=KEEPALIVE_EXPIRY)
+
+def create_network_transport() -> httpx.AsyncHTTPTransport:
+    """The pooled transport `create_async_client` sends requests with, e.g. to wrap it in a `ResilientTransport`."""
+    return httpx.AsyncHTTPTransport(http2=HTTP2_AVAILABLE, limits=LIMITS)
+
+def create_async_client(base_url: str = "", headers: dict[str, str] | None = None, transport: httpx.AsyncBaseTransport | None = None) -> httpx.AsyncClient:
+    """
+    Creates a long-lived HTTP client that keeps its connections alive between requests.
+
+    The TCP and TLS handshakes are paid once per process instead of once per request. HTTP/2 is
+    negotiated when the optional `h2` package is installed, otherwise pooled HTTP/1.1 is used.
+
+    Arguments:
+        base_url (str): Prefix of every relative URL requested through the client.
+        headers (dict[str, str] | None): Headers sent with every request.
+        transport (httpx.AsyncBaseTransport | None): Replaces the network transport, e.g. with a local stand-in.
+    """
+    return httpx.AsyncClient(
+        base_url=base_url,
+        headers=headers,
+        timeout=httpx.Timeout(DEFAULT_TIMEOUT),
+        transport=transport if transport is not None else create_network_transport())
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds to wait according to a `Retry-After` header, which holds either a number of seconds or an HTTP date.
+    None if the header is missing or malformed.
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
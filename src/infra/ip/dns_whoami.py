@@ -0,0 +1,76 @@
+import asyncio
+import time
+from typing import Optional
+import dns.asyncquery
+import dns.exception
+import dns.message
+import dns.rdatatype
+
+from src.domain.value_objects import AnyIPAddress
+from src.infra.ip.interface import AsyncExternalIpInterface, parse_ip
+from src.infra.metrics.instruments import CallOutcome, record_call
+from src.infra.loggers.interface import Logger
+from src.infra.resilience import call_timeout
+
+class DnsWhoamiIp(AsyncExternalIpInterface):
+    """
+    Obtains the external IP with a single UDP query to a resolver that answers with the address of the client.
+
+    **For example:**\n
+    - OpenDNS: `myip.opendns.com` (A) at 208.67.222.222 (default)
+    - Google: `o-o.myaddr.l.google.com` (TXT) at 216.239.32.10 (ns1.google.com)
+    - OpenDNS over IPv6: `myip.opendns.com` (AAAA) at 2620:119:35::35
+
+    AAAA queries answer the IPv6 address, any other the IPv4 one.
+    """
+    _qname: str
+    _nameserver: str
+    _rdtype: dns.rdatatype.RdataType
+    _port: int
+    _timeout: float
+    _version: int
+
+    def __init__(self, qname: str = "myip.opendns.com", nameserver: str = "208.67.222.222", rdtype: str = "A", port: int = 53, timeout: float = 5):
+        self._qname = qname
+        self._nameserver = nameserver
+        self._rdtype = dns.rdatatype.from_text(rdtype)
+        self._port = port
+        self._timeout = timeout
+        self._version = 6 if self._rdtype == dns.rdatatype.AAAA else 4
+
+    async def get_ip(self, logger: Logger) -> Optional[AnyIPAddress]:
+        query = dns.message.make_query(self._qname, self._rdtype)
+        provider: str = f"dns:{self._nameserver}"
+        started: float = time.perf_counter()
+        try:
+            response = await dns.asyncquery.udp(query, self._nameserver, timeout=call_timeout(self._timeout), port=self._port)
+        except asyncio.CancelledError:
+            record_call(provider, "get_ip", CallOutcome.CANCELLED, time.perf_counter() - started)
+            raise
+        except dns.exception.Timeout:
+            record_call(provider, "get_ip", CallOutcome.TIMEOUT, time.perf_counter() - started)
+            logger.error("DNS query for %s timed out when fetching the IP from %s.", self._qname, self._nameserver)
+            return None
+        except (dns.exception.DNSException, OSError) as e:
+            record_call(provider, "get_ip", CallOutcome.ERROR, time.perf_counter() - started)
+            logger.error("An error occurred during the DNS query for %s to %s %s", self._qname, self._nameserver, e)
+            return None
+
+        duration: float = time.perf_counter() - started
+        for rrset in response.answer:
+            if rrset.rdtype != self._rdtype:
+                continue
+            for rdata in rrset:
+                # TXT answers are quoted strings, A and AAAA answers are addresses
+                text: str = rdata.to_text().strip('"')
+                try:
+                    ip: AnyIPAddress = parse_ip(text, self._version)
+                    record_call(provider, "get_ip", CallOutcome.SUCCESS, duration)
+                    logger.debug("Successfully fetched IP from %s (%s): %s", self._nameserver, self._qname, ip)
+                    return ip
+                except ValueError:
+                    continue
+
+        record_call(provider, "get_ip", CallOutcome.PARSE_ERROR, duration)
+        logger.error("No IPv%s address in the answer for %s from %s", self._version, self._qname, self._nameserver)
+        return None
@@ -1,10 +1,27 @@
 from abc import ABC, abstractmethod
-from ipaddress import IPv4Address
+from ipaddress import IPv4Address, ip_address
 from typing import Optional
 
+from src.domain.value_objects import AnyIPAddress
 from src.infra.loggers.interface import Logger
 
 class ExternalIpInterface(ABC):
     @abstractmethod
     def get_ip(self, logger: Logger) -> Optional[IPv4Address]:
         pass
+
+class AsyncExternalIpInterface(ABC):
+    """
+    Non-blocking variant of `ExternalIpInterface`, meant to run inside the asyncio event loop.\n
+    A source answers addresses of a single IP version, IPv4 unless built for IPv6.
+    """
+    @abstractmethod
+    async def get_ip(self, logger: Logger) -> Optional[AnyIPAddress]:
+        pass
+
+def parse_ip(text: str, version: int) -> AnyIPAddress:
+    """Parses an address of the given IP version. Raises ValueError if text is not one."""
+    ip: AnyIPAddress = ip_address(text)
+    if ip.version != version:
+        raise ValueError(f"{text} is not an IPv{version} address")
+    return ip
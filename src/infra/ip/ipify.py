@@ -1,25 +1,39 @@
 from ipaddress import IPv4Address, AddressValueError
-from requests import get, Response, RequestException, Timeout
 from typing import Optional
+import httpx
 
 from src.infra.ip.interface import ExternalIpInterface
+from src.infra.ip.plaintext import PlainTextIpSource
 from src.infra.loggers.interface import Logger
 
 class Ipify(ExternalIpInterface):
     def get_ip(self, logger: Logger) -> Optional[IPv4Address]:
+        # Only the synchronous client needs requests (requirements-sync.txt): importing AsyncIpify must not pull it in
+        from requests import get, Response, RequestException, Timeout
         response: Response = Response()
         try:
             response = get('https://api.ipify.org', timeout=5)
             ip: IPv4Address = IPv4Address(response.text)
-            logger.info(f"Successfully fetched IP from Ipify: {ip}")
+            logger.info("Successfully fetched IP from Ipify: %s", ip)
             return ip
         except Timeout:
             logger.error("Request timed out when fetching the IP from Ipify.")
             return None
         except AddressValueError:
-            logger.error(f"Received an invalid IPv4 address from Ipify: {response.text}")
+            logger.error("Received an invalid IPv4 address from Ipify: %s", response.text)
             return None
         except RequestException as e:
-            logger.error(f"An error occurred during the request {e}")
+            logger.error("An error occurred during the request %s", e)
             return None
-        
\ No newline at end of file
+
+IPIFY_URLS: dict[int, str] = {4: "https://api.ipify.org", 6: "https://api6.ipify.org"}
+
+class AsyncIpify(PlainTextIpSource):
+    """
+    Ipify client that reuses a pooled keep-alive connection instead of opening a new one per request.
+
+    Arguments:
+        version (int): 4 for the IPv4 address (api.ipify.org), 6 for the IPv6 one (api6.ipify.org).
+    """
+    def __init__(self, client: Optional[httpx.AsyncClient] = None, version: int = 4):
+        super().__init__(IPIFY_URLS[version], client=client, version=version, provider="ipify" if version == 4 else f"ipify{version}")
@@ -1,11 +1,24 @@
 import pytest
+import asyncio
+import httpx
 from ipaddress import IPv4Address
 
-from src.infra.ip.ipify import Ipify
+from src.infra.http import create_async_client
+from src.infra.ip.ipify import Ipify, AsyncIpify
 from src.infra.loggers.standard import StandardLogger, LogLevel
 
 def test_get_ip_success():
     ipify = Ipify()
     logger = StandardLogger(LogLevel.INFO)
     ip: IPv4Address | None = ipify.get_ip(logger)
-    
\ No newline at end of file
+    
+def test_async_get_ip_reuses_client():
+    logger = StandardLogger(LogLevel.INFO)
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, text="203.0.113.7"))
+
+    async def run() -> list[IPv4Address | None]:
+        async with create_async_client(transport=transport) as client:
+            ipify = AsyncIpify(client=client)
+            return [await ipify.get_ip(logger), await ipify.get_ip(logger)]
+
+    assert asyncio.run(run()) == [IPv4Address("203.0.113.7")] * 2
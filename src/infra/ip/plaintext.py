@@ -0,0 +1,71 @@
+import asyncio
+import time
+from typing import Optional
+import httpx
+
+from src.domain.value_objects import AnyIPAddress
+from src.infra.http import create_async_client
+from src.infra.ip.interface import AsyncExternalIpInterface, parse_ip
+from src.infra.metrics.instruments import CallOutcome, record_call
+from src.infra.resilience import CircuitOpenError
+from src.infra.loggers.interface import Logger
+
+class PlainTextIpSource(AsyncExternalIpInterface):
+    """
+    Any HTTP endpoint answering with the caller's address as plain text, such as
+    https://api.ipify.org, https://ipv4.icanhazip.com or https://checkip.amazonaws.com, or
+    https://api6.ipify.org and https://ipv6.icanhazip.com for IPv6.
+
+    Arguments:
+        version (int): Version of the addresses the endpoint answers, 4 or 6.
+        provider (Optional[str]): Name of the endpoint in the metrics. Defaults to its host.
+    """
+    _url: str
+    _provider: str
+    _client: httpx.AsyncClient
+    _version: int
+
+    def __init__(self, url: str, client: Optional[httpx.AsyncClient] = None, version: int = 4, provider: Optional[str] = None):
+        self._url = url
+        self._provider = provider if provider is not None else httpx.URL(url).host
+        self._client = client if client is not None else create_async_client()
+        self._version = version
+
+    async def get_ip(self, logger: Logger) -> Optional[AnyIPAddress]:
+        response: Optional[httpx.Response] = None
+        outcome: str = CallOutcome.ERROR
+        started: float = time.perf_counter()
+        try:
+            response = await self._client.get(self._url)
+            response.raise_for_status()
+            ip: AnyIPAddress = parse_ip(response.text.strip(), self._version)
+            outcome = CallOutcome.SUCCESS
+            logger.debug("Successfully fetched IP from %s: %s", self._url, ip)
+            return ip
+        except asyncio.CancelledError:
+            outcome = CallOutcome.CANCELLED
+            raise
+        except httpx.TimeoutException:
+            outcome = CallOutcome.TIMEOUT
+            logger.error("Request timed out when fetching the IP from %s.", self._url)
+            return None
+        except ValueError:
+            outcome = CallOutcome.PARSE_ERROR
+            logger.error("Received an invalid IPv%s address from %s: %s", self._version, self._url, response.text if response else None)
+            return None
+        except httpx.HTTPStatusError as e:
+            outcome = CallOutcome.http_status(e.response.status_code)
+            logger.error("An error occurred during the request to %s %s", self._url, e)
+            return None
+        except CircuitOpenError as e:
+            outcome = CallOutcome.CIRCUIT_OPEN
+            logger.error("Request not sent when fetching the IP from %s: %s", self._url, e)
+            return None
+        except httpx.HTTPError as e:
+            logger.error("An error occurred during the request to %s %s", self._url, e)
+            return None
+        finally:
+            record_call(self._provider, "get_ip", outcome, time.perf_counter() - started)
+
+    async def aclose(self):
+        await self._client.aclose()
@@ -0,0 +1,131 @@
+import asyncio
+import time
+from collections import Counter, deque
+from typing import Optional
+
+from src.domain.value_objects import AnyIPAddress
+from src.infra.ip.interface import AsyncExternalIpInterface
+from src.infra.loggers.interface import Logger
+from src.infra.resilience import call_timeout
+
+class SourceStats:
+    """Exponentially weighted moving average of the latency of a source, plus outcome counters."""
+    __slots__ = ("ewma_latency", "successes", "failures")
+
+    def __init__(self):
+        self.ewma_latency: Optional[float] = None
+        self.successes: int = 0
+        self.failures: int = 0
+
+class QuorumIpResolver(AsyncExternalIpInterface):
+    """
+    Queries several external IP sources and only trusts an address reported by `quorum` of them.
+
+    Sources are tried fastest first, according to the EWMA of their latency. The first `quorum`
+    are queried at once and another one is hedged in whenever the in-flight ones are slower than
+    `hedge_delay`, fail, or disagree. As soon as `quorum` answers agree the stragglers are cancelled.
+    A failure or a cancellation counts as a slow sample, so unreliable sources sink in the ranking.
+
+    Arguments:
+        sources (dict[str, AsyncExternalIpInterface]): Sources by name.
+        quorum (int): Number of agreeing answers required. Capped to the number of sources.
+        hedge_delay (float): Seconds to wait on the in-flight sources before querying another one.
+        timeout (float): Seconds after which the resolution is abandoned.
+        alpha (float): Weight of the newest sample in the latency average.
+    """
+    _sources: dict[str, AsyncExternalIpInterface]
+    _stats: dict[str, SourceStats]
+    _quorum: int
+    _hedge_delay: float
+    _timeout: float
+    _alpha: float
+
+    def __init__(self, sources: dict[str, AsyncExternalIpInterface], quorum: int = 2, hedge_delay: float = 0.5, timeout: float = 5, alpha: float = 0.3):
+        if not sources:
+            raise ValueError("QuorumIpResolver needs at least one source")
+        self._sources = sources
+        self._stats = {name: SourceStats() for name in sources}
+        self._quorum = max(1, min(quorum, len(sources)))
+        self._hedge_delay = hedge_delay
+        self._timeout = timeout
+        self._alpha = alpha
+
+    def ranking(self) -> list[str]:
+        """Source names, fastest first. Sources never measured go first, so they get measured."""
+        return sorted(self._sources, key=lambda name: self._stats[name].ewma_latency or 0)
+
+    def stats(self) -> dict[str, SourceStats]:
+        return dict(self._stats)
+
+    async def get_ip(self, logger: Logger) -> Optional[AnyIPAddress]:
+        loop = asyncio.get_running_loop()
+        deadline: float = loop.time() + call_timeout(self._timeout)
+        queue: deque[str] = deque(self.ranking())
+        in_flight: dict[asyncio.Task[Optional[AnyIPAddress]], tuple[str, float]] = {}
+        votes: Counter[AnyIPAddress] = Counter()
+        slowest_answer: float = 0
+
+        def launch():
+            name: str = queue.popleft()
+            task = asyncio.create_task(self._sources[name].get_ip(logger))
+            in_flight[task] = (name, time.perf_counter())
+
+        def launch_needed():
+            # Keep enough sources in flight for the leading answer to still reach the quorum
+            leading: int = max(votes.values(), default=0)
+            while queue and leading + len(in_flight) < self._quorum:
+                launch()
+
+        launch_needed()
+        try:
+            while in_flight:
+                remaining: float = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done, _ = await asyncio.wait(in_flight,
+                                             timeout=min(self._hedge_delay, remaining) if queue else remaining,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Every source in flight is slower than the hedge delay
+                    if queue:
+                        launch()
+                    continue
+
+                for task in done:
+                    name, started = in_flight.pop(task)
+                    latency: float = time.perf_counter() - started
+                    error: Optional[BaseException] = task.exception()
+                    if error is not None:
+                        logger.error("External IP source %s failed: %r", name, error)
+                    ip: Optional[AnyIPAddress] = None if error is not None else task.result()
+                    if ip is None:
+                        self._record(name, self._timeout, success=False)
+                        continue
+                    self._record(name, latency, success=True)
+                    slowest_answer = max(slowest_answer, latency)
+                    votes[ip] += 1
+                    if votes[ip] >= self._quorum:
+                        logger.info("External IP %s confirmed by %s source(s)", ip, votes[ip])
+                        return ip
+                launch_needed()
+        finally:
+            for task, (name, started) in in_flight.items():
+                task.cancel()
+                # A cancelled source lost the race against every answer that was waited for
+                self._record(name, max(time.perf_counter() - started, slowest_answer), success=False, lower_bound=True)
+
+        logger.error("Could not reach a quorum of %s agreeing external IP sources. Answers: %s", self._quorum, dict(votes))
+        return None
+
+    def _record(self, name: str, latency: float, success: bool, lower_bound: bool = False):
+        stats: SourceStats = self._stats[name]
+        if success:
+            stats.successes += 1
+        elif not lower_bound:
+            stats.failures += 1
+        if lower_bound and stats.ewma_latency is not None and latency <= stats.ewma_latency:
+            return
+        if stats.ewma_latency is None:
+            stats.ewma_latency = latency
+        else:
+            stats.ewma_latency = self._alpha * latency + (1 - self._alpha) * stats.ewma_latency
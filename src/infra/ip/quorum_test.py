@@ -0,0 +1,77 @@
+import asyncio
+from ipaddress import IPv4Address
+from typing import Optional
+
+from src.infra.http import create_async_client
+from src.infra.ip.interface import AsyncExternalIpInterface
+from src.infra.ip.plaintext import PlainTextIpSource
+from src.infra.ip.quorum import QuorumIpResolver
+from src.infra.loggers.standard import Logger, StandardLogger, LogLevel
+
+async def start_stand_in(body: str, delay: float = 0) -> tuple[asyncio.Server, str]:
+    """Local HTTP server answering every request with body, after delay seconds."""
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            await asyncio.sleep(delay)
+            writer.write(f"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nContent-Length: {len(body)}\r\n\r\n{body}".encode())
+            await writer.drain()
+        except (asyncio.CancelledError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port: int = server.sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}/"
+
+def test_returns_first_agreeing_answers_and_cancels_stragglers():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+
+    async def run() -> tuple[Optional[IPv4Address], float, QuorumIpResolver]:
+        stand_ins = [await start_stand_in("203.0.113.5", delay) for delay in (0, 0.05, 10)]
+        async with create_async_client() as client:
+            resolver = QuorumIpResolver({f"source-{i}": PlainTextIpSource(url, client=client) for i, (_, url) in enumerate(stand_ins)},
+                                        quorum=2, hedge_delay=0.01, timeout=5)
+            started: float = asyncio.get_running_loop().time()
+            ip: Optional[IPv4Address] = await resolver.get_ip(logger)
+            elapsed: float = asyncio.get_running_loop().time() - started
+        for server, _ in stand_ins:
+            server.close()
+        return ip, elapsed, resolver
+
+    ip, elapsed, resolver = asyncio.run(run())
+
+    assert ip == IPv4Address("203.0.113.5")
+    assert elapsed < 1
+    assert resolver.ranking()[-1] == "source-2"
+
+def test_disagreement_hedges_into_a_tie_breaker():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+
+    async def run() -> Optional[IPv4Address]:
+        stand_ins = [await start_stand_in(body) for body in ("203.0.113.5", "198.51.100.1", "203.0.113.5")]
+        async with create_async_client() as client:
+            sources: dict[str, AsyncExternalIpInterface] = {f"source-{i}": PlainTextIpSource(url, client=client) for i, (_, url) in enumerate(stand_ins)}
+            resolver = QuorumIpResolver(sources, quorum=2, hedge_delay=5, timeout=5)
+            ip: Optional[IPv4Address] = await resolver.get_ip(logger)
+        for server, _ in stand_ins:
+            server.close()
+        return ip
+
+    assert asyncio.run(run()) == IPv4Address("203.0.113.5")
+
+def test_no_quorum_returns_none():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+
+    async def run() -> Optional[IPv4Address]:
+        stand_ins = [await start_stand_in(body) for body in ("203.0.113.5", "198.51.100.1", "not an ip")]
+        async with create_async_client() as client:
+            resolver = QuorumIpResolver({f"source-{i}": PlainTextIpSource(url, client=client) for i, (_, url) in enumerate(stand_ins)},
+                                        quorum=2, hedge_delay=0.01, timeout=5)
+            ip: Optional[IPv4Address] = await resolver.get_ip(logger)
+        for server, _ in stand_ins:
+            server.close()
+        return ip
+
+    assert asyncio.run(run()) is None
@@ -0,0 +1,78 @@
+import os
+from typing import IO, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None # type: ignore
+
+from src.infra.lease.interface import LeaseBackend
+from src.infra.loggers.interface import Logger
+
+class FileLockLease(LeaseBackend):
+    """
+    Lease held as an exclusive `flock` on a file, for replicas sharing a host or a filesystem honouring
+    `flock` across hosts.
+
+    The lock is held until released, whatever the duration asked: if the holder dies, the kernel frees
+    it, and the next replica asking takes it over. The holder's name is written in the file for operators.
+    POSIX only.
+
+    Arguments:
+        path (str): Path of the lock file, created if missing.
+    """
+    _path: str
+    _file: Optional[IO[str]]
+
+    def __init__(self, path: str):
+        self._path = path
+        self._file = None
+
+    async def acquire(self, holder: str, duration: float, logger: Logger) -> bool:
+        if fcntl is None:
+            logger.error("File locks are not supported on this platform")
+            return False
+        if self._file is not None:
+            if self._still_locked():
+                return True
+            logger.warning("The lock file %s was removed or replaced. Locking it again", self._path)
+            self._unlock()
+
+        try:
+            lock_file: IO[str] = open(self._path, "a+")
+        except OSError as e:
+            logger.warning("Could not open the lock file %s: %s", self._path, e)
+            return False
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        lock_file.truncate(0)
+        lock_file.write(holder)
+        lock_file.flush()
+        self._file = lock_file
+        return True
+
+    async def release(self, holder: str, logger: Logger):
+        self._unlock()
+
+    def close(self):
+        self._unlock()
+
+    def _still_locked(self) -> bool:
+        """Whether the file locked is still the one at the path, i.e. whether another replica could lock a new one."""
+        if self._file is None:
+            return False
+        try:
+            return os.stat(self._path).st_ino == os.fstat(self._file.fileno()).st_ino
+        except OSError:
+            return False
+
+    def _unlock(self):
+        if self._file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
@@ -0,0 +1,26 @@
+from abc import ABC, abstractmethod
+
+from src.infra.loggers.interface import Logger
+
+class LeaseBackend(ABC):
+    """
+    Shared lease that replicas compete for, so that only one of them (the holder) acts at a time.
+    """
+    @abstractmethod
+    async def acquire(self, holder: str, duration: float, logger: Logger) -> bool:
+        """
+        Takes the lease for holder, or extends it if holder already has it, for `duration` seconds.
+
+        Returns:
+            bool: True if holder has the lease. False if another holder has an unexpired lease, or on error.
+        """
+        pass
+
+    @abstractmethod
+    async def release(self, holder: str, logger: Logger):
+        """Gives the lease up, if holder has it, so another replica can take it over right away."""
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
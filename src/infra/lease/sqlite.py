@@ -0,0 +1,69 @@
+import sqlite3
+from typing import Optional
+
+from src.infra.clock import Clock, SystemClock
+from src.infra.lease.interface import LeaseBackend
+from src.infra.loggers.interface import Logger
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+class SqliteLease(LeaseBackend):
+    """
+    Lease kept in a SQLite file shared by the replicas, e.g. on a common volume.
+
+    Taking or extending the lease is one `BEGIN IMMEDIATE` transaction, so two replicas can never both
+    see it free. Expiry is compared with the time of the replica asking: their clocks must agree to well
+    within the lease duration.\n
+    An attempt never waits for another replica's transaction, which would block the event loop: it fails
+    right away, and the next renewal tries again.
+
+    Arguments:
+        path (str): Path of the database file, created if missing.
+        name (str): Name of the lease, so several deployments can share a file.
+        busy_timeout (float): Seconds to wait for another replica's transaction when creating the table at startup.
+    """
+    _connection: sqlite3.Connection
+    _name: str
+    _clock: Clock
+
+    def __init__(self, path: str, name: str = "lipadns", busy_timeout: float = 1, clock: Optional[Clock] = None):
+        # Autocommit mode: transactions are opened explicitly
+        self._connection = sqlite3.connect(path, isolation_level=None, timeout=busy_timeout)
+        self._connection.executescript(SCHEMA)
+        self._connection.execute("PRAGMA busy_timeout = 0")
+        self._name = name
+        self._clock = clock if clock is not None else SystemClock()
+
+    async def acquire(self, holder: str, duration: float, logger: Logger) -> bool:
+        now: float = self._clock.now()
+        try:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                row: Optional[tuple[str, float]] = self._connection.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (self._name,)).fetchone()
+                if row is not None and row[0] != holder and row[1] > now:
+                    self._connection.execute("ROLLBACK")
+                    return False
+                self._connection.execute("INSERT OR REPLACE INTO leases (name, holder, expires_at) VALUES (?, ?, ?)", (self._name, holder, now + duration))
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+        except sqlite3.Error as e:
+            logger.warning("Could not take the lease %s: %s", self._name, e)
+            return False
+        return True
+
+    async def release(self, holder: str, logger: Logger):
+        try:
+            self._connection.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (self._name, holder))
+        except sqlite3.Error as e:
+            logger.warning("Could not release the lease %s: %s", self._name, e)
+
+    def close(self):
+        self._connection.close()
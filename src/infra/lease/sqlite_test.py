@@ -0,0 +1,61 @@
+import asyncio
+import sqlite3
+import time
+
+from src.infra.clock import ManualClock
+from src.infra.lease.filelock import FileLockLease
+from src.infra.lease.sqlite import SqliteLease
+from src.infra.loggers.standard import Logger, StandardLogger, LogLevel
+
+def test_sqlite_lease_is_exclusive_until_it_expires(tmp_path):
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    clock = ManualClock()
+    path: str = str(tmp_path / "lease.db")
+    first, second = SqliteLease(path, clock=clock), SqliteLease(path, clock=clock)
+
+    async def run() -> list[bool]:
+        taken: list[bool] = [await first.acquire("a", 15, logger), await second.acquire("b", 15, logger)]
+        clock.current = 10
+        taken += [await first.acquire("a", 15, logger), await second.acquire("b", 15, logger)]
+        clock.current = 26
+        taken.append(await second.acquire("b", 15, logger))
+        await second.release("b", logger)
+        taken.append(await first.acquire("a", 15, logger))
+        return taken
+
+    assert asyncio.run(run()) == [True, False, True, False, True, True]
+    first.close()
+    second.close()
+
+def test_sqlite_lease_does_not_wait_for_a_locked_file(tmp_path):
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    path: str = str(tmp_path / "lease.db")
+    lease = SqliteLease(path, busy_timeout=5)
+    # Another replica in the middle of a transaction
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+
+    started: float = time.perf_counter()
+    assert not asyncio.run(lease.acquire("a", 15, logger))
+    assert time.perf_counter() - started < 1
+
+    other.execute("ROLLBACK")
+    assert asyncio.run(lease.acquire("a", 15, logger))
+    other.close()
+    lease.close()
+
+def test_file_lock_lease_is_freed_on_release(tmp_path):
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    path: str = str(tmp_path / "lease.lock")
+    first, second = FileLockLease(path), FileLockLease(path)
+
+    async def run() -> list[bool]:
+        taken: list[bool] = [await first.acquire("a", 15, logger), await second.acquire("b", 15, logger), await first.acquire("a", 15, logger)]
+        await first.release("a", logger)
+        taken.append(await second.acquire("b", 15, logger))
+        return taken
+
+    assert asyncio.run(run()) == [True, False, True, True]
+    with open(path) as lock_file:
+        assert lock_file.read() == "b"
+    second.close()
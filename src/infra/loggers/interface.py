@@ -18,6 +18,8 @@ class Logger(ABC):
     **Warning**: Might indicate that an operation will fail in the future if action is not taken now.\n
     **Error**: This category is assigned to event logs that contain an application error message.\n
     **Critical**: This category is assigned for critical errors, such as hardware failure.\n
+    Messages take `%`-style arguments (`logger.info("Updated %s to %s", name, ip)`), so nothing is
+    formatted for the messages below the level of the logger.
     """
     @abstractmethod
     def __init__(self, log_level: LogLevel):
@@ -50,4 +52,8 @@ class Logger(ABC):
     @abstractmethod
     def critical(self, message: str, *args: Any, **kwargs: Any):
         """A serious error, indicating that the program itself may be unable to continue running."""
-        pass
\ No newline at end of file
+        pass
+
+    def close(self):
+        """Flushes and releases whatever the logger holds. Nothing to do by default."""
+        pass
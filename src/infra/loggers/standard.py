@@ -1,17 +1,53 @@
+import json
 import logging
 import logging.handlers
-from typing import Any
+import queue
+from datetime import datetime, timezone
+from typing import Any, Optional
 from os import mkdir
-from os.path import isdir
+from os.path import isdir, join
 from sys import stdout
 
 from src.infra.loggers.interface import Logger, LogLevel
 
+class JsonLinesFormatter(logging.Formatter):
+    """Formats every record as a single-line JSON object, for log collectors."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records as they are, so that even the formatting of the message happens in the listener thread.
+    The arguments of a message must therefore not be mutated after the call that logged them.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
 class StandardLogger(Logger):
     """
     Logger implementation that uses the Standard "Logging" Library.
+
+    Messages take `%`-style arguments, which are only formatted once the level check passed.\n
+    With `queued`, records are put on an unbounded queue and written to the file and to stdout by a
+    background thread, so a slow disk or a blocked stdout never stalls the event loop. Call `close`
+    before exiting to flush the queue.
+
+    Arguments:
+        log_level (LogLevel): Least severe level written.
+        queued (bool): Write from a background thread instead of the calling one.
+        json_lines (bool): Write one JSON object per line instead of plain text.
+        log_directory (str): Directory of the daily rotated log file.
     """
-    def __init__(self, log_level: LogLevel):
+    _listener: Optional[logging.handlers.QueueListener]
+
+    def __init__(self, log_level: LogLevel, queued: bool = False, json_lines: bool = False, log_directory: str = "logs"):
         logging_level: Any
 
         match log_level:
@@ -28,13 +64,13 @@ class StandardLogger(Logger):
             case _: # type: ignore
                 logging_level = logging.DEBUG
         
-        if not isdir("logs"):
-            mkdir("logs")
+        if not isdir(log_directory):
+            mkdir(log_directory)
 
-        formatter = logging.Formatter("%(asctime)s | %(levelname)-8s | %(message)s")
+        formatter: logging.Formatter = JsonLinesFormatter() if json_lines else logging.Formatter("%(asctime)s | %(levelname)-8s | %(message)s")
         
         timed_file_handler = logging.handlers.TimedRotatingFileHandler(
-            filename='logs\\logs.txt',
+            filename=join(log_directory, "logs.txt"),
             when='midnight',
             backupCount=0,
             utc=False)
@@ -44,8 +80,15 @@ class StandardLogger(Logger):
         console_handler.setFormatter(formatter)
 
         logger = logging.getLogger()
-        logger.addHandler(timed_file_handler)
-        logger.addHandler(console_handler)
+        self._listener = None
+        if queued:
+            records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+            self._listener = logging.handlers.QueueListener(records, timed_file_handler, console_handler)
+            self._listener.start()
+            logger.addHandler(DeferredQueueHandler(records))
+        else:
+            logger.addHandler(timed_file_handler)
+            logger.addHandler(console_handler)
         logger.setLevel(logging_level)
 
     def _log(self, level: LogLevel, message: str, *args: Any, **kwargs: Any):
@@ -65,4 +108,9 @@ class StandardLogger(Logger):
 
     def critical(self, message: str, *args: Any, **kwargs: Any):
         logging.critical(message, *args, **kwargs)
-        
\ No newline at end of file
+
+    def close(self):
+        """Writes the records still queued, then stops the background thread."""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
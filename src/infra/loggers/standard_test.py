@@ -0,0 +1,32 @@
+import json
+import logging
+from os.path import join
+
+from src.infra.loggers.interface import LogLevel
+from src.infra.loggers.standard import StandardLogger
+
+class Formatted:
+    """Records whether it was ever turned into a string."""
+    formatted: bool = False
+
+    def __str__(self) -> str:
+        self.formatted = True
+        return "formatted"
+
+def test_queued_json_lines(tmp_path):
+    root = logging.getLogger()
+    handlers: list[logging.Handler] = list(root.handlers)
+    logger = StandardLogger(LogLevel.INFO, queued=True, json_lines=True, log_directory=str(tmp_path))
+    try:
+        skipped = Formatted()
+        logger.debug("Dropped %s", skipped)
+        logger.info("Updated %s to %s", "home.example.com", "203.0.113.1")
+    finally:
+        logger.close()
+        for handler in root.handlers[len(handlers):]:
+            root.removeHandler(handler)
+
+    assert not skipped.formatted
+    with open(join(str(tmp_path), "logs.txt")) as log_file:
+        entries = [json.loads(line) for line in log_file]
+    assert [(entry["level"], entry["message"]) for entry in entries] == [("INFO", "Updated home.example.com to 203.0.113.1")]
@@ -0,0 +1,109 @@
+import time
+from typing import Optional
+
+from src.domain.value_objects import RefreshStatus
+from src.infra.metrics.registry import REGISTRY, Counter, Gauge, Histogram
+
+class CallOutcome:
+    SUCCESS: str = "success"
+    TIMEOUT: str = "timeout"
+    CONNECTION_ERROR: str = "connection_error"
+    PARSE_ERROR: str = "parse_error"
+    CANCELLED: str = "cancelled"
+    """Abandoned by the caller, e.g. a straggler of a hedged request"""
+    THROTTLED: str = "throttled"
+    """Not sent: the rate limiter did not admit the call in time"""
+    CIRCUIT_OPEN: str = "circuit_open"
+    """Not sent: the circuit of the endpoint is open after repeated failures"""
+    ERROR: str = "error"
+
+    @staticmethod
+    def http_status(status_code: int) -> str:
+        """Outcome of a call answered with an error status, by class: http_4xx, http_5xx..."""
+        return f"http_{status_code // 100}xx"
+
+PROVIDER_CALL_DURATION: Histogram = REGISTRY.histogram(
+    "lipadns_provider_call_duration_seconds",
+    "Duration of the calls to external providers (IP sources, nameservers)",
+    ("provider", "operation"))
+PROVIDER_CALLS: Counter = REGISTRY.counter(
+    "lipadns_provider_calls_total",
+    "Calls to external providers by outcome. A response that cannot be decoded counts once as its HTTP outcome and once as parse_error",
+    ("provider", "operation", "outcome"))
+TICK_DURATION: Histogram = REGISTRY.histogram(
+    "lipadns_tick_duration_seconds",
+    "Duration of the refresh runs, by what they observed",
+    ("status",))
+LAST_SUCCESS: Gauge = REGISTRY.gauge(
+    "lipadns_last_success_timestamp_seconds",
+    "Time of the last refresh run that checked (and if needed fixed) every record")
+SECONDS_SINCE_LAST_SUCCESS: Gauge = REGISTRY.gauge(
+    "lipadns_seconds_since_last_success",
+    "Seconds since the last refresh run that checked (and if needed fixed) every record, i.e. how stale the records may be")
+CHANGES_DETECTED: Counter = REGISTRY.counter(
+    "lipadns_changes_detected_total",
+    "Changes detected, by source: refresh (the records were out of date) or watcher (an address change event)",
+    ("source",))
+WRITES_SUPPRESSED: Counter = REGISTRY.counter(
+    "lipadns_writes_suppressed_total",
+    "Held record writes that never happened, by reason: coalesced (superseded by a write to another IP) or reverted (the IP went back to the one the record holds)",
+    ("reason",))
+WRITES_DEFERRED: Counter = REGISTRY.counter(
+    "lipadns_writes_deferred_total",
+    "Observations whose record write was held back, by reason: unstable (the IP is too recent), window (the record was written too recently) or rate (the hourly cap of the record was reached)",
+    ("reason",))
+LEADER: Gauge = REGISTRY.gauge(
+    "lipadns_leader",
+    "1 while this replica holds the lease and runs the refreshes, 0 while it follows")
+LEADER_CHANGES: Counter = REGISTRY.counter(
+    "lipadns_leader_changes_total",
+    "Leadership transitions of this replica: acquired or lost",
+    ("transition",))
+LEASE_CALL_DURATION: Histogram = REGISTRY.histogram(
+    "lipadns_lease_call_duration_seconds",
+    "Duration of the calls to the lease backend, by operation: acquire (as a follower) or renew (as the leader)",
+    ("operation",))
+CIRCUIT_STATE: Gauge = REGISTRY.gauge(
+    "lipadns_circuit_state",
+    "State of the circuit breaker of each provider endpoint: 0 closed, 1 half-open (probing), 2 open (failing fast)",
+    ("endpoint",))
+HEDGED_REQUESTS: Counter = REGISTRY.counter(
+    "lipadns_hedged_requests_total",
+    "Requests hedged with a second attempt after being slower than usual, by the attempt that answered: first, hedge or none",
+    ("endpoint", "winner"))
+RATE_LIMITER_CALLS: Counter = REGISTRY.counter(
+    "lipadns_rate_limiter_calls_total",
+    "Requests through the rate limiter of an API, by outcome: admitted (sent), throttled (had to queue for a token) or expired (turned away at their deadline while queued)",
+    ("limiter", "outcome"))
+RATE_LIMITED_RESPONSES: Counter = REGISTRY.counter(
+    "lipadns_rate_limited_responses_total",
+    "429 responses reported to the rate limiter of an API, each pausing its admissions",
+    ("limiter",))
+RATE_LIMITER_TOKENS: Gauge = REGISTRY.gauge(
+    "lipadns_rate_limiter_tokens",
+    "Tokens left in the bucket of the rate limiter of an API, i.e. requests it can send back-to-back right now",
+    ("limiter",))
+RATE_LIMITER_QUEUE_DEPTH: Gauge = REGISTRY.gauge(
+    "lipadns_rate_limiter_queue_depth",
+    "Requests queued for a token in the rate limiter of an API",
+    ("limiter",))
+
+def record_call(provider: str, operation: str, outcome: str, duration: Optional[float] = None):
+    """Counts a provider call and, if its duration is given, observes it."""
+    PROVIDER_CALLS.inc(provider, operation, outcome)
+    if duration is not None:
+        PROVIDER_CALL_DURATION.observe(duration, provider, operation)
+
+def record_tick(status: RefreshStatus, duration: float):
+    TICK_DURATION.observe(duration, status.value)
+    # A deferred write leaves the record stale on purpose: it is not a success until written
+    if status in (RefreshStatus.UNCHANGED, RefreshStatus.CHANGED):
+        LAST_SUCCESS.set(time.time())
+    if status == RefreshStatus.CHANGED:
+        CHANGES_DETECTED.inc("refresh")
+
+def _seconds_since_last_success() -> Optional[float]:
+    last_success: Optional[float] = LAST_SUCCESS.value()
+    return time.time() - last_success if last_success is not None else None
+
+SECONDS_SINCE_LAST_SUCCESS.set_function(_seconds_since_last_success)
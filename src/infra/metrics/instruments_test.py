@@ -0,0 +1,11 @@
+from src.domain.value_objects import RefreshStatus
+from src.infra.metrics.instruments import LAST_SUCCESS, record_tick
+
+def test_only_up_to_date_records_count_as_a_success():
+    LAST_SUCCESS.set(0)
+    for status in (RefreshStatus.DEFERRED, RefreshStatus.FAILED, RefreshStatus.RATE_LIMITED):
+        record_tick(status, duration=0.1)
+    assert LAST_SUCCESS.value() == 0
+
+    record_tick(RefreshStatus.UNCHANGED, duration=0.1)
+    assert (LAST_SUCCESS.value() or 0) > 0
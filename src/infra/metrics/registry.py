@@ -0,0 +1,181 @@
+import math
+from bisect import bisect_left
+from typing import Callable, Optional
+
+LabelValues = tuple[str, ...]
+
+DEFAULT_BUCKETS: tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+"""Upper bounds, in seconds, of the latency histogram buckets."""
+
+class Metric:
+    """
+    A metric family: one value (or set of values, for histograms) per combination of label values.
+    Updates are plain attribute writes, cheap enough to sit on every API call.
+    """
+    kind: str = "untyped"
+    name: str
+    help: str
+    label_names: tuple[str, ...]
+
+    def __init__(self, name: str, help: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+
+    def render(self) -> list[str]:
+        lines: list[str] = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def _check(self, labels: LabelValues):
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} expects the labels {self.label_names}, got {labels}")
+
+    def _labels(self, labels: LabelValues, extra: Optional[tuple[str, str]] = None) -> str:
+        pairs: list[tuple[str, str]] = list(zip(self.label_names, labels))
+        if extra is not None:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+class Counter(Metric):
+    kind = "counter"
+    _values: dict[LabelValues, float]
+
+    def __init__(self, name: str, help: str, label_names: tuple[str, ...] = ()):
+        super().__init__(name, help, label_names)
+        self._values = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._check(labels)
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def _samples(self) -> list[str]:
+        return [f"{self.name}{self._labels(labels)} {_format(value)}" for labels, value in self._values.items()]
+
+class Gauge(Metric):
+    """A value that goes up and down. `set_function` makes it computed at scrape time instead."""
+    kind = "gauge"
+    _values: dict[LabelValues, float]
+    _functions: dict[LabelValues, Callable[[], Optional[float]]]
+
+    def __init__(self, name: str, help: str, label_names: tuple[str, ...] = ()):
+        super().__init__(name, help, label_names)
+        self._values = {}
+        self._functions = {}
+
+    def set(self, value: float, *labels: str):
+        self._check(labels)
+        self._values[labels] = value
+
+    def set_function(self, function: Callable[[], Optional[float]], *labels: str):
+        """`function` is called on every scrape. The sample is omitted while it returns None."""
+        self._check(labels)
+        self._functions[labels] = function
+
+    def value(self, *labels: str) -> Optional[float]:
+        if labels in self._functions:
+            return self._functions[labels]()
+        return self._values.get(labels)
+
+    def _samples(self) -> list[str]:
+        samples: list[str] = [f"{self.name}{self._labels(labels)} {_format(value)}" for labels, value in self._values.items()]
+        for labels, function in self._functions.items():
+            value: Optional[float] = function()
+            if value is not None:
+                samples.append(f"{self.name}{self._labels(labels)} {_format(value)}")
+        return samples
+
+class _HistogramValues:
+    __slots__ = ("bucket_counts", "count", "sum")
+
+    def __init__(self, buckets: int):
+        self.bucket_counts: list[int] = [0] * buckets
+        self.count: int = 0
+        self.sum: float = 0
+
+class Histogram(Metric):
+    kind = "histogram"
+    buckets: tuple[float, ...]
+    _values: dict[LabelValues, _HistogramValues]
+
+    def __init__(self, name: str, help: str, label_names: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+
+    def observe(self, value: float, *labels: str):
+        values: Optional[_HistogramValues] = self._values.get(labels)
+        if values is None:
+            self._check(labels)
+            values = self._values[labels] = _HistogramValues(len(self.buckets))
+        # Counts are stored per bucket and accumulated when rendering, so an observation costs one increment
+        index: int = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            values.bucket_counts[index] += 1
+        values.count += 1
+        values.sum += value
+
+    def count(self, *labels: str) -> int:
+        values: Optional[_HistogramValues] = self._values.get(labels)
+        return values.count if values is not None else 0
+
+    def _samples(self) -> list[str]:
+        samples: list[str] = []
+        for labels, values in self._values.items():
+            cumulative: int = 0
+            for bound, bucket_count in zip(self.buckets, values.bucket_counts):
+                cumulative += bucket_count
+                samples.append(f"{self.name}_bucket{self._labels(labels, ('le', _format(bound)))} {cumulative}")
+            samples.append(f"{self.name}_bucket{self._labels(labels, ('le', '+Inf'))} {values.count}")
+            samples.append(f"{self.name}_count{self._labels(labels)} {values.count}")
+            samples.append(f"{self.name}_sum{self._labels(labels)} {_format(values.sum)}")
+        return samples
+
+class Registry:
+    """Set of metrics rendered together in the Prometheus text exposition format."""
+    _metrics: dict[str, Metric]
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, label_names: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, label_names)) # type: ignore
+
+    def gauge(self, name: str, help: str, label_names: tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, help, label_names)) # type: ignore
+
+    def histogram(self, name: str, help: str, label_names: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, label_names, buckets)) # type: ignore
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+"""Registry of the process, served by `MetricsServer` by default."""
+
+def _format(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
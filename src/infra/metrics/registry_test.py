@@ -0,0 +1,58 @@
+import asyncio
+
+from src.infra.loggers.standard import Logger, StandardLogger, LogLevel
+from src.infra.metrics.registry import Registry
+from src.infra.metrics.server import MetricsServer
+
+def test_render_prometheus_text():
+    registry = Registry()
+    calls = registry.counter("calls_total", "Calls", ("provider", "outcome"))
+    duration = registry.histogram("call_duration_seconds", "Duration", ("provider",), buckets=(0.1, 1))
+    staleness = registry.gauge("staleness_seconds", "Staleness")
+    calls.inc("ipify", "success")
+    calls.inc("ipify", "success")
+    calls.inc("cloud\"flare", "http_5xx")
+    for value in (0.05, 0.5, 5):
+        duration.observe(value, "ipify")
+    staleness.set_function(lambda: 12.5)
+
+    assert registry.render().splitlines() == [
+        "# HELP calls_total Calls",
+        "# TYPE calls_total counter",
+        'calls_total{provider="ipify",outcome="success"} 2',
+        'calls_total{provider="cloud\\"flare",outcome="http_5xx"} 1',
+        "# HELP call_duration_seconds Duration",
+        "# TYPE call_duration_seconds histogram",
+        'call_duration_seconds_bucket{provider="ipify",le="0.1"} 1',
+        'call_duration_seconds_bucket{provider="ipify",le="1"} 2',
+        'call_duration_seconds_bucket{provider="ipify",le="+Inf"} 3',
+        'call_duration_seconds_count{provider="ipify"} 3',
+        'call_duration_seconds_sum{provider="ipify"} 5.55',
+        "# HELP staleness_seconds Staleness",
+        "# TYPE staleness_seconds gauge",
+        "staleness_seconds 12.5",
+    ]
+
+def test_server_answers_scrapes():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    registry = Registry()
+    registry.counter("ticks_total", "Ticks").inc()
+
+    async def scrape(server: MetricsServer, path: str) -> bytes:
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        response: bytes = await reader.read()
+        writer.close()
+        return response
+
+    async def run() -> tuple[bytes, bytes]:
+        server = MetricsServer(port=0, registry=registry)
+        assert await server.start(logger)
+        try:
+            return await scrape(server, "/metrics"), await scrape(server, "/")
+        finally:
+            await server.stop()
+
+    metrics, not_found = asyncio.run(run())
+    assert metrics.startswith(b"HTTP/1.1 200 OK") and metrics.endswith(b"ticks_total 1\n")
+    assert not_found.startswith(b"HTTP/1.1 404")
@@ -0,0 +1,71 @@
+import asyncio
+from typing import Optional
+
+from src.infra.loggers.interface import Logger
+from src.infra.metrics.registry import REGISTRY, Registry
+
+CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+
+class MetricsServer:
+    """
+    Minimal HTTP server answering `GET /metrics` with the registry in the Prometheus text format.
+    It runs on the application's event loop, so scraping needs no thread and no extra dependency.
+
+    Arguments:
+        port (int): Port to listen on. 0 picks a free one (see `port` once started).
+        host (str): Address to listen on. Only local clients by default.
+    """
+    _host: str
+    _port: int
+    _registry: Registry
+    _server: Optional[asyncio.Server]
+
+    def __init__(self, port: int, host: str = "127.0.0.1", registry: Registry = REGISTRY):
+        self._host = host
+        self._port = port
+        self._registry = registry
+        self._server = None
+
+    @property
+    def port(self) -> int:
+        if self._server is not None and self._server.sockets:
+            return self._server.sockets[0].getsockname()[1]
+        return self._port
+
+    async def start(self, logger: Logger) -> bool:
+        try:
+            self._server = await asyncio.start_server(self._handle, self._host, self._port)
+        except OSError as e:
+            logger.error("Could not serve the metrics on %s:%s: %s", self._host, self._port, e)
+            return False
+        logger.info("Serving metrics on http://%s:%s/metrics", self._host, self.port)
+        return True
+
+    async def stop(self):
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line: bytes = await asyncio.wait_for(reader.readline(), timeout=5)
+            # The headers are not needed, but are read so the client is not reset while still sending them
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts: list[str] = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] in ("GET", "HEAD") and parts[1].split("?")[0] == "/metrics":
+                body: bytes = self._registry.render().encode()
+                self._respond(writer, "200 OK", body if parts[0] == "GET" else b"", len(body))
+            else:
+                self._respond(writer, "404 Not Found", b"Not Found\n", 10)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _respond(writer: asyncio.StreamWriter, status: str, body: bytes, length: int):
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {CONTENT_TYPE}\r\nContent-Length: {length}\r\nConnection: close\r\n\r\n".encode() + body)
@@ -0,0 +1,131 @@
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from src.domain.value_objects import AnyIPAddress, RecordType
+from src.domain.reconciliation import record_key
+from src.infra.clock import Clock, SystemClock
+from src.infra.state.interface import StateStore, StoredRecord, StoredRecordKey
+
+CacheKey = tuple[str, str, RecordType]
+"""(zone, name, type)"""
+
+class CachedRecord:
+    """What a nameserver is known to hold for a record, as of `fetched_at`."""
+    __slots__ = ("record_id", "content", "fetched_at", "expires_at")
+
+    def __init__(self, record_id: str, content: AnyIPAddress, fetched_at: float, expires_at: float):
+        self.record_id = record_id
+        self.content = content
+        self.fetched_at = fetched_at
+        self.expires_at = expires_at
+
+class RecordCache:
+    """
+    Write-through cache of the id and content of DNS records, per (zone, name, type).
+
+    Nameservers read it before calling their API and update it after every successful write, so a
+    steady-state tick can be answered without any API call. Entries expire after `ttl` seconds, which
+    forces a periodic verification read that catches records changed out of band.\n
+    When a `StateStore` is given, the cache is loaded from it and every change is written through to it,
+    so a restarted process starts with the entries that are still fresh. Entries keep the age they had
+    when they were stored: a restart never extends their life.
+    """
+    _ttl: float
+    _clock: Clock
+    _entries: dict[CacheKey, CachedRecord]
+    _store: Optional[StateStore]
+    _pending_upserts: dict[CacheKey, StoredRecord]
+    _pending_deletes: set[CacheKey]
+    _transaction_depth: int
+
+    def __init__(self, ttl: float, clock: Optional[Clock] = None, store: Optional[StateStore] = None):
+        self._ttl = ttl
+        self._clock = clock if clock is not None else SystemClock()
+        self._entries = {}
+        self._store = store
+        self._pending_upserts = {}
+        self._pending_deletes = set()
+        self._transaction_depth = 0
+        if store is not None:
+            self._load(store)
+
+    def get(self, zone: str, name: str, record_type: RecordType) -> Optional[CachedRecord]:
+        """Returns the entry if it exists and has not expired."""
+        key: CacheKey = self._key(zone, name, record_type)
+        entry: Optional[CachedRecord] = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= self._clock.now():
+            del self._entries[key]
+            return None
+        return entry
+
+    def put(self, zone: str, name: str, record_type: RecordType, record_id: str, content: AnyIPAddress):
+        now: float = self._clock.now()
+        key: CacheKey = self._key(zone, name, record_type)
+        self._entries[key] = CachedRecord(record_id=record_id,
+                                          content=content,
+                                          fetched_at=now,
+                                          expires_at=now + self._ttl)
+        if self._store is not None:
+            self._pending_deletes.discard(key)
+            self._pending_upserts[key] = StoredRecord(zone=key[0], name=key[1], type=key[2], record_id=record_id, content=content, fetched_at=now)
+            self._flush()
+
+    def invalidate(self, zone: Optional[str] = None, name: Optional[str] = None, record_type: Optional[RecordType] = None):
+        """Drops every entry matching the given fields. Without arguments, empties the cache."""
+        if zone is not None and name is not None and record_type is not None:
+            keys: list[CacheKey] = [self._key(zone, name, record_type)]
+        else:
+            normalized_name: Optional[str] = None if name is None else record_key(name, RecordType.A)[0]
+            keys = [key for key in self._entries
+                    if (zone is None or key[0] == zone) and (normalized_name is None or key[1] == normalized_name) and (record_type is None or key[2] == record_type)]
+        for key in keys:
+            self._entries.pop(key, None)
+            if self._store is not None:
+                self._pending_upserts.pop(key, None)
+                self._pending_deletes.add(key)
+        self._flush()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Groups the changes made inside the block into a single write to the store."""
+        self._transaction_depth += 1
+        try:
+            yield
+        finally:
+            self._transaction_depth -= 1
+            self._flush()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _load(self, store: StateStore):
+        expired: list[StoredRecordKey] = []
+        now: float = self._clock.now()
+        for stored_record in store.load_records():
+            expires_at: float = stored_record.fetched_at + self._ttl
+            if expires_at <= now:
+                expired.append(stored_record.key)
+                continue
+            self._entries[stored_record.key] = CachedRecord(record_id=stored_record.record_id,
+                                                            content=stored_record.content,
+                                                            fetched_at=stored_record.fetched_at,
+                                                            expires_at=expires_at)
+        store.apply(upserts=[], deletes=expired)
+
+    def _flush(self):
+        if self._store is None or self._transaction_depth > 0:
+            return
+        if not self._pending_upserts and not self._pending_deletes:
+            return
+        upserts: list[StoredRecord] = list(self._pending_upserts.values())
+        deletes: list[StoredRecordKey] = list(self._pending_deletes)
+        self._pending_upserts = {}
+        self._pending_deletes = set()
+        self._store.apply(upserts=upserts, deletes=deletes)
+
+    @staticmethod
+    def _key(zone: str, name: str, record_type: RecordType) -> CacheKey:
+        normalized_name, _ = record_key(name, record_type)
+        return (zone, normalized_name, record_type)
@@ -0,0 +1,31 @@
+from ipaddress import IPv4Address
+
+from src.domain.value_objects import RecordType
+from src.infra.clock import ManualClock
+from src.infra.nameserver.cache import RecordCache
+
+def test_entries_expire_after_ttl():
+    clock = ManualClock()
+    cache = RecordCache(ttl=60, clock=clock)
+    cache.put("zone", "Home.Example.com.", RecordType.A, "abc", IPv4Address("203.0.113.1"))
+
+    clock.current = 59
+    entry = cache.get("zone", "home.example.com", RecordType.A)
+    assert entry and entry.record_id == "abc" and entry.content == IPv4Address("203.0.113.1")
+
+    clock.current = 60
+    assert cache.get("zone", "home.example.com", RecordType.A) is None
+    assert len(cache) == 0
+
+def test_invalidate():
+    cache = RecordCache(ttl=60, clock=ManualClock())
+    for zone in ("zone-a", "zone-b"):
+        for name in ("a.example.com", "b.example.com"):
+            cache.put(zone, name, RecordType.A, f"{zone}-{name}", IPv4Address("203.0.113.1"))
+
+    cache.invalidate("zone-a", "a.example.com", RecordType.A)
+    assert cache.get("zone-a", "a.example.com", RecordType.A) is None
+    cache.invalidate(name="B.example.com")
+    assert cache.get("zone-b", "b.example.com", RecordType.A) is None
+    cache.invalidate(zone="zone-b")
+    assert len(cache) == 0
@@ -2,11 +2,13 @@ from ipaddress import IPv4Address
 from typing import Optional
 from requests import get, post, patch, Response, RequestException, ConnectionError, HTTPError, Timeout
 
-from src.domain.value_objects import DNSRecord
+from src.domain.value_objects import DNSRecord, ReconciliationResult, RecordChanges
+from src.domain.reconciliation import RecordKey, record_key, diff_records
 from src.infra.loggers.interface import Logger
 from src.infra.nameserver.interface import NameserverInterface
-from src.infra.nameserver.cloudflare.dtos import CloudflareListDNSRecordsInputDTO, CloudflareDNSRecordInputDTO, CloudflareDNSRecordOutputDTO
+from src.infra.nameserver.cloudflare.dtos import CloudflareListDNSRecordsInputDTO, CloudflareDNSRecordInputDTO, CloudflareDNSRecordOutputDTO, CloudflareBatchDNSRecordsInputDTO
 from src.infra.nameserver.cloudflare.exceptions import MultipleDNSRecordsFoundError
+from src.infra.nameserver.cloudflare.payloads import LIST_PAGE_SIZE, BATCH_SIZE, BatchPlan, Payload, build_batch, is_last_page
 
 class CloudflareNameserver(NameserverInterface):
     _cloudflare_api_key: str
@@ -49,7 +51,7 @@ class CloudflareNameserver(NameserverInterface):
         return DNSRecord(ip=cloudflare_dns_record.content,
                          name=cloudflare_dns_record.name)
 
-    def set_record(self, dns_record: DNSRecord, logger: Logger):
+    def set_record(self, dns_record: DNSRecord, logger: Logger) -> bool:
         lookup_information: dict[str, str | IPv4Address] = {
             "name": dns_record.name,
             "type": "A" # IPv4
@@ -68,19 +70,19 @@ class CloudflareNameserver(NameserverInterface):
             try:
                 response = post(url=url, headers=self._headers, json=output_dto.model_dump(), timeout=5)
                 response.raise_for_status()
-                logger.info(f"Successfully created the Cloudflare DNS Record with params: {output_dto.model_dump()}")
+                logger.info("Successfully created the Cloudflare DNS Record with params: %s", output_dto.model_dump())
             except ConnectionError as e:
-                logger.error(f"Connection Error. Failed to connect to the Cloudflare API: {e.response}")
-                return
+                logger.error("Connection Error. Failed to connect to the Cloudflare API: %s", e.response)
+                return False
             except HTTPError as e:
-                logger.error(f"HTTP Error [Status code {e.response.status_code}]. Invalid HTTP Response: {e.response.json()}.\nRequest URL: {e.request.url}\nRequest body: {e.request.body}")
-                return
+                logger.error("HTTP Error [Status code %s]. Invalid HTTP Response: %s.\nRequest URL: %s\nRequest body: %s", e.response.status_code, e.response.text, e.request.url, e.request.body)
+                return False
             except Timeout:
                 logger.error("Request timed out when fetching the DNS Record from Cloudflare")
-                return
+                return False
             except RequestException as e:
-                logger.error(f"An error occurred during the request {e.response}")
-                return
+                logger.error("An error occurred during the request %s", e.response)
+                return False
         else:
             # If exists, update it
             url: str = f"https://api.cloudflare.com/client/v4/zones/{self._cloudflare_zone_id}/dns_records/{existing_record.id}"
@@ -90,20 +92,134 @@ class CloudflareNameserver(NameserverInterface):
             patch_information["proxied"] = True
 
             try:
-                patch(url=url, headers=self._headers, json=patch_information, timeout=5)
+                response = patch(url=url, headers=self._headers, json=patch_information, timeout=5)
+                response.raise_for_status()
             except ConnectionError as e:
-                logger.error(f"Connection Error. Failed to connect to the Cloudflare API: {e.response}")
-                return
+                logger.error("Connection Error. Failed to connect to the Cloudflare API: %s", e.response)
+                return False
             except HTTPError as e:
-                logger.error(f"HTTP Error. Invalid HTTP Response: {e.response}")
-                return
+                logger.error("HTTP Error. Invalid HTTP Response: %s", e.response)
+                return False
             except Timeout:
                 logger.error("Request timed out when fetching the DNS Record from Cloudflare")
-                return
+                return False
             except RequestException as e:
-                logger.error(f"An error occurred during the request {e.response}")
-                return
+                logger.error("An error occurred during the request %s", e.response)
+                return False
+
+        return True
+
+    def reconcile(self, dns_records: list[DNSRecord], logger: Logger) -> Optional[ReconciliationResult]:
+        """
+        Lists the zone once per record type, diffs it against dns_records in memory and sends
+        the creations and updates through the batch endpoint.
+        """
+        existing_index: dict[RecordKey, CloudflareDNSRecordInputDTO] = {}
+        duplicates: set[RecordKey] = set()
+        for record_type in {dns_record.type for dns_record in dns_records}:
+            cloudflare_dns_records: Optional[list[CloudflareDNSRecordInputDTO]] = self._list_cloudflare_records(params={"type": record_type.value}, logger=logger)
+            if cloudflare_dns_records is None:
+                return None
+            for cloudflare_dns_record in cloudflare_dns_records:
+                key: RecordKey = record_key(cloudflare_dns_record.name, record_type)
+                if key in existing_index:
+                    duplicates.add(key)
+                existing_index[key] = cloudflare_dns_record
+
+        # Which of several records with the same name to write is anyone's guess: leave them all as they are
+        failed: list[DNSRecord] = [dns_record for dns_record in dns_records if record_key(dns_record.name, dns_record.type) in duplicates]
+        for dns_record in failed:
+            logger.error("Found several Cloudflare %s DNS Records named %s. Left them as they are: delete all but one", dns_record.type.value, dns_record.name)
+
+        changes: RecordChanges = diff_records(
+            existing={key: DNSRecord(ip=record.content, name=record.name, type=key[1]) for key, record in existing_index.items()},
+            desired=[dns_record for dns_record in dns_records if dns_record not in failed])
+
+        created: list[DNSRecord] = []
+        updated: list[DNSRecord] = []
+        pending: list[DNSRecord] = changes.creates + changes.updates
+        for start in range(0, len(pending), BATCH_SIZE):
+            chunk: list[DNSRecord] = pending[start:start + BATCH_SIZE]
+
+            plan: BatchPlan = build_batch(dns_records=chunk, existing_index=existing_index)
+
+            # Batches are applied atomically, so a chunk either succeeds or fails as a whole
+            if self._batch_cloudflare_records(posts=plan.posts, patches=plan.patches, logger=logger):
+                created.extend(plan.creates)
+                updated.extend(plan.updates)
+            else:
+                failed.extend(chunk)
+
+        logger.info("Reconciled %s Cloudflare DNS Records. Created: %s, updated: %s, unchanged: %s, failed: %s", len(dns_records), len(created), len(updated), len(changes.unchanged), len(failed))
+        return ReconciliationResult(created=created, updated=updated, unchanged=changes.unchanged, failed=failed)
+
+    def _list_cloudflare_records(self, params: dict[str, str | IPv4Address], logger: Logger) -> Optional[list[CloudflareDNSRecordInputDTO]]:
+        """Fetches every page of the records matching params."""
+        url: str = f"https://api.cloudflare.com/client/v4/zones/{self._cloudflare_zone_id}/dns_records"
+        cloudflare_dns_records: list[CloudflareDNSRecordInputDTO] = []
+        page: int = 1
+
+        while True:
+            page_params: dict[str, str | int | IPv4Address] = {**params, "page": page, "per_page": LIST_PAGE_SIZE}
+            response = Response()
+            try:
+                response = get(url=url, headers=self._headers, params=page_params, timeout=5) # type: ignore
+                response.raise_for_status()
+            except ConnectionError as e:
+                logger.error("Connection Error. Failed to connect to the Cloudflare API: %s", e.response)
+                return None
+            except HTTPError as e:
+                logger.error("HTTP Error [Status code %s]. Invalid HTTP Response: %s", e.response.status_code, e.response.text)
+                return None
+            except Timeout:
+                logger.error("Request timed out when listing the DNS Records from Cloudflare. Parameters: %s", page_params)
+                return None
+            except RequestException as e:
+                logger.error("An error occurred during the request %s", e.response)
+                return None
+
+            try:
+                input_dto = CloudflareListDNSRecordsInputDTO(**response.json())
+            except ValueError as e:
+                logger.error("Failed to parse request JSON: %s", e)
+                return None
+
+            cloudflare_dns_records.extend(input_dto.result)
+            if is_last_page(input_dto.result_info):
+                break
+            page += 1
+
+        logger.info("Successfully listed %s DNS Records from Cloudflare in %s page(s). Parameters: %s", len(cloudflare_dns_records), page, params)
+        return cloudflare_dns_records
+
+    def _batch_cloudflare_records(self, posts: list[Payload], patches: list[Payload], logger: Logger) -> bool:
+        """Sends creations and updates in a single request. Returns whether Cloudflare applied them."""
+        url: str = f"https://api.cloudflare.com/client/v4/zones/{self._cloudflare_zone_id}/dns_records/batch"
+        response = Response()
+        try:
+            response = post(url=url, headers=self._headers, json={"posts": posts, "patches": patches}, timeout=5)
+            response.raise_for_status()
+        except ConnectionError as e:
+            logger.error("Connection Error. Failed to connect to the Cloudflare API: %s", e.response)
+            return False
+        except HTTPError as e:
+            logger.error("HTTP Error [Status code %s]. Invalid HTTP Response: %s", e.response.status_code, e.response.text)
+            return False
+        except Timeout:
+            logger.error("Request timed out when sending the DNS Records batch to Cloudflare")
+            return False
+        except RequestException as e:
+            logger.error("An error occurred during the request %s", e.response)
+            return False
+
+        try:
+            input_dto = CloudflareBatchDNSRecordsInputDTO(**response.json())
+        except ValueError as e:
+            logger.error("Failed to parse request JSON: %s", e)
+            return False
 
+        logger.info("Successfully sent the DNS Records batch to Cloudflare. Created: %s, updated: %s", len(input_dto.result.posts), len(input_dto.result.patches))
+        return input_dto.success
 
     def _get_cloudflare_record(self, params: dict[str, str | IPv4Address], logger: Logger) -> Optional[CloudflareDNSRecordInputDTO]:
         url: str = f"https://api.cloudflare.com/client/v4/zones/{self._cloudflare_zone_id}/dns_records"
@@ -113,35 +229,35 @@ class CloudflareNameserver(NameserverInterface):
         try:
             response = get(url=url, headers=self._headers, params=params, timeout=5) # type: ignore
             response.raise_for_status()
-            logger.info(f"Successfully fetched the DNS Record from Cloudflare. Parameters: {params}")
+            logger.info("Successfully fetched the DNS Record from Cloudflare. Parameters: %s", params)
         except ConnectionError as e:
-            logger.error(f"Connection Error. Failed to connect to the Cloudflare API: {e.response}")
+            logger.error("Connection Error. Failed to connect to the Cloudflare API: %s", e.response)
             return None
         except HTTPError as e:
-            logger.error(f"HTTP Error [Status code {e.response.status_code}]. Invalid HTTP Response: {e.response.json()}")
+            logger.error("HTTP Error [Status code %s]. Invalid HTTP Response: %s", e.response.status_code, e.response.text)
             return None
         except Timeout:
-            logger.error(f"Request timed out when fetching the DNS Record from Cloudflare. Parameters: {params}")
+            logger.error("Request timed out when fetching the DNS Record from Cloudflare. Parameters: %s", params)
             return None
         except RequestException as e:
-            logger.error(f"An error occurred during the request {e.response}")
+            logger.error("An error occurred during the request %s", e.response)
             return None
 
         # Unpack json and return
         try:
             input_dto = CloudflareListDNSRecordsInputDTO(**response.json())
             if (input_dto.result_info.count == 0):
-                logger.warning(f"No Cloudflare DNS record found for params: {params}")
+                logger.warning("No Cloudflare DNS record found for params: %s", params)
                 return None
             if (input_dto.result_info.count > 1):
                 raise MultipleDNSRecordsFoundError(input_dto=input_dto)
             cloudflare_dns_record: CloudflareDNSRecordInputDTO = input_dto.result[0]
-            logger.info(f"Cloudflare DNS record found for params: {params}")
+            logger.info("Cloudflare DNS record found for params: %s", params)
             return cloudflare_dns_record
         except ValueError as e:
-            logger.error(f"Failed to parse request JSON: {e}")
+            logger.error("Failed to parse request JSON: %s", e)
             return None
         except MultipleDNSRecordsFoundError as e:
-            logger.error(f"Failed to process JSON: {e}")
+            logger.error("Failed to process JSON: %s", e)
             return None
         
\ No newline at end of file
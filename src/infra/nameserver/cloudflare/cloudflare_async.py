@@ -0,0 +1,455 @@
+import asyncio
+import time
+from contextlib import nullcontext
+from ipaddress import ip_address
+from typing import Any, AsyncIterator, ContextManager, Optional
+import httpx
+
+from src.domain.value_objects import AnyIPAddress, DNSRecord, RecordType, ReconciliationResult, RecordChanges
+from src.domain.reconciliation import RecordKey, record_key, diff_records
+from src.infra.http import create_async_client, parse_retry_after
+from src.infra.loggers.interface import Logger
+from src.infra.nameserver.interface import AsyncNameserverInterface, RecordLookupError
+from src.infra.nameserver.cache import RecordCache, CachedRecord
+from src.infra.ratelimit import RateLimitedScheduler, RequestPriority
+from src.infra.resilience import NO_HEDGE, CircuitOpenError, call_timeout
+from src.infra.metrics.instruments import CallOutcome, record_call
+from src.infra.nameserver.cloudflare.dtos import CloudflareDNSRecordOutputDTO
+from src.infra.nameserver.cloudflare.decoding import CloudflareRecord, CloudflareRecordList, CloudflareBatchRecords, CloudflareBatchResponse, decode_record_list, decode_record_response, decode_batch_response
+from src.infra.nameserver.cloudflare.exceptions import MultipleDNSRecordsFoundError, CloudflareListingError, CloudflareLookupError
+from src.infra.nameserver.cloudflare.payloads import CLOUDFLARE_API_URL, LIST_PAGE_SIZE, BATCH_SIZE, BatchPlan, Payload, build_batch, build_patch, is_last_page
+
+PROVIDER: str = "cloudflare"
+"""Provider label of the metrics recorded by this nameserver"""
+
+class AsyncCloudflareNameserver(AsyncNameserverInterface):
+    """
+    Cloudflare nameserver backed by a long-lived pooled HTTP client.\n
+    The client can be shared between several instances (e.g. one per zone or per API token),
+    since credentials are sent with every request instead of being bound to the client.\n
+    When a `RecordCache` is given, lookups by name are answered from it while fresh, and writes to
+    a record whose id is cached skip the lookup that would otherwise precede them.\n
+    When a `RateLimitedScheduler` is given, every request waits for its admission, writes first.
+    It should be shared by every nameserver using the same API token. The requests are then not hedged
+    by a `ResilientTransport`, since a hedge would be a call the limiter does not count.
+    """
+    _cloudflare_api_key: str
+    _cloudflare_zone_id: str
+    _headers: dict[str, str]
+    _client: httpx.AsyncClient
+    _cache: Optional[RecordCache]
+    _rate_limited_until: Optional[float]
+    _rate_limiter: Optional[RateLimitedScheduler]
+    _queue_timeout: float
+
+    def __init__(self, cloudflare_api_key: str, cloudflare_zone_id: str, client: Optional[httpx.AsyncClient] = None, cache: Optional[RecordCache] = None,
+                 rate_limiter: Optional[RateLimitedScheduler] = None, queue_timeout: float = 30):
+        self._cloudflare_api_key = cloudflare_api_key
+        self._cloudflare_zone_id = cloudflare_zone_id
+        self._headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self._cloudflare_api_key}"
+        }
+        self._client = client if client is not None else create_async_client()
+        self._cache = cache
+        self._rate_limited_until = None
+        self._rate_limiter = rate_limiter
+        self._queue_timeout = queue_timeout
+
+    @property
+    def _records_url(self) -> str:
+        return f"{CLOUDFLARE_API_URL}/zones/{self._cloudflare_zone_id}/dns_records"
+
+    async def get_record_by_ip(self, ip: AnyIPAddress, logger: Logger) -> Optional[DNSRecord]:
+        record_type: RecordType = RecordType.of(ip)
+        params: dict[str, str | AnyIPAddress] = {
+            "content": ip,
+            "type": record_type.value
+        }
+
+        try:
+            cloudflare_dns_record: Optional[CloudflareRecord] = await self._get_cloudflare_record(params=params, logger=logger, priority=RequestPriority.VERIFY)
+        except CloudflareLookupError:
+            return None
+
+        if (cloudflare_dns_record is None):
+            return None
+
+        self._remember(cloudflare_dns_record, record_type)
+        return DNSRecord(ip=cloudflare_dns_record.content,
+                         name=cloudflare_dns_record.name,
+                         type=record_type)
+
+    async def get_record_by_name(self, name: str, logger: Logger, record_type: RecordType = RecordType.A) -> Optional[DNSRecord]:
+        try:
+            return await self.find_record(name, logger, record_type)
+        except RecordLookupError:
+            return None
+
+    async def find_record(self, name: str, logger: Logger, record_type: RecordType = RecordType.A) -> Optional[DNSRecord]:
+        cached_record: Optional[CachedRecord] = self._cached(name, record_type)
+        if cached_record is not None:
+            logger.debug("Cloudflare DNS record %s (%s) served from cache", name, record_type.value)
+            return DNSRecord(ip=cached_record.content, name=name, type=record_type)
+
+        params: dict[str, str | AnyIPAddress] = {
+            "name": name,
+            "type": record_type.value
+        }
+
+        cloudflare_dns_record: Optional[CloudflareRecord] = await self._get_cloudflare_record(params=params, logger=logger, priority=RequestPriority.VERIFY)
+
+        if (cloudflare_dns_record is None):
+            return None
+
+        self._remember(cloudflare_dns_record, record_type)
+        return DNSRecord(ip=cloudflare_dns_record.content,
+                         name=cloudflare_dns_record.name,
+                         type=record_type)
+
+    async def set_record(self, dns_record: DNSRecord, logger: Logger) -> bool:
+        cached_record: Optional[CachedRecord] = self._cached(dns_record.name, dns_record.type)
+        if cached_record is not None:
+            # The id is known, so the record can be updated without looking it up first
+            response = await self._request("PATCH", f"{self._records_url}/{cached_record.record_id}", logger=logger,
+                                           description="updating the DNS Record in Cloudflare", operation="update",
+                                           json=build_patch(dns_record), priority=RequestPriority.WRITE)
+            if response is not None:
+                self._remember_written(dns_record, cached_record.record_id)
+                logger.info("Successfully updated the Cloudflare DNS Record %s to %s", dns_record.name, dns_record.ip)
+                return True
+            # The record may have been deleted or recreated out of band: forget it and look it up
+            self._forget(dns_record.name, dns_record.type)
+            logger.warning("Failed to update the Cloudflare DNS Record %s using its cached id. Looking it up again", dns_record.name)
+
+        lookup_information: dict[str, str | AnyIPAddress] = {
+            "name": dns_record.name,
+            "type": dns_record.type.value
+        }
+
+        # The lookup is part of the write, so it is queued as one
+        try:
+            existing_record: Optional[CloudflareRecord] = await self._get_cloudflare_record(params=lookup_information, logger=logger, priority=RequestPriority.WRITE)
+        except CloudflareLookupError:
+            # Only a lookup answering that there is no record may lead to a creation, or the record could end up duplicated
+            logger.error("Could not tell whether the Cloudflare DNS Record %s exists. Left it as it is", dns_record.name)
+            return False
+
+        if (existing_record is None):
+            # If record does not exist, create it
+            output_dto = CloudflareDNSRecordOutputDTO(
+                name=dns_record.name,
+                content=dns_record.ip,
+                type=dns_record.type.value
+            )
+            response = await self._request("POST", self._records_url, logger=logger,
+                                           description="creating the DNS Record in Cloudflare", operation="create",
+                                           json=output_dto.model_dump(), priority=RequestPriority.WRITE)
+            if response is not None:
+                logger.info("Successfully created the Cloudflare DNS Record with params: %s", output_dto.model_dump())
+                try:
+                    created_record = decode_record_response(response.content).result
+                    self._remember_written(dns_record, created_record.id)
+                except ValueError as e:
+                    record_call(PROVIDER, "create", CallOutcome.PARSE_ERROR)
+                    logger.warning("Failed to parse the created DNS Record, it will not be cached: %s", e)
+        else:
+            # If exists, update it
+            response = await self._request("PATCH", f"{self._records_url}/{existing_record.id}", logger=logger,
+                                           description="updating the DNS Record in Cloudflare", operation="update",
+                                           json=build_patch(dns_record), priority=RequestPriority.WRITE)
+            if response is not None:
+                self._remember_written(dns_record, existing_record.id)
+                logger.info("Successfully updated the Cloudflare DNS Record %s to %s", dns_record.name, dns_record.ip)
+            else:
+                self._forget(dns_record.name, dns_record.type)
+
+        return response is not None
+
+    async def reconcile(self, dns_records: list[DNSRecord], logger: Logger) -> Optional[ReconciliationResult]:
+        """
+        Lists the zone once per record type (concurrently), diffs it against dns_records in memory
+        and sends the creations and updates through the batch endpoint.\n
+        The listing is skipped when every record of dns_records is cached and fresh.
+        """
+        existing_index: Optional[dict[RecordKey, CloudflareRecord]] = self._cached_index(dns_records)
+        duplicates: set[RecordKey] = set()
+        if existing_index is None:
+            existing_index = await self._list_index(dns_records, logger, duplicates)
+        else:
+            logger.debug("Reconciling %s Cloudflare DNS Records from cache", len(dns_records))
+        if existing_index is None:
+            return None
+
+        # Which of several records with the same name to write is anyone's guess: leave them all as they are
+        duplicated: list[DNSRecord] = [dns_record for dns_record in dns_records if record_key(dns_record.name, dns_record.type) in duplicates]
+        for dns_record in duplicated:
+            logger.error("Found several Cloudflare %s DNS Records named %s. Left them as they are: delete all but one", dns_record.type.value, dns_record.name)
+
+        changes: RecordChanges = diff_records(
+            existing={key: DNSRecord(ip=record.content, name=record.name, type=key[1]) for key, record in existing_index.items()},
+            desired=[dns_record for dns_record in dns_records if dns_record not in duplicated])
+
+        pending: list[DNSRecord] = changes.creates + changes.updates
+        plans: list[BatchPlan] = [build_batch(dns_records=pending[start:start + BATCH_SIZE], existing_index=existing_index)
+                                  for start in range(0, len(pending), BATCH_SIZE)]
+        outcomes: list[Optional[CloudflareBatchRecords]] = await asyncio.gather(
+            *(self._batch_cloudflare_records(posts=plan.posts, patches=plan.patches, logger=logger) for plan in plans))
+
+        created: list[DNSRecord] = []
+        updated: list[DNSRecord] = []
+        failed: list[DNSRecord] = list(duplicated)
+        with self._cache_transaction():
+            for plan, batch_result in zip(plans, outcomes):
+                # Batches are applied atomically, so a chunk either succeeds or fails as a whole
+                if batch_result is not None:
+                    created.extend(plan.creates)
+                    updated.extend(plan.updates)
+                    for dns_record, posted_record in zip(plan.creates, batch_result.posts):
+                        self._remember_written(dns_record, posted_record.id)
+                    for dns_record in plan.updates:
+                        self._remember_written(dns_record, existing_index[record_key(dns_record.name, dns_record.type)].id)
+                else:
+                    failed.extend(plan.creates + plan.updates)
+                    for dns_record in plan.creates + plan.updates:
+                        self._forget(dns_record.name, dns_record.type)
+
+        logger.info("Reconciled %s Cloudflare DNS Records. Created: %s, updated: %s, unchanged: %s, failed: %s", len(dns_records), len(created), len(updated), len(changes.unchanged), len(failed))
+        return ReconciliationResult(created=created, updated=updated, unchanged=changes.unchanged, failed=failed)
+
+    async def iter_records(self, logger: Logger, name: Optional[str] = None, record_type: Optional[RecordType] = None,
+                           content: Optional[AnyIPAddress] = None, page_size: int = LIST_PAGE_SIZE) -> AsyncIterator[CloudflareRecord]:
+        """
+        Yields the records of the zone matching the given fields, filtered by Cloudflare, page by page.
+
+        The next page is requested as soon as the current one arrives, so its round trip overlaps with
+        the processing of the current one. At most two pages are held at once, so memory stays flat
+        whatever the size of the zone, as long as the caller does not keep every record either.
+
+        Raises:
+            CloudflareListingError: If a page could not be fetched (the reason is logged). The records
+            already yielded are then only part of the matching ones.
+        """
+        params: dict[str, str | int | AnyIPAddress] = {"per_page": page_size}
+        if name is not None:
+            params["name"] = name
+        if record_type is not None:
+            params["type"] = record_type.value
+        if content is not None:
+            params["content"] = content
+
+        page: int = 1
+        fetch: asyncio.Task[Optional[CloudflareRecordList]] = asyncio.create_task(self._fetch_page({**params, "page": page}, logger))
+        try:
+            while True:
+                listing: Optional[CloudflareRecordList] = await fetch
+                if listing is None:
+                    raise CloudflareListingError(page)
+                last_page: bool = is_last_page(listing.result_info)
+                if not last_page:
+                    fetch = asyncio.create_task(self._fetch_page({**params, "page": page + 1}, logger))
+                for cloudflare_dns_record in listing.result:
+                    yield cloudflare_dns_record
+                if last_page:
+                    logger.debug("Listed %s page(s) of Cloudflare DNS Records. Parameters: %s", page, params)
+                    return
+                page += 1
+        finally:
+            # The caller stopped early: the page requested in advance is not needed
+            fetch.cancel()
+
+    def retry_after(self) -> Optional[float]:
+        if self._rate_limited_until is None:
+            return None
+        return max(0.0, self._rate_limited_until - time.monotonic())
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def _list_index(self, dns_records: list[DNSRecord], logger: Logger, duplicates: set[RecordKey]) -> Optional[dict[RecordKey, CloudflareRecord]]:
+        """
+        Streams the zone once, keeping only the records of dns_records: the rest of the zone is not managed by LipaDNS.\n
+        The listing is filtered by type when dns_records hold a single one. Otherwise (dual-stack A and AAAA)
+        a single unfiltered listing covers every type, so IPv6 costs no listing call of its own.\n
+        The keys held by several records are added to duplicates, and neither indexed nor cached.
+        """
+        wanted: set[RecordKey] = {record_key(dns_record.name, dns_record.type) for dns_record in dns_records}
+        record_types: dict[str, RecordType] = {dns_record.type.value: dns_record.type for dns_record in dns_records}
+        existing_index: dict[RecordKey, CloudflareRecord] = {}
+
+        try:
+            async for cloudflare_dns_record in self.iter_records(logger, record_type=next(iter(record_types.values())) if len(record_types) == 1 else None):
+                record_type: Optional[RecordType] = record_types.get(cloudflare_dns_record.type)
+                if record_type is None:
+                    continue
+                key: RecordKey = record_key(cloudflare_dns_record.name, record_type)
+                if key in existing_index or key in duplicates:
+                    duplicates.add(key)
+                    existing_index.pop(key, None)
+                elif key in wanted:
+                    existing_index[key] = cloudflare_dns_record
+        except CloudflareListingError:
+            return None
+
+        with self._cache_transaction():
+            for key, cloudflare_dns_record in existing_index.items():
+                try:
+                    self._remember(cloudflare_dns_record, key[1])
+                except ValueError:
+                    record_call(PROVIDER, "list", CallOutcome.PARSE_ERROR)
+                    logger.error("Invalid content for the Cloudflare DNS Record %s: %s", cloudflare_dns_record.name, cloudflare_dns_record.content)
+                    return None
+        logger.info("Listed the Cloudflare DNS Records. Found %s of the %s managed ones", len(existing_index), len(wanted))
+        return existing_index
+
+    def _cached_index(self, dns_records: list[DNSRecord]) -> Optional[dict[RecordKey, CloudflareRecord]]:
+        """Index of dns_records built from the cache, or None unless every one of them is cached and fresh."""
+        if self._cache is None:
+            return None
+        existing_index: dict[RecordKey, CloudflareRecord] = {}
+        for dns_record in dns_records:
+            cached_record: Optional[CachedRecord] = self._cached(dns_record.name, dns_record.type)
+            if cached_record is None:
+                return None
+            existing_index[record_key(dns_record.name, dns_record.type)] = CloudflareRecord(
+                id=cached_record.record_id, name=dns_record.name, content=str(cached_record.content))
+        return existing_index
+
+    def _cached(self, name: str, record_type: RecordType) -> Optional[CachedRecord]:
+        if self._cache is None:
+            return None
+        return self._cache.get(self._cloudflare_zone_id, name, record_type)
+
+    def _remember(self, cloudflare_dns_record: CloudflareRecord, record_type: RecordType):
+        """Caches the record. Raises ValueError if its content is not a valid address of record_type."""
+        content: AnyIPAddress = ip_address(cloudflare_dns_record.content)
+        if RecordType.of(content) != record_type:
+            raise ValueError(f"Invalid content for a {record_type.value} record: {cloudflare_dns_record.content}")
+        if self._cache is not None:
+            self._cache.put(self._cloudflare_zone_id, cloudflare_dns_record.name, record_type, cloudflare_dns_record.id, content)
+
+    def _remember_written(self, dns_record: DNSRecord, record_id: str):
+        if self._cache is not None:
+            self._cache.put(self._cloudflare_zone_id, dns_record.name, dns_record.type, record_id, dns_record.ip)
+
+    def _cache_transaction(self) -> ContextManager[None]:
+        """Groups the cache updates of a whole reconciliation into a single write to the state store, if any."""
+        return self._cache.transaction() if self._cache is not None else nullcontext()
+
+    def _forget(self, name: str, record_type: RecordType):
+        if self._cache is not None:
+            self._cache.invalidate(self._cloudflare_zone_id, name, record_type)
+
+    async def _request(self, method: str, url: str, logger: Logger, description: str, operation: str, priority: RequestPriority = RequestPriority.READ, **kwargs: Any) -> Optional[httpx.Response]:
+        """
+        Sends a request to the Cloudflare API through the pooled client, once the rate limiter (if any) admits it.
+        Returns None (after logging the reason) if the request fails, is not admitted in time, or Cloudflare answers with an error status.
+        Its duration and outcome are recorded under `operation`.
+        """
+        if self._rate_limiter is not None:
+            queue_timeout: float = call_timeout(self._queue_timeout)
+            if not await self._rate_limiter.acquire(priority=priority, deadline=self._rate_limiter.clock.now() + queue_timeout):
+                logger.error("Request throttled for more than %.1fs when %s", queue_timeout, description)
+                record_call(PROVIDER, operation, CallOutcome.THROTTLED)
+                return None
+            kwargs["extensions"] = {NO_HEDGE: True}
+        outcome: str = CallOutcome.ERROR
+        started: float = time.perf_counter()
+        try:
+            response: httpx.Response = await self._client.request(method, url, headers=self._headers, **kwargs)
+            response.raise_for_status()
+            self._rate_limited_until = None
+            outcome = CallOutcome.SUCCESS
+            return response
+        except asyncio.CancelledError:
+            outcome = CallOutcome.CANCELLED
+            raise
+        except httpx.TimeoutException:
+            outcome = CallOutcome.TIMEOUT
+            logger.error("Request timed out when %s", description)
+        except httpx.HTTPStatusError as e:
+            outcome = CallOutcome.http_status(e.response.status_code)
+            if e.response.status_code == 429:
+                retry_after: float = parse_retry_after(e.response.headers.get("Retry-After")) or 0
+                self._rate_limited_until = time.monotonic() + retry_after
+                if self._rate_limiter is not None:
+                    self._rate_limiter.report_rate_limited(retry_after)
+                logger.warning("Rate limited by Cloudflare when %s. Retry after: %ss", description, retry_after)
+                return None
+            logger.error("HTTP Error [Status code %s]. Invalid HTTP Response: %s\nRequest URL: %s", e.response.status_code, e.response.text, e.request.url)
+        except CircuitOpenError as e:
+            outcome = CallOutcome.CIRCUIT_OPEN
+            logger.error("Request not sent when %s: %s", description, e)
+        except httpx.ConnectError as e:
+            outcome = CallOutcome.CONNECTION_ERROR
+            logger.error("Connection Error. Failed to connect to the Cloudflare API: %s", e)
+        except httpx.HTTPError as e:
+            logger.error("An error occurred during the request %s", e)
+        finally:
+            record_call(PROVIDER, operation, outcome, time.perf_counter() - started)
+        return None
+
+    async def _fetch_page(self, params: dict[str, str | int | AnyIPAddress], logger: Logger) -> Optional[CloudflareRecordList]:
+        response = await self._request("GET", self._records_url, logger=logger,
+                                       description=f"listing the DNS Records from Cloudflare. Parameters: {params}", operation="list",
+                                       params=params)
+        if response is None:
+            return None
+        try:
+            return decode_record_list(response.content)
+        except ValueError as e:
+            record_call(PROVIDER, "list", CallOutcome.PARSE_ERROR)
+            logger.error("Failed to parse request JSON: %s", e)
+            return None
+
+    async def _batch_cloudflare_records(self, posts: list[Payload], patches: list[Payload], logger: Logger) -> Optional[CloudflareBatchRecords]:
+        """Sends creations and updates in a single request. Returns the written records, or None if Cloudflare did not apply them."""
+        response = await self._request("POST", f"{self._records_url}/batch", logger=logger,
+                                       description="sending the DNS Records batch to Cloudflare", operation="batch",
+                                       json={"posts": posts, "patches": patches}, priority=RequestPriority.WRITE)
+        if response is None:
+            return None
+
+        try:
+            input_dto: CloudflareBatchResponse = decode_batch_response(response.content)
+        except ValueError as e:
+            record_call(PROVIDER, "batch", CallOutcome.PARSE_ERROR)
+            logger.error("Failed to parse request JSON: %s", e)
+            return None
+
+        logger.info("Successfully sent the DNS Records batch to Cloudflare. Created: %s, updated: %s", len(input_dto.result.posts), len(input_dto.result.patches))
+        return input_dto.result if input_dto.success else None
+
+    async def _get_cloudflare_record(self, params: dict[str, str | AnyIPAddress], logger: Logger, priority: RequestPriority = RequestPriority.READ) -> Optional[CloudflareRecord]:
+        """
+        The single record matching params, or None if Cloudflare holds none.
+        Raises CloudflareLookupError (after logging the reason) if the lookup failed.
+        """
+        response = await self._request("GET", self._records_url, logger=logger,
+                                       description=f"fetching the DNS Record from Cloudflare. Parameters: {params}", operation="lookup",
+                                       params=params, priority=priority)
+        if response is None:
+            raise CloudflareLookupError(params)
+        logger.info("Successfully fetched the DNS Record from Cloudflare. Parameters: %s", params)
+
+        # Unpack json and return
+        try:
+            input_dto = decode_record_list(response.content)
+            if (input_dto.result_info.count == 0):
+                logger.warning("No Cloudflare DNS record found for params: %s", params)
+                return None
+            if (input_dto.result_info.count > 1):
+                raise MultipleDNSRecordsFoundError(input_dto=input_dto)
+            cloudflare_dns_record: CloudflareRecord = input_dto.result[0]
+            # Raises ValueError if the content is not an address of the type looked up
+            if RecordType.of(ip_address(cloudflare_dns_record.content)).value != params["type"]:
+                raise ValueError(f"Invalid content for a {params['type']} record: {cloudflare_dns_record.content}")
+            logger.info("Cloudflare DNS record found for params: %s", params)
+            return cloudflare_dns_record
+        except ValueError as e:
+            record_call(PROVIDER, "lookup", CallOutcome.PARSE_ERROR)
+            logger.error("Failed to parse request JSON: %s", e)
+            raise CloudflareLookupError(params)
+        except MultipleDNSRecordsFoundError as e:
+            logger.error("Failed to process JSON: %s", e)
+            raise CloudflareLookupError(params)
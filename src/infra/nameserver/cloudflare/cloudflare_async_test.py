@@ -0,0 +1,198 @@
+import asyncio
+import json
+from typing import Any, Optional
+from ipaddress import IPv4Address
+import httpx
+
+from src.domain.value_objects import DNSRecord, ReconciliationResult
+from src.infra.clock import ManualClock
+from src.infra.http import create_async_client
+from src.infra.metrics.instruments import PROVIDER_CALLS
+from src.infra.nameserver.cache import RecordCache
+from src.infra.nameserver.cloudflare.cloudflare_async import AsyncCloudflareNameserver
+from src.infra.ratelimit import RateLimitedScheduler
+from src.infra.resilience import NO_HEDGE
+from src.infra.loggers.standard import Logger, StandardLogger, LogLevel
+
+def _list_response(records: list[dict[str, str]], page: int = 1, per_page: int = 100, total_count: Optional[int] = None) -> httpx.Response:
+    return httpx.Response(200, json={
+        "success": True,
+        "result": records,
+        "result_info": {"count": len(records), "page": page, "per_page": per_page,
+                        "total_count": len(records) if total_count is None else total_count}
+    })
+
+def test_set_record_patches_existing_record():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.method == "GET":
+            return _list_response([{"id": "abc", "name": "home.example.com", "content": "203.0.113.1"}])
+        return httpx.Response(200, json={"success": True})
+
+    async def run():
+        async with create_async_client(transport=httpx.MockTransport(handler)) as client:
+            nameserver = AsyncCloudflareNameserver(cloudflare_api_key="key", cloudflare_zone_id="zone", client=client)
+            await nameserver.set_record(DNSRecord(ip=IPv4Address("203.0.113.9"), name="home.example.com"), logger)
+
+    asyncio.run(run())
+
+    assert [request.method for request in requests] == ["GET", "PATCH"]
+    assert requests[1].url.path == "/client/v4/zones/zone/dns_records/abc"
+    assert requests[1].headers["Authorization"] == "Bearer key"
+    assert json.loads(requests[1].content)["content"] == "203.0.113.9"
+
+def test_set_record_only_creates_when_the_lookup_found_nothing():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    lookups: list[httpx.Response] = [
+        httpx.Response(503, json={"success": False}),
+        httpx.Response(429, headers={"Retry-After": "1"}, json={"success": False}),
+        _list_response([{"id": "a", "name": "home.example.com", "content": "203.0.113.1"},
+                        {"id": "b", "name": "home.example.com", "content": "203.0.113.2"}]),
+        _list_response([]),
+    ]
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.method == "GET":
+            return lookups.pop(0)
+        return httpx.Response(200, json={"success": True, "result": {"id": "c", "name": "home.example.com", "content": "203.0.113.9"}})
+
+    async def run() -> list[bool]:
+        async with create_async_client(transport=httpx.MockTransport(handler)) as client:
+            nameserver = AsyncCloudflareNameserver(cloudflare_api_key="key", cloudflare_zone_id="zone", client=client)
+            return [await nameserver.set_record(DNSRecord(ip=IPv4Address("203.0.113.9"), name="home.example.com"), logger) for _ in range(4)]
+
+    # A failed lookup, a rate limited one and an ambiguous one are not taken for a missing record
+    assert asyncio.run(run()) == [False, False, False, True]
+    assert [request.method for request in requests] == ["GET", "GET", "GET", "GET", "POST"]
+
+def test_reconcile_lists_once_and_batches():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    zone: list[dict[str, str]] = [
+        {"id": f"id-{i}", "name": f"host{i}.example.com", "content": "203.0.113.1" if i % 2 else "203.0.113.2"}
+        for i in range(6)
+    ]
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.method == "GET":
+            page = int(request.url.params["page"])
+            return _list_response(zone[(page - 1) * 4:page * 4], page=page, per_page=4, total_count=len(zone))
+        body: dict[str, Any] = json.loads(request.content)
+        return httpx.Response(200, json={"success": True, "result": {
+            "posts": [{"id": "new", **record} for record in body["posts"]],
+            "patches": body["patches"]
+        }})
+
+    async def run() -> Optional[ReconciliationResult]:
+        async with create_async_client(transport=httpx.MockTransport(handler)) as client:
+            nameserver = AsyncCloudflareNameserver(cloudflare_api_key="key", cloudflare_zone_id="zone", client=client)
+            desired = [DNSRecord(ip=IPv4Address("203.0.113.1"), name=f"host{i}.example.com") for i in range(8)]
+            return await nameserver.reconcile(desired, logger)
+
+    result: Optional[ReconciliationResult] = asyncio.run(run())
+
+    assert result
+    assert [request.method for request in requests] == ["GET", "GET", "POST"]
+    assert requests[-1].url.path.endswith("/dns_records/batch")
+    assert {r.name for r in result.updated} == {"host0.example.com", "host2.example.com", "host4.example.com"}
+    assert {r.name for r in result.created} == {"host6.example.com", "host7.example.com"}
+    assert len(result.unchanged) == 3
+
+def test_reconcile_leaves_duplicated_records_alone():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    zone: list[dict[str, str]] = [
+        {"id": "id-0", "name": "home.example.com", "type": "A", "content": "203.0.113.1"},
+        {"id": "id-1", "name": "home.example.com", "type": "A", "content": "203.0.113.2"},
+        {"id": "id-2", "name": "nas.example.com", "type": "A", "content": "203.0.113.1"},
+    ]
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.method == "GET":
+            return _list_response(zone)
+        body: dict[str, Any] = json.loads(request.content)
+        return httpx.Response(200, json={"success": True, "result": {"posts": [], "patches": body["patches"]}})
+
+    async def run() -> Optional[ReconciliationResult]:
+        async with create_async_client(transport=httpx.MockTransport(handler)) as client:
+            nameserver = AsyncCloudflareNameserver(cloudflare_api_key="key", cloudflare_zone_id="zone", client=client)
+            return await nameserver.reconcile([DNSRecord(ip=IPv4Address("203.0.113.9"), name=name) for name in ("home.example.com", "nas.example.com")], logger)
+
+    result: Optional[ReconciliationResult] = asyncio.run(run())
+
+    assert result
+    assert [r.name for r in result.failed] == ["home.example.com"]
+    assert [r.name for r in result.updated] == ["nas.example.com"] and not result.created
+    assert [patch["id"] for patch in json.loads(requests[-1].content)["patches"]] == ["id-2"]
+
+def test_cache_skips_lookups_until_it_expires():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    clock = ManualClock()
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.method == "GET":
+            return _list_response([{"id": "abc", "name": "home.example.com", "content": "203.0.113.1"}])
+        return httpx.Response(200, json={"success": True})
+
+    async def run():
+        async with create_async_client(transport=httpx.MockTransport(handler)) as client:
+            nameserver = AsyncCloudflareNameserver(cloudflare_api_key="key", cloudflare_zone_id="zone", client=client,
+                                                   cache=RecordCache(ttl=300, clock=clock))
+            for _ in range(3):
+                assert await nameserver.get_record_by_name("home.example.com", logger) == DNSRecord(ip=IPv4Address("203.0.113.1"), name="home.example.com")
+            assert [request.method for request in requests] == ["GET"]
+
+            await nameserver.set_record(DNSRecord(ip=IPv4Address("203.0.113.9"), name="home.example.com"), logger)
+            assert [request.method for request in requests] == ["GET", "PATCH"]
+            assert await nameserver.get_record_by_name("home.example.com", logger) == DNSRecord(ip=IPv4Address("203.0.113.9"), name="home.example.com")
+
+            clock.current = 300
+            await nameserver.get_record_by_name("home.example.com", logger)
+            assert [request.method for request in requests] == ["GET", "PATCH", "GET"]
+
+    asyncio.run(run())
+
+def test_rate_limit_is_reported():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    transport = httpx.MockTransport(lambda request: httpx.Response(429, headers={"Retry-After": "30"}, json={"success": False}))
+    rate_limited_calls: float = PROVIDER_CALLS.value("cloudflare", "lookup", "http_4xx")
+
+    async def run() -> Optional[float]:
+        async with create_async_client(transport=transport) as client:
+            nameserver = AsyncCloudflareNameserver(cloudflare_api_key="key", cloudflare_zone_id="zone", client=client)
+            assert nameserver.retry_after() is None
+            assert await nameserver.get_record_by_name("home.example.com", logger) is None
+            return nameserver.retry_after()
+
+    retry_after: Optional[float] = asyncio.run(run())
+    assert retry_after is not None and 29 < retry_after <= 30
+    assert PROVIDER_CALLS.value("cloudflare", "lookup", "http_4xx") == rate_limited_calls + 1
+
+def test_rate_limited_requests_are_not_hedged():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return _list_response([{"id": "abc", "name": "home.example.com", "content": "203.0.113.1"}])
+
+    async def run():
+        async with create_async_client(transport=httpx.MockTransport(handler)) as client:
+            limited = AsyncCloudflareNameserver(cloudflare_api_key="key", cloudflare_zone_id="zone", client=client,
+                                                rate_limiter=RateLimitedScheduler(budget=100, window=300))
+            unlimited = AsyncCloudflareNameserver(cloudflare_api_key="key", cloudflare_zone_id="zone", client=client)
+            await limited.get_record_by_name("home.example.com", logger)
+            await unlimited.get_record_by_name("home.example.com", logger)
+
+    asyncio.run(run())
+    # A hedge would be a second call, which the limiter would not have counted
+    assert [request.extensions.get(NO_HEDGE, False) for request in requests] == [True, False]
@@ -1,10 +1,13 @@
 import pytest
 import os
+import json
 from dotenv import load_dotenv
-from typing import Optional
+from typing import Any, Optional
 from ipaddress import IPv4Address
+from requests import Response
 
-from src.domain.value_objects import DNSRecord
+from src.domain.value_objects import DNSRecord, ReconciliationResult
+from src.infra.nameserver.cloudflare import cloudflare
 from src.infra.nameserver.cloudflare.cloudflare import CloudflareNameserver
 from src.infra.loggers.standard import Logger, StandardLogger, LogLevel
 
@@ -45,3 +48,55 @@ def test_set_record(api_key: str, cloudflare_zone_id: str, domain_name: str, tes
 
     assert nameserver.get_record_by_ip(test_ip, logger) == dns_record
     assert nameserver.get_record_by_name(domain_name, logger) == dns_record
+
+def _json_response(payload: dict[str, Any]) -> Response:
+    response = Response()
+    response.status_code = 200
+    response._content = json.dumps(payload).encode() # type: ignore
+    return response
+
+def test_reconcile_lists_once_and_batches(monkeypatch: pytest.MonkeyPatch):
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    zone: list[dict[str, str]] = [
+        {"id": f"id-{i}", "name": f"host{i}.example.com", "content": "203.0.113.1" if i % 2 else "203.0.113.2"}
+        for i in range(6)
+    ]
+    calls: list[tuple[str, dict[str, Any]]] = []
+
+    def fake_get(url: str, params: dict[str, Any], **kwargs: Any) -> Response:
+        calls.append(("GET", params))
+        start = (params["page"] - 1) * 4
+        page = zone[start:start + 4]
+        return _json_response({
+            "success": True,
+            "result": page,
+            "result_info": {"count": len(page), "page": params["page"], "per_page": 4, "total_count": len(zone)}
+        })
+
+    def fake_post(url: str, json: dict[str, Any], **kwargs: Any) -> Response:
+        calls.append(("POST", json))
+        assert url.endswith("/dns_records/batch")
+        return _json_response({
+            "success": True,
+            "result": {
+                "posts": [{"id": "new", **record} for record in json["posts"]],
+                "patches": json["patches"]
+            }
+        })
+
+    monkeypatch.setattr(cloudflare, "get", fake_get)
+    monkeypatch.setattr(cloudflare, "post", fake_post)
+
+    nameserver = CloudflareNameserver(cloudflare_api_key="key", cloudflare_zone_id="zone")
+    desired: list[DNSRecord] = [DNSRecord(ip=IPv4Address("203.0.113.1"), name=f"host{i}.example.com") for i in range(8)]
+    result: Optional[ReconciliationResult] = nameserver.reconcile(dns_records=desired, logger=logger)
+
+    assert result
+    assert [method for method, _ in calls] == ["GET", "GET", "POST"]
+    assert {r.name for r in result.unchanged} == {"host1.example.com", "host3.example.com", "host5.example.com"}
+    assert {r.name for r in result.updated} == {"host0.example.com", "host2.example.com", "host4.example.com"}
+    assert {r.name for r in result.created} == {"host6.example.com", "host7.example.com"}
+    assert not result.failed
+    batch: dict[str, Any] = calls[-1][1]
+    assert {patch["id"] for patch in batch["patches"]} == {"id-0", "id-2", "id-4"}
+    assert all(patch["content"] == "203.0.113.1" for patch in batch["patches"])
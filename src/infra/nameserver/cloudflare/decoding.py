@@ -0,0 +1,71 @@
+from dataclasses import dataclass, field
+from typing import Optional
+from pydantic import TypeAdapter
+
+@dataclass(slots=True, frozen=True)
+class CloudflareRecord:
+    """
+    Compact form of a DNS record received from Cloudflare, keeping only the fields LipaDNS uses.\n
+    `content` is kept as received: it is only parsed as an address for the records LipaDNS manages,
+    not for every record of a zone listing.
+    """
+    id: str
+    name: str
+    content: str
+    type: str = "A"
+    proxied: bool = False
+
+@dataclass(slots=True, frozen=True)
+class CloudflarePage:
+    count: int
+    page: int
+    per_page: int
+    total_count: int
+    total_pages: Optional[int] = None
+
+@dataclass(slots=True, frozen=True)
+class CloudflareRecordList:
+    """Response of the list DNS records endpoint"""
+    success: bool
+    result_info: CloudflarePage
+    result: list[CloudflareRecord] = field(default_factory=list)
+
+@dataclass(slots=True, frozen=True)
+class CloudflareRecordResponse:
+    """Response of the create and update DNS record endpoints"""
+    success: bool
+    result: CloudflareRecord
+
+@dataclass(slots=True, frozen=True)
+class CloudflareBatchRecords:
+    posts: list[CloudflareRecord] = field(default_factory=list)
+    patches: list[CloudflareRecord] = field(default_factory=list)
+
+@dataclass(slots=True, frozen=True)
+class CloudflareBatchResponse:
+    """Response of the batch DNS records endpoint"""
+    success: bool
+    result: CloudflareBatchRecords
+
+# Building an adapter compiles its validator, so it is done once per type, at import time
+_RECORD_LIST_ADAPTER: TypeAdapter[CloudflareRecordList] = TypeAdapter(CloudflareRecordList)
+_RECORD_RESPONSE_ADAPTER: TypeAdapter[CloudflareRecordResponse] = TypeAdapter(CloudflareRecordResponse)
+_BATCH_RESPONSE_ADAPTER: TypeAdapter[CloudflareBatchResponse] = TypeAdapter(CloudflareBatchResponse)
+
+def decode_record_list(content: bytes) -> CloudflareRecordList:
+    """
+    Parses the raw body of a listing straight into compact records, in a single pass that never builds the
+    intermediate dicts. Fields LipaDNS does not use (errors, messages, settings, timestamps...) are skipped.
+
+    Raises:
+        ValueError: If the body is not valid JSON or does not have the expected shape.
+    """
+    return _RECORD_LIST_ADAPTER.validate_json(content)
+
+def decode_record_response(content: bytes) -> CloudflareRecordResponse:
+    """Same as `decode_record_list`, for the create and update endpoints."""
+    return _RECORD_RESPONSE_ADAPTER.validate_json(content)
+
+def decode_batch_response(content: bytes) -> CloudflareBatchResponse:
+    """Same as `decode_record_list`, for the batch endpoint."""
+    return _BATCH_RESPONSE_ADAPTER.validate_json(content)
@@ -0,0 +1,17 @@
+import pytest
+
+from src.benchmarks.decoding import listing_body
+from src.infra.nameserver.cloudflare.decoding import CloudflareRecord, decode_record_list
+
+def test_decode_keeps_only_the_used_fields():
+    records = decode_record_list(listing_body(3))
+
+    assert records.success and records.result_info.total_count == 3
+    assert records.result[2] == CloudflareRecord(id=f"{2:032x}", name="host-2.example.com", content="198.51.0.2", type="A", proxied=True)
+    assert not hasattr(records.result[2], "__dict__")
+
+def test_decode_rejects_malformed_bodies():
+    with pytest.raises(ValueError):
+        decode_record_list(b'{"success": true, "result": []}')
+    with pytest.raises(ValueError):
+        decode_record_list(b"<html>Bad gateway</html>")
@@ -1,20 +1,21 @@
 from pydantic import BaseModel, Field, ConfigDict, field_serializer
 from typing import Optional
-from ipaddress import IPv4Address
+
+from src.domain.value_objects import AnyIPAddress
 
 class CloudflareDNSRecordInputDTO(BaseModel):
     model_config = ConfigDict(frozen=True)
 
     id: str
     name: str
-    content: IPv4Address
+    content: AnyIPAddress
 
 class CloudflareDNSRecordOutputDTO(BaseModel):
     id: Optional[str] = None
     """Only required when updating record, not for creating it"""
     name: str = Field(min_length=1, max_length=255)
     """DNS Record Name (or @ for the zone apex) in Punycode"""
-    content: IPv4Address
+    content: AnyIPAddress
     """Content of the DNS Record"""
     proxied: Optional[bool] = Field(default=True)
     """Whether the record is proxied by Cloudflare."""
@@ -22,8 +23,8 @@ class CloudflareDNSRecordOutputDTO(BaseModel):
     type: str = Field(default="A", frozen=True)
 
     @field_serializer('content')
-    def serialize_content(self, content: IPv4Address, _info):
-        """Converts the IPv4 to a string, so it can be serialized to a JSON object"""
+    def serialize_content(self, content: AnyIPAddress, _info):
+        """Converts the IP to a string, so it can be serialized to a JSON object"""
         return str(content)
 
 class CloudflareMessage(BaseModel):
@@ -39,6 +40,7 @@ class CloudflareResultInfo(BaseModel):
     page: int = Field(..., ge=0)
     per_page: int = Field(..., ge=0)
     total_count: int = Field(..., ge=0)
+    total_pages: Optional[int] = Field(default=None, ge=0)
 
 class CloudflareListDNSRecordsInputDTO(BaseModel):
     """"
@@ -50,4 +52,23 @@ class CloudflareListDNSRecordsInputDTO(BaseModel):
     errors: list[CloudflareMessage] = Field(default_factory=list)
     messages: list[CloudflareMessage] = Field(default_factory=list)
     result_info: CloudflareResultInfo
-    result: list[CloudflareDNSRecordInputDTO]
\ No newline at end of file
+    result: list[CloudflareDNSRecordInputDTO]
+
+class CloudflareBatchResult(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    deletes: list[CloudflareDNSRecordInputDTO] = Field(default_factory=list)
+    patches: list[CloudflareDNSRecordInputDTO] = Field(default_factory=list)
+    puts: list[CloudflareDNSRecordInputDTO] = Field(default_factory=list)
+    posts: list[CloudflareDNSRecordInputDTO] = Field(default_factory=list)
+
+class CloudflareBatchDNSRecordsInputDTO(BaseModel):
+    """
+    https://developers.cloudflare.com/api/operations/dns-records-for-a-zone-batch-dns-records
+    """
+    model_config = ConfigDict(frozen=True)
+
+    success: bool
+    errors: list[CloudflareMessage] = Field(default_factory=list)
+    messages: list[CloudflareMessage] = Field(default_factory=list)
+    result: CloudflareBatchResult
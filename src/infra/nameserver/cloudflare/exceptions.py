@@ -1,3 +1,5 @@
+from src.infra.nameserver.interface import RecordLookupError
+
 class MultipleDNSRecordsFoundError(Exception):
     """
     Exception raised when Cloudflare returns more than one record matching the query criteria.
@@ -20,4 +22,34 @@ class MultipleDNSRecordsFoundError(Exception):
 
     def __str__(self):
         return f"Cloudflare returned more than one result matching the DNS Record query's criteria. Number of results: {self.input_dto.result_info.count}" # type: ignore
-    
\ No newline at end of file
+    
+
+class CloudflareListingError(Exception):
+    """
+    Exception raised by `AsyncCloudflareNameserver.iter_records` when a page of the listing could not be
+    fetched or decoded, so the records already yielded are not the whole zone. The reason is logged.
+    """
+    page: int
+
+    def __init__(self, page: int):
+        super().__init__()
+        self.page = page
+
+    def __str__(self):
+        return f"Could not fetch page {self.page} of the Cloudflare DNS Records listing"
+
+
+class CloudflareLookupError(RecordLookupError):
+    """
+    Exception raised when a Cloudflare DNS Record could not be looked up: the request failed, was not admitted
+    in time, or its answer could not be used (e.g. several records matched). The reason is logged.\n
+    Not raised when the lookup found no record: that answer is None.
+    """
+    params: dict
+
+    def __init__(self, params: dict):
+        super().__init__()
+        self.params = params
+
+    def __str__(self):
+        return f"Could not look the Cloudflare DNS Record up. Parameters: {self.params}"
@@ -0,0 +1,50 @@
+from typing import Mapping, Optional
+
+from src.domain.value_objects import DNSRecord
+from src.domain.reconciliation import RecordKey, record_key
+from src.infra.nameserver.cloudflare.dtos import CloudflareDNSRecordInputDTO, CloudflareDNSRecordOutputDTO, CloudflareResultInfo
+from src.infra.nameserver.cloudflare.decoding import CloudflareRecord, CloudflarePage
+
+CLOUDFLARE_API_URL: str = "https://api.cloudflare.com/client/v4"
+LIST_PAGE_SIZE: int = 5000
+"""Records requested per page when listing a zone"""
+BATCH_SIZE: int = 200
+"""Maximum number of changes sent in a single batch request (Cloudflare's limit on the free plan)"""
+
+Payload = dict[str, str | bool | None]
+
+class BatchPlan:
+    """Creations and updates of a chunk of records, along with the request bodies that perform them."""
+    __slots__ = ("creates", "updates", "posts", "patches")
+
+    def __init__(self):
+        self.creates: list[DNSRecord] = []
+        self.updates: list[DNSRecord] = []
+        self.posts: list[Payload] = []
+        self.patches: list[Payload] = []
+
+def build_patch(dns_record: DNSRecord) -> Payload:
+    """Body of a PATCH request pointing an existing record to the ip of dns_record."""
+    return {
+        "name": dns_record.name,
+        "type": dns_record.type.value,
+        "content": str(dns_record.ip),
+        "proxied": True
+    }
+
+def build_batch(dns_records: list[DNSRecord], existing_index: Mapping[RecordKey, CloudflareDNSRecordInputDTO | CloudflareRecord]) -> BatchPlan:
+    """Splits dns_records into creations and updates, depending on whether existing_index holds their id."""
+    plan = BatchPlan()
+    for dns_record in dns_records:
+        existing_record: Optional[CloudflareDNSRecordInputDTO | CloudflareRecord] = existing_index.get(record_key(dns_record.name, dns_record.type))
+        if existing_record is None:
+            output_dto = CloudflareDNSRecordOutputDTO(name=dns_record.name, content=dns_record.ip, type=dns_record.type.value)
+            plan.posts.append(output_dto.model_dump(exclude_none=True))
+            plan.creates.append(dns_record)
+        else:
+            plan.patches.append({"id": existing_record.id, **build_patch(dns_record)})
+            plan.updates.append(dns_record)
+    return plan
+
+def is_last_page(result_info: CloudflareResultInfo | CloudflarePage) -> bool:
+    return result_info.count == 0 or result_info.page * result_info.per_page >= result_info.total_count
@@ -0,0 +1,139 @@
+import asyncio
+import time
+from typing import Awaitable, Optional, TypeVar
+
+from src.domain.reconciliation import RecordKey, record_key
+from src.domain.value_objects import AnyIPAddress, DNSRecord, RecordType, ReconciliationResult
+from src.infra.loggers.interface import Logger
+from src.infra.metrics.instruments import CallOutcome, record_call
+from src.infra.nameserver.interface import AsyncNameserverInterface
+
+T = TypeVar("T")
+
+class FanOutNameserver(AsyncNameserverInterface):
+    """
+    Publishes the same records to several nameservers at once, e.g. Cloudflare and a secondary DNS.
+
+    Every call is sent to all the providers concurrently, so a tick takes as long as the slowest of
+    them instead of their sum. Each provider runs under its own timeout, and an error or a timeout
+    in one is logged and reported for that provider only: the others' writes are not held back.
+
+    Arguments:
+        providers (dict[str, AsyncNameserverInterface]): Nameservers, by the name used in logs, metrics and results.
+        timeout (float): Seconds each provider is given per call.
+        timeouts (Optional[dict[str, float]]): Overrides `timeout` for some providers.
+    """
+    _providers: dict[str, AsyncNameserverInterface]
+    _timeouts: dict[str, float]
+    _last_results: dict[str, Optional[ReconciliationResult]]
+
+    def __init__(self, providers: dict[str, AsyncNameserverInterface], timeout: float = 60, timeouts: Optional[dict[str, float]] = None):
+        if not providers:
+            raise ValueError("FanOutNameserver needs at least one provider")
+        self._providers = providers
+        self._timeouts = {name: (timeouts or {}).get(name, timeout) for name in providers}
+        self._last_results = {}
+
+    @property
+    def last_results(self) -> dict[str, Optional[ReconciliationResult]]:
+        """Result of the last `reconcile` per provider. None for the providers that failed or timed out."""
+        return dict(self._last_results)
+
+    async def get_record_by_ip(self, ip: AnyIPAddress, logger: Logger) -> Optional[DNSRecord]:
+        """The record of the first provider, in order, that found one."""
+        dns_records: dict[str, Optional[DNSRecord]] = await self._fan_out(
+            {name: provider.get_record_by_ip(ip, logger) for name, provider in self._providers.items()}, "get_record_by_ip", logger)
+        return next((dns_record for dns_record in dns_records.values() if dns_record is not None), None)
+
+    async def get_record_by_name(self, name: str, logger: Logger, record_type: RecordType = RecordType.A) -> Optional[DNSRecord]:
+        """The record, if every provider holds it with the same ip. None otherwise."""
+        dns_records: dict[str, Optional[DNSRecord]] = await self._fan_out(
+            {provider_name: provider.get_record_by_name(name, logger, record_type) for provider_name, provider in self._providers.items()}, "get_record_by_name", logger)
+        ips: set[AnyIPAddress] = {dns_record.ip for dns_record in dns_records.values() if dns_record is not None}
+        if None in dns_records.values() or len(ips) != 1:
+            logger.warning("The providers disagree on the DNS Record %s: %s", name,
+                           {provider_name: str(dns_record.ip) if dns_record else None for provider_name, dns_record in dns_records.items()})
+            return None
+        return next(iter(dns_records.values()))
+
+    async def set_record(self, dns_record: DNSRecord, logger: Logger) -> bool:
+        """Writes the record to every provider. True only if all of them accepted it."""
+        accepted: dict[str, Optional[bool]] = await self._fan_out(
+            {name: provider.set_record(dns_record, logger) for name, provider in self._providers.items()}, "set_record", logger)
+        return all(accepted.values())
+
+    def retry_after(self) -> Optional[float]:
+        """The longest wait asked by a rate limited provider."""
+        waits: list[float] = [wait for wait in (provider.retry_after() for provider in self._providers.values()) if wait is not None]
+        return max(waits) if waits else None
+
+    async def reconcile_each(self, dns_records: list[DNSRecord], logger: Logger) -> dict[str, Optional[ReconciliationResult]]:
+        """
+        Reconciles every provider concurrently against the same desired records.
+
+        Returns:
+            dict[str, Optional[ReconciliationResult]]: The result of each provider. None for the ones that
+            failed or timed out.
+        """
+        self._last_results = await self._fan_out(
+            {name: provider.reconcile(dns_records, logger) for name, provider in self._providers.items()}, "reconcile", logger)
+        for name, result in self._last_results.items():
+            if result is not None:
+                logger.info("Provider %s reconciled. Created: %s, updated: %s, unchanged: %s, failed: %s", name, len(result.created), len(result.updated), len(result.unchanged), len(result.failed))
+        return self.last_results
+
+    async def reconcile(self, dns_records: list[DNSRecord], logger: Logger) -> Optional[ReconciliationResult]:
+        """
+        Reconciles every provider concurrently and merges their results: a record failed if any provider
+        could not write it, and was created or updated if any provider did. None if every provider failed.
+        Use `last_results` for the result of each provider.
+        """
+        results: dict[str, Optional[ReconciliationResult]] = await self.reconcile_each(dns_records, logger)
+        if all(result is None for result in results.values()):
+            return None
+
+        failed: set[RecordKey] = set()
+        created: set[RecordKey] = set()
+        updated: set[RecordKey] = set()
+        for result in results.values():
+            if result is None:
+                # Nothing is known about this provider's records
+                failed.update(record_key(dns_record.name, dns_record.type) for dns_record in dns_records)
+                continue
+            failed.update(record_key(dns_record.name, dns_record.type) for dns_record in result.failed)
+            created.update(record_key(dns_record.name, dns_record.type) for dns_record in result.created)
+            updated.update(record_key(dns_record.name, dns_record.type) for dns_record in result.updated)
+
+        merged: dict[str, list[DNSRecord]] = {"created": [], "updated": [], "unchanged": [], "failed": []}
+        for dns_record in dns_records:
+            key: RecordKey = record_key(dns_record.name, dns_record.type)
+            if key in failed:
+                merged["failed"].append(dns_record)
+            elif key in created:
+                merged["created"].append(dns_record)
+            elif key in updated:
+                merged["updated"].append(dns_record)
+            else:
+                merged["unchanged"].append(dns_record)
+        return ReconciliationResult(**merged)
+
+    async def _fan_out(self, calls: dict[str, Awaitable[Optional[T]]], operation: str, logger: Logger) -> dict[str, Optional[T]]:
+        results: list[Optional[T]] = await asyncio.gather(*(self._isolated(name, call, operation, logger) for name, call in calls.items()))
+        return dict(zip(calls, results))
+
+    async def _isolated(self, name: str, call: Awaitable[Optional[T]], operation: str, logger: Logger) -> Optional[T]:
+        """Runs a provider's call under its timeout. Anything it raises is logged and turned into None."""
+        started: float = time.perf_counter()
+        try:
+            result: Optional[T] = await asyncio.wait_for(call, timeout=self._timeouts[name])
+        except asyncio.TimeoutError:
+            record_call(name, operation, CallOutcome.TIMEOUT, time.perf_counter() - started)
+            logger.error("Provider %s did not complete %s within %ss", name, operation, self._timeouts[name])
+            return None
+        except Exception as e:
+            record_call(name, operation, CallOutcome.ERROR, time.perf_counter() - started)
+            logger.error("Provider %s failed during %s: %r", name, operation, e)
+            return None
+        # The provider reports its own failures: this only tells whether it answered in time
+        record_call(name, operation, CallOutcome.SUCCESS, time.perf_counter() - started)
+        return result
@@ -0,0 +1,60 @@
+import asyncio
+import time
+from ipaddress import IPv4Address
+from typing import Optional
+
+from src.domain.value_objects import DNSRecord, RecordType, ReconciliationResult
+from src.infra.http import create_async_client
+from src.infra.nameserver.interface import AsyncNameserverInterface
+from src.infra.nameserver.fanout import FanOutNameserver
+from src.infra.nameserver.cloudflare.cloudflare_async import AsyncCloudflareNameserver
+from src.infra.nameserver.rfc2136.rfc2136 import Rfc2136Nameserver
+from src.infra.loggers.standard import Logger, StandardLogger, LogLevel
+from src.benchmarks.fakes import FakeCloudflareApi, FakeDnsServer, fake_transport
+
+class HangingNameserver(AsyncNameserverInterface):
+    async def get_record_by_ip(self, ip: IPv4Address, logger: Logger) -> Optional[DNSRecord]:
+        await asyncio.sleep(3600)
+        return None
+
+    async def get_record_by_name(self, name: str, logger: Logger, record_type: RecordType = RecordType.A) -> Optional[DNSRecord]:
+        await asyncio.sleep(3600)
+        return None
+
+    async def set_record(self, dns_record: DNSRecord, logger: Logger) -> bool:
+        await asyncio.sleep(3600)
+        return False
+
+def test_reconcile_isolates_a_hanging_provider():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    cloudflare = FakeCloudflareApi()
+    cloudflare.add_record("home.example.com", "198.51.100.1")
+    dns_server = FakeDnsServer("example.com")
+    dns_server.add_record("home.example.com", "198.51.100.7")
+    desired: list[DNSRecord] = [DNSRecord(ip=IPv4Address("198.51.100.7"), name=name) for name in ("home.example.com", "vpn.example.com")]
+
+    async def run() -> tuple[Optional[ReconciliationResult], dict[str, Optional[ReconciliationResult]], float]:
+        await dns_server.start()
+        try:
+            async with create_async_client(transport=fake_transport(cloudflare)) as client:
+                nameserver = FanOutNameserver({
+                    "cloudflare": AsyncCloudflareNameserver(cloudflare_api_key="key", cloudflare_zone_id=cloudflare.zone_id, client=client),
+                    "rfc2136": Rfc2136Nameserver("example.com", "127.0.0.1", port=dns_server.port, timeout=1),
+                    "hanging": HangingNameserver()
+                }, timeout=5, timeouts={"hanging": 0.2})
+                started: float = time.perf_counter()
+                result: Optional[ReconciliationResult] = await nameserver.reconcile(desired, logger)
+                return result, nameserver.last_results, time.perf_counter() - started
+        finally:
+            await dns_server.close()
+
+    result, per_provider, duration = asyncio.run(run())
+
+    assert duration < 2
+    assert per_provider["hanging"] is None
+    cloudflare_result, rfc2136_result = per_provider["cloudflare"], per_provider["rfc2136"]
+    assert cloudflare_result is not None and [record.name for record in cloudflare_result.updated] == ["home.example.com"]
+    assert rfc2136_result is not None and [record.name for record in rfc2136_result.unchanged] == ["home.example.com"]
+    # Both answering providers were written to, but the hanging one leaves every record unconfirmed
+    assert cloudflare.content_of("vpn.example.com") == dns_server.content_of("vpn.example.com") == "198.51.100.7"
+    assert result is not None and result.failed == desired
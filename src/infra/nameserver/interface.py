@@ -2,9 +2,12 @@ from abc import ABC, abstractmethod
 from ipaddress import IPv4Address
 from typing import Optional
 
-from src.domain.value_objects import DNSRecord
+from src.domain.value_objects import AnyIPAddress, DNSRecord, RecordType, ReconciliationResult
 from src.infra.loggers.interface import Logger
 
+class RecordLookupError(Exception):
+    """The nameserver could not tell whether it holds a record: the lookup failed. The reason is logged."""
+
 class NameserverInterface(ABC):
     @abstractmethod
     def get_record_by_ip(self, ip: IPv4Address, logger: Logger) -> Optional[DNSRecord]:
@@ -15,8 +18,89 @@ class NameserverInterface(ABC):
         pass
 
     @abstractmethod
-    def set_record(self, dns_record: DNSRecord, logger: Logger):
+    def set_record(self, dns_record: DNSRecord, logger: Logger) -> bool:
+        """
+        Create/update any record with the domain name of dns_record and updates it with the new ip.
+        Returns whether the nameserver accepted the write.
         """
-        Create/update any record with the domain name of dns_record and updates it with the new ip 
+        pass
+
+    def reconcile(self, dns_records: list[DNSRecord], logger: Logger) -> Optional[ReconciliationResult]:
         """
+        Brings every record of dns_records to its desired ip, writing only the ones that differ.\n
+        The default implementation looks up and writes each record on its own. Nameservers able to
+        list a whole zone or to write in batches should override it.
+        """
+        result: dict[str, list[DNSRecord]] = {"created": [], "updated": [], "unchanged": [], "failed": []}
+        for dns_record in dns_records:
+            current_dns_record: Optional[DNSRecord] = self.get_record_by_name(name=dns_record.name, logger=logger)
+            if current_dns_record is not None and current_dns_record.ip == dns_record.ip:
+                result["unchanged"].append(dns_record)
+            elif not self.set_record(dns_record=dns_record, logger=logger):
+                result["failed"].append(dns_record)
+            else:
+                result["created" if current_dns_record is None else "updated"].append(dns_record)
+        return ReconciliationResult(**result)
+
+class AsyncNameserverInterface(ABC):
+    """Non-blocking variant of `NameserverInterface`, meant to run inside the asyncio event loop."""
+    @abstractmethod
+    async def get_record_by_ip(self, ip: AnyIPAddress, logger: Logger) -> Optional[DNSRecord]:
+        """The record holding ip: an A record for an IPv4 address, an AAAA record for an IPv6 one."""
         pass
+
+    @abstractmethod
+    async def get_record_by_name(self, name: str, logger: Logger, record_type: RecordType = RecordType.A) -> Optional[DNSRecord]:
+        pass
+
+    @abstractmethod
+    async def set_record(self, dns_record: DNSRecord, logger: Logger) -> bool:
+        """
+        Create/update any record with the domain name of dns_record and updates it with the new ip.
+        Returns whether the nameserver accepted the write.
+        """
+        pass
+
+    async def find_record(self, name: str, logger: Logger, record_type: RecordType = RecordType.A) -> Optional[DNSRecord]:
+        """
+        The record named name, or None if the nameserver holds none.\n
+        Unlike `get_record_by_name`, tells a missing record apart from a failed lookup, so that a record is only
+        ever created when it is known to be missing. The default implementation cannot tell them apart, so it
+        takes any missing record for a failure: nameservers able to tell should override it.
+
+        Raises:
+            RecordLookupError: If the lookup failed.
+        """
+        dns_record: Optional[DNSRecord] = await self.get_record_by_name(name=name, logger=logger, record_type=record_type)
+        if dns_record is None:
+            raise RecordLookupError(name)
+        return dns_record
+
+    def retry_after(self) -> Optional[float]:
+        """
+        Seconds the nameserver asked to wait before the next request, if it rate limited the last one(s).
+        None when not rate limited.
+        """
+        return None
+
+    async def reconcile(self, dns_records: list[DNSRecord], logger: Logger) -> Optional[ReconciliationResult]:
+        """
+        Brings every record of dns_records to its desired ip, writing only the ones that differ.\n
+        The default implementation looks up and writes each record on its own. Nameservers able to
+        list a whole zone or to write in batches should override it.
+        """
+        result: dict[str, list[DNSRecord]] = {"created": [], "updated": [], "unchanged": [], "failed": []}
+        for dns_record in dns_records:
+            try:
+                current_dns_record: Optional[DNSRecord] = await self.find_record(name=dns_record.name, logger=logger, record_type=dns_record.type)
+            except RecordLookupError:
+                # Writing now could create a duplicate of a record that exists
+                result["failed"].append(dns_record)
+                continue
+            if current_dns_record is not None and current_dns_record.ip == dns_record.ip:
+                result["unchanged"].append(dns_record)
+            elif not await self.set_record(dns_record=dns_record, logger=logger):
+                result["failed"].append(dns_record)
+            else:
+                result["created" if current_dns_record is None else "updated"].append(dns_record)
+        return ReconciliationResult(**result)
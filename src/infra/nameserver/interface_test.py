@@ -0,0 +1,54 @@
+import asyncio
+from ipaddress import IPv4Address
+from typing import Optional
+
+from src.domain.value_objects import DNSRecord, RecordType, ReconciliationResult
+from src.infra.nameserver.interface import AsyncNameserverInterface, RecordLookupError
+from src.infra.loggers.standard import Logger, StandardLogger, LogLevel
+
+class InMemoryNameserver(AsyncNameserverInterface):
+    records: dict[str, DNSRecord]
+    unreachable: set[str]
+    written: list[DNSRecord]
+
+    def __init__(self, records: list[DNSRecord], unreachable: tuple[str, ...] = ()):
+        self.records = {dns_record.name: dns_record for dns_record in records}
+        self.unreachable = set(unreachable)
+        self.written = []
+
+    async def get_record_by_ip(self, ip: IPv4Address, logger: Logger) -> Optional[DNSRecord]:
+        return next((dns_record for dns_record in self.records.values() if dns_record.ip == ip), None)
+
+    async def get_record_by_name(self, name: str, logger: Logger, record_type: RecordType = RecordType.A) -> Optional[DNSRecord]:
+        return None if name in self.unreachable else self.records.get(name)
+
+    async def set_record(self, dns_record: DNSRecord, logger: Logger) -> bool:
+        self.written.append(dns_record)
+        self.records[dns_record.name] = dns_record
+        return True
+
+class TellingNameserver(InMemoryNameserver):
+    async def find_record(self, name: str, logger: Logger, record_type: RecordType = RecordType.A) -> Optional[DNSRecord]:
+        if name in self.unreachable:
+            raise RecordLookupError(name)
+        return self.records.get(name)
+
+def test_reconcile_only_creates_the_records_known_to_be_missing():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    ip = IPv4Address("198.51.100.7")
+    desired: list[DNSRecord] = [DNSRecord(ip=ip, name=name) for name in ("home.example.com", "vpn.example.com", "new.example.com")]
+
+    async def run(nameserver: InMemoryNameserver) -> Optional[ReconciliationResult]:
+        return await nameserver.reconcile(desired, logger)
+
+    telling = TellingNameserver([DNSRecord(ip=IPv4Address("198.51.100.1"), name="home.example.com")], unreachable=("vpn.example.com",))
+    result = asyncio.run(run(telling))
+    assert result is not None
+    assert result.updated == desired[:1] and result.failed == desired[1:2] and result.created == desired[2:]
+    assert [dns_record.name for dns_record in telling.written] == ["home.example.com", "new.example.com"]
+
+    # Without find_record, a missing record cannot be told apart from a failed lookup: nothing is created
+    guessing = InMemoryNameserver([DNSRecord(ip=IPv4Address("198.51.100.1"), name="home.example.com")])
+    result = asyncio.run(run(guessing))
+    assert result is not None
+    assert result.updated == desired[:1] and result.failed == desired[1:] and not result.created
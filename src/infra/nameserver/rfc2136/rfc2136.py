@@ -0,0 +1,207 @@
+import asyncio
+import time
+from ipaddress import ip_address
+from typing import Optional
+import dns.asyncquery
+import dns.exception
+import dns.message
+import dns.name
+import dns.rcode
+import dns.rdatatype
+import dns.tsig
+import dns.tsigkeyring
+import dns.update
+import dns.zone
+
+from src.domain.reconciliation import RecordKey, diff_records, record_key
+from src.domain.value_objects import AnyIPAddress, DNSRecord, RecordType, ReconciliationResult, RecordChanges
+from src.infra.loggers.interface import Logger
+from src.infra.metrics.instruments import CallOutcome, record_call
+from src.infra.nameserver.interface import AsyncNameserverInterface, RecordLookupError
+from src.infra.resilience import call_timeout
+
+class Rfc2136Nameserver(AsyncNameserverInterface):
+    """
+    Manages the records of a zone served by BIND, Knot, PowerDNS or any server implementing dynamic
+    updates (RFC 2136). Lookups are plain queries to the primary server, writes are UPDATE messages,
+    optionally signed with a TSIG key (RFC 8945).
+
+    `reconcile` writes every changed record in a single UPDATE, which the server applies atomically.
+
+    Arguments:
+        zone (str): The zone holding the records, e.g. `example.com`.
+        server (str): IP address of the primary server of the zone.
+        port (int): Port of the server.
+        tsig_key_name (Optional[str]): Name of the TSIG key allowed to update the zone. Unsigned messages if None.
+        tsig_secret (Optional[str]): Base64 secret of the TSIG key.
+        tsig_algorithm (str): Algorithm of the TSIG key, e.g. `hmac-sha256`.
+        ttl (int): TTL of the records written.
+        timeout (float): Seconds to wait for each answer.
+    """
+    _zone: dns.name.Name
+    _server: str
+    _port: int
+    _keyring: Optional[dict[dns.name.Name, dns.tsig.Key]]
+    _tsig_key_name: Optional[dns.name.Name]
+    _tsig_algorithm: dns.name.Name
+    _ttl: int
+    _timeout: float
+    _provider: str
+
+    def __init__(self, zone: str, server: str, port: int = 53, tsig_key_name: Optional[str] = None, tsig_secret: Optional[str] = None,
+                 tsig_algorithm: str = "hmac-sha256", ttl: int = 300, timeout: float = 5):
+        self._zone = dns.name.from_text(zone)
+        self._server = server
+        self._port = port
+        self._tsig_algorithm = dns.name.from_text(tsig_algorithm)
+        self._keyring = None
+        self._tsig_key_name = None
+        if tsig_key_name is not None and tsig_secret is not None:
+            self._tsig_key_name = dns.name.from_text(tsig_key_name)
+            self._keyring = dns.tsigkeyring.from_text({tsig_key_name: (tsig_algorithm, tsig_secret)})
+        self._ttl = ttl
+        self._timeout = timeout
+        self._provider = f"rfc2136:{server}"
+
+    async def get_record_by_ip(self, ip: AnyIPAddress, logger: Logger) -> Optional[DNSRecord]:
+        """DNS cannot be queried by content, so the zone is transferred (AXFR) and searched."""
+        zone = dns.zone.Zone(self._zone)
+        query = dns.message.make_query(self._zone, dns.rdatatype.AXFR)
+        self._sign(query)
+        started: float = time.perf_counter()
+        try:
+            await dns.asyncquery.inbound_xfr(self._server, zone, query=query, port=self._port, timeout=call_timeout(self._timeout))
+        except asyncio.CancelledError:
+            record_call(self._provider, "transfer", CallOutcome.CANCELLED, time.perf_counter() - started)
+            raise
+        except dns.exception.Timeout:
+            record_call(self._provider, "transfer", CallOutcome.TIMEOUT, time.perf_counter() - started)
+            logger.error("Transfer of the zone %s from %s timed out", self._zone, self._server)
+            return None
+        except (dns.exception.DNSException, OSError) as e:
+            record_call(self._provider, "transfer", CallOutcome.ERROR, time.perf_counter() - started)
+            logger.error("An error occurred during the transfer of the zone %s from %s: %s", self._zone, self._server, e)
+            return None
+        record_call(self._provider, "transfer", CallOutcome.SUCCESS, time.perf_counter() - started)
+
+        record_type: RecordType = RecordType.of(ip)
+        names: list[str] = [name.derelativize(self._zone).to_text(omit_final_dot=True)
+                            for name, _, rdata in zone.iterate_rdatas(dns.rdatatype.from_text(record_type.value)) if ip_address(rdata.address) == ip]
+        if not names:
+            logger.warning("No DNS record found in the zone %s for the address %s", self._zone, ip)
+            return None
+        if len(names) > 1:
+            logger.error("The zone %s holds more than one DNS record for the address %s: %s", self._zone, ip, names)
+            return None
+        return DNSRecord(ip=ip, name=names[0], type=record_type)
+
+    async def get_record_by_name(self, name: str, logger: Logger, record_type: RecordType = RecordType.A) -> Optional[DNSRecord]:
+        addresses: Optional[list[AnyIPAddress]] = await self._query(name, record_type, logger)
+        if not addresses:
+            if addresses is not None:
+                logger.warning("No %s DNS record found in the zone %s for the name %s", record_type.value, self._zone, name)
+            return None
+        return DNSRecord(ip=addresses[0], name=name, type=record_type)
+
+    async def find_record(self, name: str, logger: Logger, record_type: RecordType = RecordType.A) -> Optional[DNSRecord]:
+        addresses: Optional[list[AnyIPAddress]] = await self._query(name, record_type, logger)
+        if addresses is None:
+            raise RecordLookupError(name)
+        return DNSRecord(ip=addresses[0], name=name, type=record_type) if addresses else None
+
+    async def set_record(self, dns_record: DNSRecord, logger: Logger) -> bool:
+        return await self._update([dns_record], logger)
+
+    async def reconcile(self, dns_records: list[DNSRecord], logger: Logger) -> Optional[ReconciliationResult]:
+        """Looks every record up concurrently, then writes the ones that differ in a single atomic UPDATE."""
+        lookups: list[Optional[list[AnyIPAddress]]] = await asyncio.gather(
+            *(self._query(dns_record.name, dns_record.type, logger) for dns_record in dns_records))
+
+        existing_index: dict[RecordKey, DNSRecord] = {}
+        for dns_record, addresses in zip(dns_records, lookups):
+            if addresses is None:
+                return None
+            if addresses:
+                existing_index[record_key(dns_record.name, dns_record.type)] = DNSRecord(ip=addresses[0], name=dns_record.name, type=dns_record.type)
+
+        changes: RecordChanges = diff_records(existing_index, dns_records)
+        writes: list[DNSRecord] = changes.creates + changes.updates
+        if not writes:
+            return ReconciliationResult(unchanged=changes.unchanged)
+
+        if not await self._update(writes, logger):
+            return ReconciliationResult(unchanged=changes.unchanged, failed=writes)
+        logger.info("Reconciled %s DNS Records of the zone %s. Created: %s, updated: %s, unchanged: %s", len(dns_records), self._zone, len(changes.creates), len(changes.updates), len(changes.unchanged))
+        return ReconciliationResult(created=changes.creates, updated=changes.updates, unchanged=changes.unchanged)
+
+    def _sign(self, message: dns.message.Message):
+        if self._keyring is not None:
+            message.use_tsig(self._keyring, keyname=self._tsig_key_name, algorithm=self._tsig_algorithm)
+
+    async def _query(self, name: str, record_type: RecordType, logger: Logger) -> Optional[list[AnyIPAddress]]:
+        """Addresses held by the record, an empty list if there is none, or None if the server could not be queried."""
+        query = dns.message.make_query(dns.name.from_text(name), dns.rdatatype.from_text(record_type.value))
+        self._sign(query)
+        started: float = time.perf_counter()
+        try:
+            # Falls back to TCP when the answer does not fit in a datagram
+            response, _ = await dns.asyncquery.udp_with_fallback(query, self._server, timeout=call_timeout(self._timeout), port=self._port)
+        except asyncio.CancelledError:
+            record_call(self._provider, "lookup", CallOutcome.CANCELLED, time.perf_counter() - started)
+            raise
+        except dns.exception.Timeout:
+            record_call(self._provider, "lookup", CallOutcome.TIMEOUT, time.perf_counter() - started)
+            logger.error("DNS query for %s timed out at %s", name, self._server)
+            return None
+        except (dns.exception.DNSException, OSError) as e:
+            record_call(self._provider, "lookup", CallOutcome.ERROR, time.perf_counter() - started)
+            logger.error("An error occurred during the DNS query for %s to %s: %s", name, self._server, e)
+            return None
+
+        duration: float = time.perf_counter() - started
+        if response.rcode() not in (dns.rcode.NOERROR, dns.rcode.NXDOMAIN):
+            record_call(self._provider, "lookup", CallOutcome.ERROR, duration)
+            logger.error("DNS query for %s refused by %s: %s", name, self._server, dns.rcode.to_text(response.rcode()))
+            return None
+
+        addresses: list[AnyIPAddress] = []
+        try:
+            for rrset in response.answer:
+                if rrset.rdtype == query.question[0].rdtype:
+                    addresses.extend(ip_address(rdata.address) for rdata in rrset)
+        except ValueError as e:
+            record_call(self._provider, "lookup", CallOutcome.PARSE_ERROR, duration)
+            logger.error("Invalid address in the answer for %s from %s: %s", name, self._server, e)
+            return None
+        record_call(self._provider, "lookup", CallOutcome.SUCCESS, duration)
+        return addresses
+
+    async def _update(self, dns_records: list[DNSRecord], logger: Logger) -> bool:
+        """Replaces the records of dns_records in a single UPDATE message. The server applies all of them or none."""
+        update = dns.update.UpdateMessage(self._zone, keyring=self._keyring, keyname=self._tsig_key_name, keyalgorithm=self._tsig_algorithm)
+        for dns_record in dns_records:
+            update.replace(dns.name.from_text(dns_record.name), self._ttl, dns_record.type.value, str(dns_record.ip))
+
+        started: float = time.perf_counter()
+        try:
+            response, _ = await dns.asyncquery.udp_with_fallback(update, self._server, timeout=call_timeout(self._timeout), port=self._port)
+        except asyncio.CancelledError:
+            record_call(self._provider, "update", CallOutcome.CANCELLED, time.perf_counter() - started)
+            raise
+        except dns.exception.Timeout:
+            record_call(self._provider, "update", CallOutcome.TIMEOUT, time.perf_counter() - started)
+            logger.error("DNS UPDATE of the zone %s timed out at %s", self._zone, self._server)
+            return False
+        except (dns.exception.DNSException, OSError) as e:
+            record_call(self._provider, "update", CallOutcome.ERROR, time.perf_counter() - started)
+            logger.error("An error occurred during the DNS UPDATE of the zone %s at %s: %s", self._zone, self._server, e)
+            return False
+
+        duration: float = time.perf_counter() - started
+        if response.rcode() != dns.rcode.NOERROR:
+            record_call(self._provider, "update", CallOutcome.ERROR, duration)
+            logger.error("DNS UPDATE of the zone %s refused by %s: %s", self._zone, self._server, dns.rcode.to_text(response.rcode()))
+            return False
+        record_call(self._provider, "update", CallOutcome.SUCCESS, duration)
+        logger.info("Successfully updated %s DNS Record(s) of the zone %s", len(dns_records), self._zone)
+        return True
@@ -0,0 +1,45 @@
+import asyncio
+from ipaddress import IPv4Address
+from typing import Optional
+
+from src.domain.value_objects import DNSRecord, ReconciliationResult
+from src.infra.nameserver.rfc2136.rfc2136 import Rfc2136Nameserver
+from src.infra.loggers.standard import Logger, StandardLogger, LogLevel
+from src.benchmarks.fakes import FakeDnsServer
+
+SECRET: str = "c2VjcmV0LXNoYXJlZC13aXRoLXRoZS1wcmltYXJ5LXNlcnZlcg=="
+
+def test_reconcile_sends_a_single_signed_update():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    server = FakeDnsServer("example.com", keyring={"lipadns": SECRET})
+    server.add_record("host-0.example.com", "198.51.100.1")
+    server.add_record("host-1.example.com", "198.51.100.7")
+    server.add_record("static.example.com", "203.0.113.5")
+
+    async def run() -> tuple[Optional[ReconciliationResult], Optional[DNSRecord], Optional[DNSRecord], bool]:
+        await server.start()
+        try:
+            nameserver = Rfc2136Nameserver("example.com", "127.0.0.1", port=server.port, tsig_key_name="lipadns", tsig_secret=SECRET, timeout=1)
+            result: Optional[ReconciliationResult] = await nameserver.reconcile(
+                [DNSRecord(ip=IPv4Address("198.51.100.7"), name=f"host-{index}.example.com") for index in range(3)], logger)
+            by_name: Optional[DNSRecord] = await nameserver.get_record_by_name("host-2.example.com", logger)
+            by_ip: Optional[DNSRecord] = await nameserver.get_record_by_ip(IPv4Address("203.0.113.5"), logger)
+            unsigned: bool = await Rfc2136Nameserver("example.com", "127.0.0.1", port=server.port, timeout=1).set_record(
+                DNSRecord(ip=IPv4Address("192.0.2.1"), name="host-0.example.com"), logger)
+            return result, by_name, by_ip, unsigned
+        finally:
+            await server.close()
+
+    result, by_name, by_ip, unsigned = asyncio.run(run())
+
+    assert result is not None
+    assert [record.name for record in result.updated] == ["host-0.example.com"]
+    assert [record.name for record in result.created] == ["host-2.example.com"]
+    assert [record.name for record in result.unchanged] == ["host-1.example.com"]
+    assert server.calls["UPDATE"] == 2 and server.calls["QUERY A"] == 4
+    assert by_name == DNSRecord(ip=IPv4Address("198.51.100.7"), name="host-2.example.com")
+    # Found through a zone transfer
+    assert by_ip == DNSRecord(ip=IPv4Address("203.0.113.5"), name="static.example.com") and server.calls["QUERY AXFR"] == 1
+    # Unsigned updates are refused, and leave the zone untouched
+    assert not unsigned
+    assert all(server.content_of(f"host-{index}.example.com") == "198.51.100.7" for index in range(3))
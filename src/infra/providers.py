@@ -0,0 +1,98 @@
+import importlib
+import inspect
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from src.infra.loggers.interface import Logger
+
+@dataclass(slots=True, frozen=True)
+class ProviderSpec:
+    """
+    Where a provider lives, as `module:attribute`, so it can be registered without importing it.
+
+    Arguments:
+        target (str): The class (or factory) building the provider, e.g. `src.infra.ip.ipify:AsyncIpify`.
+        extra (Optional[str]): Optional requirement group it depends on, installed from `requirements-<extra>.txt`.
+        defaults (dict[str, Any]): Arguments it is built with, unless overridden.
+    """
+    target: str
+    extra: Optional[str] = None
+    defaults: dict[str, Any] = field(default_factory=dict)
+
+class ProviderUnavailableError(Exception):
+    """The provider is not registered, or its optional dependencies are not installed."""
+
+class ProviderRegistry:
+    """
+    IP sources, nameservers, loggers and lease backends, by kind and by the name the configuration selects them with.
+
+    Providers are imported when first loaded, not when registered: a process only pays the import time
+    and the memory of the providers its configuration selects, and only needs their optional dependencies.
+    """
+    _specs: dict[str, dict[str, ProviderSpec]]
+
+    def __init__(self):
+        self._specs = {}
+
+    def register(self, kind: str, name: str, target: str, extra: Optional[str] = None, **defaults: Any):
+        self._specs.setdefault(kind, {})[name] = ProviderSpec(target=target, extra=extra, defaults=defaults)
+
+    def names(self, kind: str) -> list[str]:
+        return list(self._specs.get(kind, {}))
+
+    def spec(self, kind: str, name: str) -> ProviderSpec:
+        """Raises ProviderUnavailableError if no provider of kind is registered as name."""
+        spec: Optional[ProviderSpec] = self._specs.get(kind, {}).get(name)
+        if spec is None:
+            raise ProviderUnavailableError(f"Unknown {kind} provider '{name}'. Available: {', '.join(self.names(kind))}")
+        return spec
+
+    def load(self, kind: str, name: str) -> Callable[..., Any]:
+        """
+        Imports the provider registered as name.
+
+        Raises:
+            ProviderUnavailableError: If it is not registered, or if its module (or a dependency) cannot be imported.
+        """
+        spec: ProviderSpec = self.spec(kind, name)
+        module_name, _, attribute = spec.target.partition(":")
+        try:
+            return getattr(importlib.import_module(module_name), attribute)
+        except ImportError as e:
+            hint: str = f". Install it with `pip install -r requirements-{spec.extra}.txt`" if spec.extra else ""
+            raise ProviderUnavailableError(f"The {kind} provider '{name}' is missing a dependency: {e}{hint}") from e
+
+    def create(self, kind: str, name: str, logger: Logger, **arguments: Any) -> Optional[Any]:
+        """
+        Builds the provider registered as name, from its defaults overridden by arguments. Arguments it
+        does not take are left out, so every provider of a kind can be built from the same ones.
+
+        Returns:
+            Optional[Any]: The provider. None if it is unavailable, which is logged.
+        """
+        try:
+            factory: Callable[..., Any] = self.load(kind, name)
+        except ProviderUnavailableError as e:
+            logger.error("%s", e)
+            return None
+        parameters = inspect.signature(factory).parameters
+        return factory(**{key: value for key, value in {**self.spec(kind, name).defaults, **arguments}.items() if key in parameters})
+
+PROVIDERS: ProviderRegistry = ProviderRegistry()
+"""The providers LipaDNS ships with."""
+
+PROVIDERS.register("ip", "ipify", "src.infra.ip.ipify:AsyncIpify", version=4)
+PROVIDERS.register("ip", "ipify6", "src.infra.ip.ipify:AsyncIpify", version=6)
+PROVIDERS.register("ip", "icanhazip", "src.infra.ip.plaintext:PlainTextIpSource", url="https://ipv4.icanhazip.com", version=4)
+PROVIDERS.register("ip", "icanhazip6", "src.infra.ip.plaintext:PlainTextIpSource", url="https://ipv6.icanhazip.com", version=6)
+PROVIDERS.register("ip", "amazon", "src.infra.ip.plaintext:PlainTextIpSource", url="https://checkip.amazonaws.com", version=4)
+PROVIDERS.register("ip", "opendns", "src.infra.ip.dns_whoami:DnsWhoamiIp", extra="dns")
+PROVIDERS.register("ip", "opendns6", "src.infra.ip.dns_whoami:DnsWhoamiIp", extra="dns", nameserver="2620:119:35::35", rdtype="AAAA")
+
+PROVIDERS.register("nameserver", "cloudflare", "src.infra.nameserver.cloudflare.cloudflare_async:AsyncCloudflareNameserver")
+PROVIDERS.register("nameserver", "rfc2136", "src.infra.nameserver.rfc2136.rfc2136:Rfc2136Nameserver", extra="dns")
+
+PROVIDERS.register("logger", "standard", "src.infra.loggers.standard:StandardLogger")
+
+PROVIDERS.register("lease", "sqlite", "src.infra.lease.sqlite:SqliteLease")
+PROVIDERS.register("lease", "file", "src.infra.lease.filelock:FileLockLease")
@@ -0,0 +1,34 @@
+import asyncio
+import subprocess
+import sys
+
+from src.infra.http import create_async_client
+from src.infra.ip.ipify import AsyncIpify
+from src.infra.loggers.standard import Logger, StandardLogger, LogLevel
+from src.infra.providers import PROVIDERS, ProviderRegistry
+from src.benchmarks.startup import OPTIONAL_PACKAGES
+
+def test_default_configuration_imports_no_optional_dependency():
+    # A fresh interpreter: this one already imported every provider through the other tests
+    script: str = f"import sys, src.app; print(sorted({{name.split('.')[0] for name in sys.modules}} & {set(OPTIONAL_PACKAGES)!r}))"
+    loaded: str = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout.strip()
+
+    assert loaded == "[]"
+
+def test_providers_are_built_from_their_defaults_and_the_arguments_they_take():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    client = create_async_client()
+
+    ipify6 = PROVIDERS.create("ip", "ipify6", logger, client=client, unused="ignored")
+
+    assert isinstance(ipify6, AsyncIpify)
+    assert ipify6._version == 6 and ipify6._client is client
+    asyncio.run(client.aclose())
+
+def test_unavailable_providers_are_reported():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    registry = ProviderRegistry()
+    registry.register("nameserver", "route53", "src.infra.nameserver.route53:Route53Nameserver", extra="aws")
+
+    assert registry.create("nameserver", "route53", logger) is None
+    assert registry.create("nameserver", "unknown", logger) is None
@@ -0,0 +1,252 @@
+import asyncio
+import heapq
+import itertools
+from enum import IntEnum
+from typing import Optional
+
+from src.infra.clock import Clock, SystemClock
+from src.infra.metrics.instruments import RATE_LIMITED_RESPONSES, RATE_LIMITER_CALLS, RATE_LIMITER_QUEUE_DEPTH, RATE_LIMITER_TOKENS
+
+EPSILON: float = 1e-9
+"""Tolerance on token counts, so floating point residue never leaves a waiter a hair short of a token forever."""
+
+class RequestPriority(IntEnum):
+    """Lower values are served first."""
+    WRITE = 0
+    READ = 1
+    VERIFY = 2
+
+class TokenBucket:
+    """
+    Holds up to `capacity` tokens, refilled continuously at `refill_rate` tokens per second.
+    Over any window of `w` seconds, at most `capacity + refill_rate * w` tokens can be taken.
+    """
+    _capacity: float
+    _refill_rate: float
+    _clock: Clock
+    _tokens: float
+    _updated_at: float
+    _paused_until: float
+
+    def __init__(self, capacity: float, refill_rate: float, clock: Optional[Clock] = None):
+        self._capacity = capacity
+        self._refill_rate = refill_rate
+        self._clock = clock if clock is not None else SystemClock()
+        self._tokens = capacity
+        self._updated_at = self._clock.now()
+        self._paused_until = 0
+
+    @property
+    def level(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        self._refill()
+        if self._clock.now() < self._paused_until or self._tokens + EPSILON < tokens:
+            return False
+        self._tokens = max(0.0, self._tokens - tokens)
+        return True
+
+    def time_until(self, tokens: float = 1) -> float:
+        """Seconds until `tokens` can be acquired, if no one else takes them first."""
+        self._refill()
+        now: float = self._clock.now()
+        pause: float = max(0.0, self._paused_until - now)
+        missing: float = max(0.0, tokens - self._tokens)
+        return max(pause, missing / self._refill_rate if self._refill_rate > 0 else float("inf"))
+
+    def pause(self, seconds: float):
+        """Empties the bucket and refuses every token for `seconds`, e.g. after the server answered 429."""
+        self._refill()
+        self._tokens = 0
+        self._paused_until = max(self._paused_until, self._clock.now() + seconds)
+
+    def _refill(self):
+        now: float = self._clock.now()
+        # Tokens do not accumulate while paused
+        refill_from: float = max(self._updated_at, self._paused_until)
+        if now > refill_from:
+            self._tokens = min(self._capacity, self._tokens + (now - refill_from) * self._refill_rate)
+        self._updated_at = max(self._updated_at, now)
+
+class RateLimiterStats:
+    __slots__ = ("calls_made", "calls_throttled", "calls_expired", "rate_limited_responses", "bucket_level", "queue_depth")
+
+    def __init__(self, calls_made: int, calls_throttled: int, calls_expired: int, rate_limited_responses: int, bucket_level: float, queue_depth: int):
+        self.calls_made = calls_made
+        self.calls_throttled = calls_throttled
+        self.calls_expired = calls_expired
+        self.rate_limited_responses = rate_limited_responses
+        self.bucket_level = bucket_level
+        self.queue_depth = queue_depth
+
+class _Waiter:
+    __slots__ = ("priority", "sequence", "deadline", "future")
+
+    def __init__(self, priority: RequestPriority, sequence: int, deadline: Optional[float], future: asyncio.Future[bool]):
+        self.priority = priority
+        self.sequence = sequence
+        self.deadline = deadline
+        self.future = future
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+class RateLimitedScheduler:
+    """
+    Admits requests to an API within a token budget, shared by every client using the same credentials.
+
+    A request goes through immediately while tokens are available and no one is queued. Otherwise it
+    waits in a queue ordered by priority (writes before reads before verification reads) and then by
+    arrival, until a token frees up or its deadline passes.
+
+    Arguments:
+        budget (int): Requests allowed per `window` seconds. Never exceeded, whatever the traffic pattern.
+        window (float): Length, in seconds, of the window the budget applies to.
+        burst (Optional[int]): Requests that can go through back-to-back. Defaults to a sixth of the budget.
+            Must be lower than the budget, unless the budget is 1.
+        name (str): Label of the scheduler's metrics, e.g. the API it guards.
+
+    Raises:
+        ValueError: If the budget is lower than 1, or the burst would leave no tokens to refill over the window.
+    """
+    _name: str
+    _bucket: TokenBucket
+    _clock: Clock
+    _waiters: list[_Waiter]
+    _sequence: itertools.count
+    _dispatcher: Optional[asyncio.Task[None]]
+    _wake: asyncio.Event
+    _wake_up_at: Optional[float]
+    _calls_made: int
+    _calls_throttled: int
+    _calls_expired: int
+    _rate_limited_responses: int
+
+    def __init__(self, budget: int, window: float, burst: Optional[int] = None, clock: Optional[Clock] = None, name: str = "cloudflare"):
+        if budget < 1:
+            raise ValueError(f"The budget of a rate limiter must be at least 1, not {budget}")
+        burst = burst if burst is not None else max(1, budget // 6)
+        if budget > 1 and not 1 <= burst < budget:
+            raise ValueError(f"The burst of a rate limiter must be between 1 and the budget minus 1 ({budget - 1}), not {burst}")
+        self._name = name
+        self._clock = clock if clock is not None else SystemClock()
+        # burst + refill_rate * window == budget, so no window can see more than the budget. With a budget of 1,
+        # the token taken comes back a whole window later, which still admits one request per window
+        refill_rate: float = (budget - burst) / window if budget > 1 else 1 / window
+        self._bucket = TokenBucket(capacity=min(burst, budget), refill_rate=refill_rate, clock=self._clock)
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._dispatcher = None
+        self._wake = asyncio.Event()
+        self._wake_up_at = None
+        self._calls_made = 0
+        self._calls_throttled = 0
+        self._calls_expired = 0
+        self._rate_limited_responses = 0
+        RATE_LIMITER_TOKENS.set_function(lambda: self._bucket.level, name)
+        RATE_LIMITER_QUEUE_DEPTH.set_function(self._queue_depth, name)
+
+    @property
+    def clock(self) -> Clock:
+        return self._clock
+
+    async def acquire(self, priority: RequestPriority = RequestPriority.READ, deadline: Optional[float] = None) -> bool:
+        """
+        Waits for permission to send one request.
+
+        Arguments:
+            priority (RequestPriority): Queue class of the request.
+            deadline (Optional[float]): Time (per the scheduler's clock) after which the request is not worth sending anymore.
+
+        Returns:
+            bool: True if the request may be sent, False if its deadline passed while queued.
+        """
+        if not self._waiters and self._bucket.try_acquire():
+            self._admitted()
+            return True
+
+        self._calls_throttled += 1
+        RATE_LIMITER_CALLS.inc(self._name, "throttled")
+        future: asyncio.Future[bool] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, _Waiter(priority, next(self._sequence), deadline, future))
+        if self._dispatcher is None or self._dispatcher.done():
+            # Created along with the dispatcher, so that it belongs to the running event loop
+            self._wake = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        elif deadline is not None and self._wake_up_at is not None and deadline < self._wake_up_at:
+            # The dispatcher sleeps past this deadline: it must turn the request away in time
+            self._wake.set()
+        # Cancelling the caller cancels the future, which the dispatcher then skips
+        return await future
+
+    def report_rate_limited(self, retry_after: Optional[float]):
+        """Feedback from a 429 response: stop sending until the server allows it again."""
+        self._rate_limited_responses += 1
+        RATE_LIMITED_RESPONSES.inc(self._name)
+        self._bucket.pause(retry_after if retry_after is not None else 1)
+
+    def stats(self) -> RateLimiterStats:
+        return RateLimiterStats(calls_made=self._calls_made,
+                                calls_throttled=self._calls_throttled,
+                                calls_expired=self._calls_expired,
+                                rate_limited_responses=self._rate_limited_responses,
+                                bucket_level=self._bucket.level,
+                                queue_depth=self._queue_depth())
+
+    def _queue_depth(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.future.done())
+
+    def _admitted(self):
+        self._calls_made += 1
+        RATE_LIMITER_CALLS.inc(self._name, "admitted")
+
+    async def _dispatch(self):
+        while self._waiters:
+            head: _Waiter = self._waiters[0]
+            if head.future.done():
+                # Cancelled while queued
+                heapq.heappop(self._waiters)
+                continue
+            if self._expire(head):
+                heapq.heappop(self._waiters)
+                continue
+            if self._bucket.try_acquire():
+                heapq.heappop(self._waiters)
+                self._admitted()
+                head.future.set_result(True)
+                continue
+
+            # Sleep until a token frees up, waking earlier to turn away the requests whose deadline passes meanwhile,
+            # including the ones queued while sleeping
+            now: float = self._clock.now()
+            deadlines: list[float] = [waiter.deadline for waiter in self._waiters if waiter.deadline is not None and not waiter.future.done()]
+            wake_up: float = self._bucket.time_until()
+            if deadlines:
+                wake_up = min(wake_up, max(0.0, min(deadlines) - now))
+            await self._sleep(wake_up)
+            for waiter in self._waiters:
+                self._expire(waiter)
+
+    async def _sleep(self, seconds: float):
+        """Sleeps for `seconds`, unless `acquire` wakes the dispatcher up earlier."""
+        self._wake.clear()
+        self._wake_up_at = self._clock.now() + seconds
+        sleep: asyncio.Task[None] = asyncio.create_task(self._clock.sleep(seconds))
+        woken: asyncio.Task[bool] = asyncio.create_task(self._wake.wait())
+        try:
+            await asyncio.wait((sleep, woken), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self._wake_up_at = None
+            sleep.cancel()
+            woken.cancel()
+
+    def _expire(self, waiter: _Waiter) -> bool:
+        """Rejects the waiter if its deadline passed. Returns whether it did."""
+        if waiter.future.done() or waiter.deadline is None or waiter.deadline > self._clock.now():
+            return False
+        waiter.future.set_result(False)
+        self._calls_expired += 1
+        RATE_LIMITER_CALLS.inc(self._name, "expired")
+        return True
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from src.infra.clock import ManualClock, VirtualClock
+from src.infra.metrics.instruments import RATE_LIMITER_CALLS, RATE_LIMITER_TOKENS
+from src.infra.ratelimit import RateLimitedScheduler, RequestPriority
+
+def test_budget_is_never_exceeded():
+    clock = ManualClock()
+    limiter = RateLimitedScheduler(budget=10, window=10, burst=4, clock=clock)
+    admitted_at: list[float] = []
+
+    async def call():
+        assert await limiter.acquire()
+        admitted_at.append(clock.now())
+
+    async def run():
+        await asyncio.gather(*(call() for _ in range(60)))
+
+    asyncio.run(run())
+
+    assert len(admitted_at) == 60
+    for start in admitted_at:
+        assert sum(1 for t in admitted_at if start <= t < start + 10) <= 10
+    stats = limiter.stats()
+    assert stats.calls_made == 60 and stats.calls_throttled == 56 and stats.queue_depth == 0
+
+def test_writes_go_first_and_expired_requests_are_turned_away():
+    clock = ManualClock()
+    limiter = RateLimitedScheduler(budget=2, window=10, burst=1, clock=clock)
+    order: list[str] = []
+
+    async def call(name: str, priority: RequestPriority, deadline: float | None = None):
+        if await limiter.acquire(priority=priority, deadline=deadline):
+            order.append(name)
+
+    async def run():
+        assert await limiter.acquire()
+        await asyncio.gather(call("verify", RequestPriority.VERIFY),
+                             call("read", RequestPriority.READ),
+                             call("late read", RequestPriority.READ, deadline=5),
+                             call("write", RequestPriority.WRITE))
+
+    asyncio.run(run())
+
+    assert order == ["write", "read", "verify"]
+    assert limiter.stats().calls_expired == 1
+
+def test_rate_limited_response_pauses_admissions():
+    clock = ManualClock()
+    limiter = RateLimitedScheduler(budget=100, window=10, burst=50, clock=clock)
+
+    async def run() -> float:
+        limiter.report_rate_limited(retry_after=30)
+        assert await limiter.acquire()
+        return clock.now()
+
+    assert asyncio.run(run()) >= 30
+    assert limiter.stats().rate_limited_responses == 1
+
+def test_a_budget_of_one_still_refills():
+    clock = VirtualClock()
+    limiter = RateLimitedScheduler(budget=1, window=300, clock=clock, name="single")
+    admitted_at: list[float] = []
+
+    async def call():
+        assert await limiter.acquire()
+        admitted_at.append(clock.now())
+
+    async def run():
+        await asyncio.gather(*(call() for _ in range(3)))
+
+    clock.run(run())
+
+    assert admitted_at == [0, 300, 600]
+    assert RATE_LIMITER_CALLS.value("single", "admitted") == 3 and RATE_LIMITER_CALLS.value("single", "throttled") == 2
+    assert RATE_LIMITER_TOKENS.value("single") == 0
+
+def test_a_burst_of_the_whole_budget_is_rejected():
+    with pytest.raises(ValueError):
+        RateLimitedScheduler(budget=10, window=10, burst=10)
+
+def test_a_request_queued_meanwhile_expires_on_time():
+    clock = VirtualClock()
+    limiter = RateLimitedScheduler(budget=2, window=4, burst=1, clock=clock)
+
+    async def run() -> tuple[bool, float]:
+        assert await limiter.acquire()
+        queued: asyncio.Task[bool] = asyncio.create_task(limiter.acquire())
+        # The dispatcher now sleeps until the next token, 3s away
+        await asyncio.sleep(1)
+        started: float = clock.now()
+        admitted: bool = await limiter.acquire(priority=RequestPriority.WRITE, deadline=started + 0.2)
+        waited: float = clock.now() - started
+        assert await queued
+        return admitted, waited
+
+    admitted, waited = clock.run(run())
+    assert not admitted
+    assert waited == pytest.approx(0.2)
@@ -0,0 +1,281 @@
+import asyncio
+import contextlib
+import time
+from collections import deque
+from contextvars import ContextVar
+from enum import Enum
+from typing import Iterator, Optional
+import httpx
+
+from src.infra.clock import Clock, SystemClock
+from src.infra.metrics.instruments import CIRCUIT_STATE, HEDGED_REQUESTS
+
+_DEADLINE: ContextVar[Optional[float]] = ContextVar("lipadns_deadline", default=None)
+"""Event loop time by which the provider calls of the current tick must be done, if bounded."""
+
+NO_HEDGE: str = "lipadns_no_hedge"
+"""
+Request extension keeping a GET from being hedged, e.g. `client.get(url, extensions={NO_HEDGE: True})`.
+Meant for the requests admitted by a rate limiter, which counts a single call per request.
+"""
+
+def _loop_time() -> float:
+    """
+    Time of the running event loop, which bounds the calls through `asyncio.timeout`. Monotonic time
+    on a real loop, simulated time on a `VirtualTimeLoop`.
+    """
+    try:
+        return asyncio.get_running_loop().time()
+    except RuntimeError:
+        return time.monotonic()
+
+@contextlib.contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Bounds the provider calls made within the block, including by the tasks it starts, to `seconds` in total.
+    Each call gets what the previous ones left, and fails fast once nothing is left. Unbounded when None or 0.
+    """
+    if not seconds or seconds <= 0:
+        yield
+        return
+    until: float = _loop_time() + seconds
+    current: Optional[float] = _DEADLINE.get()
+    token = _DEADLINE.set(until if current is None else min(current, until))
+    try:
+        yield
+    finally:
+        _DEADLINE.reset(token)
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline. None when unbounded."""
+    until: Optional[float] = _DEADLINE.get()
+    return None if until is None else until - _loop_time()
+
+def call_timeout(timeout: float) -> float:
+    """The timeout of a call: `timeout`, shortened to what is left of the current deadline."""
+    left: Optional[float] = remaining()
+    return timeout if left is None else max(0.0, min(timeout, left))
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """The request was not sent, or not answered, before the deadline of the tick."""
+
+class CircuitOpenError(httpx.TransportError):
+    """The request was not sent: the circuit of its endpoint is open after repeated failures."""
+
+class CircuitState(Enum):
+    CLOSED = 0
+    HALF_OPEN = 1
+    OPEN = 2
+
+class CircuitBreaker:
+    """
+    Stops calling an endpoint after `failure_threshold` consecutive failures. Never opens when 0.
+
+    While open, calls fail fast. After `reset_timeout` seconds, a single call is let through as a probe
+    (half-open): the circuit closes if it succeeds, and opens again if it fails.
+    """
+    _failure_threshold: int
+    _reset_timeout: float
+    _clock: Clock
+    _state: CircuitState
+    _failures: int
+    _opened_at: float
+    _probing: bool
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30, clock: Optional[Clock] = None):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._clock = clock if clock is not None else SystemClock()
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._probing = False
+
+    @property
+    def state(self) -> CircuitState:
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go now. A call let through must be followed by `record_success`, `record_failure` or `release`."""
+        if self._failure_threshold <= 0:
+            return True
+        if self._state == CircuitState.OPEN and self._clock.now() >= self._opened_at + self._reset_timeout:
+            self._state = CircuitState.HALF_OPEN
+        if self._state == CircuitState.CLOSED:
+            return True
+        if self._state == CircuitState.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        if self._failure_threshold <= 0:
+            return
+        self._failures += 1
+        if self._state == CircuitState.HALF_OPEN or self._failures >= self._failure_threshold:
+            self._state = CircuitState.OPEN
+            self._opened_at = self._clock.now()
+        self._probing = False
+
+    def release(self):
+        """The call let through was abandoned without telling anything about the endpoint."""
+        self._probing = False
+
+class LatencyWindow:
+    """The latencies of the last `size` successful calls of an endpoint."""
+    _samples: deque[float]
+
+    def __init__(self, size: int = 100):
+        self._samples = deque(maxlen=size)
+
+    def observe(self, latency: float):
+        self._samples.append(latency)
+
+    def quantile(self, q: float, min_samples: int = 20) -> Optional[float]:
+        """The q-quantile of the latencies. None until `min_samples` were observed."""
+        if len(self._samples) < min_samples:
+            return None
+        ordered: list[float] = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class _Endpoint:
+    __slots__ = ("breaker", "latencies", "requests", "hedges")
+
+    def __init__(self, breaker: CircuitBreaker):
+        self.breaker = breaker
+        self.latencies = LatencyWindow()
+        self.requests: int = 0
+        self.hedges: int = 0
+
+class ResilientTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps the transport of an HTTP client so that every provider call behind it (IP sources, nameservers):
+    - Stops at the deadline of the tick (see `deadline`), rather than at its own timeout.
+    - Fails fast with `CircuitOpenError` while its endpoint is failing, see `CircuitBreaker`. Connection
+      errors, timeouts and 5xx responses count as failures. 4xx responses, including 429, do not: the
+      endpoint is up, and rate limiting is handled by the nameservers.
+    - If it is a GET slower than the `hedge_quantile` of its endpoint's recent latencies, is hedged with a
+      second attempt. The first good response wins and the other attempt is cancelled. At most
+      `hedge_budget` of an endpoint's requests are hedged, so hedging cannot double the load. The requests
+      carrying the `NO_HEDGE` extension are never hedged.
+
+    An endpoint is a method and a host, e.g. `GET api.cloudflare.com`.
+
+    Arguments:
+        transport (httpx.AsyncBaseTransport): The transport sending the requests.
+        failure_threshold (int): Consecutive failures opening the circuit of an endpoint. Never opened when 0.
+        reset_timeout (float): Seconds an open circuit waits before letting a probe through.
+        hedge_quantile (float): Latency quantile after which a GET is hedged. Never hedged when 0.
+        hedge_budget (float): Largest share of an endpoint's requests that may be hedged.
+    """
+    _transport: httpx.AsyncBaseTransport
+    _failure_threshold: int
+    _reset_timeout: float
+    _hedge_quantile: float
+    _hedge_budget: float
+    _clock: Clock
+    _endpoints: dict[str, _Endpoint]
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, failure_threshold: int = 5, reset_timeout: float = 30, hedge_quantile: float = 0.95,
+                 hedge_budget: float = 0.1, clock: Optional[Clock] = None):
+        self._transport = transport
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._hedge_quantile = hedge_quantile
+        self._hedge_budget = hedge_budget
+        self._clock = clock if clock is not None else SystemClock()
+        self._endpoints = {}
+
+    def circuit_state(self, endpoint: str) -> CircuitState:
+        return self._endpoints[endpoint].breaker.state if endpoint in self._endpoints else CircuitState.CLOSED
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        name: str = f"{request.method} {request.url.host}"
+        endpoint: _Endpoint = self._endpoints.setdefault(name, _Endpoint(CircuitBreaker(self._failure_threshold, self._reset_timeout, self._clock)))
+        breaker: CircuitBreaker = endpoint.breaker
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit of {name} is open", request=request)
+
+        left: Optional[float] = remaining()
+        if left is not None and left <= 0:
+            breaker.release()
+            raise DeadlineExceeded("Deadline of the tick exceeded", request=request)
+        try:
+            async with asyncio.timeout(left):
+                response: httpx.Response = await self._send(name, endpoint, request)
+        except TimeoutError:
+            breaker.release()
+            raise DeadlineExceeded("Deadline of the tick exceeded", request=request)
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except httpx.TransportError:
+            breaker.record_failure()
+            raise
+        else:
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+        finally:
+            CIRCUIT_STATE.set(breaker.state.value, name)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+    async def _send(self, name: str, endpoint: _Endpoint, request: httpx.Request) -> httpx.Response:
+        endpoint.requests += 1
+        hedge_delay: Optional[float] = None
+        if (self._hedge_quantile > 0 and request.method == "GET" and not request.extensions.get(NO_HEDGE)
+                and endpoint.breaker.state == CircuitState.CLOSED and endpoint.hedges < self._hedge_budget * endpoint.requests):
+            hedge_delay = endpoint.latencies.quantile(self._hedge_quantile)
+        if hedge_delay is None:
+            return await self._attempt(endpoint, request)
+
+        first: asyncio.Task[httpx.Response] = asyncio.create_task(self._attempt(endpoint, request))
+        attempts: dict[asyncio.Task[httpx.Response], str] = {first: "first"}
+        pending: set[asyncio.Task[httpx.Response]] = {first}
+        fallback: Optional[asyncio.Task[httpx.Response]] = None
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+            if done:
+                return first.result()
+
+            endpoint.hedges += 1
+            hedge: asyncio.Task[httpx.Response] = asyncio.create_task(self._attempt(endpoint, request))
+            attempts[hedge] = "hedge"
+            pending.add(hedge)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result().status_code < 500:
+                        HEDGED_REQUESTS.inc(name, attempts[task])
+                        return task.result()
+                    if fallback is not None and fallback.exception() is None:
+                        await fallback.result().aclose()
+                    fallback = task
+            HEDGED_REQUESTS.inc(name, "none")
+            # Both attempts failed: answer as the last one did
+            assert fallback is not None
+            return fallback.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            # A straggler answering while the winner was returned is dropped
+            await asyncio.gather(*pending, return_exceptions=True)
+            for task in pending:
+                if not task.cancelled() and task.exception() is None:
+                    await task.result().aclose()
+
+    async def _attempt(self, endpoint: _Endpoint, request: httpx.Request) -> httpx.Response:
+        started: float = _loop_time()
+        response: httpx.Response = await self._transport.handle_async_request(request)
+        if response.status_code < 500:
+            endpoint.latencies.observe(_loop_time() - started)
+        return response
@@ -0,0 +1,103 @@
+import asyncio
+import time
+import httpx
+import pytest
+
+from src.infra.clock import ManualClock
+from src.infra.metrics.instruments import HEDGED_REQUESTS
+from src.infra.resilience import NO_HEDGE, CircuitOpenError, CircuitState, DeadlineExceeded, ResilientTransport, deadline
+
+def test_circuit_opens_fails_fast_then_probes():
+    clock = ManualClock()
+    statuses: list[int] = [503, 503, 503, 200, 200]
+    sent: list[httpx.Request] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(request)
+        return httpx.Response(statuses[len(sent) - 1])
+
+    transport = ResilientTransport(httpx.MockTransport(handler), failure_threshold=3, reset_timeout=30, hedge_quantile=0, clock=clock)
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            for _ in range(3):
+                assert (await client.get("https://api.example.com/records")).status_code == 503
+            assert transport.circuit_state("GET api.example.com") == CircuitState.OPEN
+            with pytest.raises(CircuitOpenError):
+                await client.get("https://api.example.com/records")
+            # Other endpoints are not affected
+            assert (await client.patch("https://api.example.com/records/1")).status_code == 200
+            clock.current = 30
+            assert (await client.get("https://api.example.com/records")).status_code == 200
+            assert transport.circuit_state("GET api.example.com") == CircuitState.CLOSED
+
+    asyncio.run(run())
+    assert len(sent) == 5
+
+def test_slow_get_is_hedged():
+    calls: list[float] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(time.perf_counter())
+        # The 21st request stalls, its hedge does not
+        await asyncio.sleep(5 if len(calls) == 21 else 0.001)
+        return httpx.Response(200, text=str(len(calls)))
+
+    transport = ResilientTransport(httpx.MockTransport(handler), hedge_quantile=0.95)
+    hedged: float = HEDGED_REQUESTS.value("GET ip.example.com", "hedge")
+
+    async def run() -> tuple[str, float]:
+        async with httpx.AsyncClient(transport=transport) as client:
+            for _ in range(20):
+                await client.get("https://ip.example.com")
+            started: float = time.perf_counter()
+            response: httpx.Response = await client.get("https://ip.example.com")
+            return response.text, time.perf_counter() - started
+
+    text, duration = asyncio.run(run())
+    assert text == "22" and duration < 1
+    assert HEDGED_REQUESTS.value("GET ip.example.com", "hedge") == hedged + 1
+
+def test_requests_opting_out_are_not_hedged():
+    calls: list[float] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(time.perf_counter())
+        await asyncio.sleep(0.3 if len(calls) == 21 else 0.001)
+        return httpx.Response(200)
+
+    transport = ResilientTransport(httpx.MockTransport(handler), hedge_quantile=0.95)
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            for _ in range(21):
+                await client.get("https://api.example.com/records", extensions={NO_HEDGE: True})
+
+    asyncio.run(run())
+    # The slow request was waited for, rather than sent twice
+    assert len(calls) == 21
+
+def test_calls_share_the_deadline_of_the_tick():
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.2)
+        return httpx.Response(200)
+
+    transport = ResilientTransport(httpx.MockTransport(handler), failure_threshold=1, hedge_quantile=0)
+
+    async def run() -> list[str]:
+        outcomes: list[str] = []
+        async with httpx.AsyncClient(transport=transport) as client:
+            with deadline(0.3):
+                for _ in range(3):
+                    try:
+                        await client.get("https://api.example.com/records")
+                        outcomes.append("ok")
+                    except DeadlineExceeded:
+                        outcomes.append("deadline")
+        return outcomes
+
+    started: float = time.perf_counter()
+    assert asyncio.run(run()) == ["ok", "deadline", "deadline"]
+    assert time.perf_counter() - started < 0.5
+    # Running out of time says nothing about the endpoint
+    assert transport.circuit_state("GET api.example.com") == CircuitState.CLOSED
@@ -0,0 +1,54 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from src.domain.value_objects import AnyIPAddress, RecordType
+
+StoredRecordKey = tuple[str, str, RecordType]
+"""(zone, normalized name, type)"""
+
+class StoredRecord:
+    """What a nameserver was known to hold for a record, as of `fetched_at`."""
+    __slots__ = ("zone", "name", "type", "record_id", "content", "fetched_at")
+
+    def __init__(self, zone: str, name: str, type: RecordType, record_id: str, content: AnyIPAddress, fetched_at: float):
+        self.zone = zone
+        self.name = name
+        self.type = type
+        self.record_id = record_id
+        self.content = content
+        self.fetched_at = fetched_at
+
+    @property
+    def key(self) -> StoredRecordKey:
+        return (self.zone, self.name, self.type)
+
+class StateStore(ABC):
+    """
+    Durable copy of what the process knows about the outside world, so a restart resumes warm
+    instead of looking every record up again.
+    """
+    @abstractmethod
+    def load_records(self) -> list[StoredRecord]:
+        pass
+
+    @abstractmethod
+    def apply(self, upserts: list[StoredRecord], deletes: list[StoredRecordKey]):
+        """Writes and deletes records in a single atomic step: after a crash, either all or none of it is visible."""
+        pass
+
+    @abstractmethod
+    def last_external_ip(self, record_type: RecordType = RecordType.A) -> Optional[tuple[AnyIPAddress, float]]:
+        """
+        The last external IP observed of the family of record_type (A for IPv4, AAAA for IPv6), and since
+        when it has been observed. None if none was ever saved.
+        """
+        pass
+
+    @abstractmethod
+    def save_external_ip(self, ip: AnyIPAddress, observed_at: float):
+        """Saves ip as the external IP of its family. observed_at is only kept when ip differs from the saved one."""
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
@@ -0,0 +1,78 @@
+import sqlite3
+from ipaddress import ip_address
+from typing import Optional
+
+from src.domain.value_objects import AnyIPAddress, RecordType
+from src.infra.state.interface import StateStore, StoredRecord, StoredRecordKey
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS records (
+    zone TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    record_id TEXT NOT NULL,
+    content TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (zone, name, type)
+);
+CREATE TABLE IF NOT EXISTS external_ips (
+    type TEXT PRIMARY KEY,
+    ip TEXT NOT NULL,
+    observed_at REAL NOT NULL
+);
+"""
+
+class SqliteStateStore(StateStore):
+    """
+    State store kept in a single SQLite file.
+
+    Every `apply` is one transaction, so a crash in the middle of a write leaves the previous state
+    intact. The database runs in WAL mode with `synchronous=NORMAL`: a commit costs an append to the
+    log rather than a full fsync, which keeps writes cheap enough to run from the event loop.
+
+    Arguments:
+        path (str): Path of the database file, created if missing. `:memory:` keeps the state in memory only.
+    """
+    _connection: sqlite3.Connection
+
+    def __init__(self, path: str):
+        # Autocommit mode: transactions are opened explicitly by `with self._connection`
+        self._connection = sqlite3.connect(path, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+
+    def load_records(self) -> list[StoredRecord]:
+        rows: list[tuple[str, str, str, str, str, float]] = self._connection.execute(
+            "SELECT zone, name, type, record_id, content, fetched_at FROM records").fetchall()
+        return [StoredRecord(zone=zone, name=name, type=RecordType(record_type), record_id=record_id, content=ip_address(content), fetched_at=fetched_at)
+                for zone, name, record_type, record_id, content, fetched_at in rows]
+
+    def apply(self, upserts: list[StoredRecord], deletes: list[StoredRecordKey]):
+        if not upserts and not deletes:
+            return
+        self._connection.execute("BEGIN")
+        try:
+            self._connection.executemany("DELETE FROM records WHERE zone = ? AND name = ? AND type = ?",
+                                         [(zone, name, record_type.value) for zone, name, record_type in deletes])
+            self._connection.executemany("INSERT OR REPLACE INTO records (zone, name, type, record_id, content, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+                                         [(record.zone, record.name, record.type.value, record.record_id, str(record.content), record.fetched_at) for record in upserts])
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+    def last_external_ip(self, record_type: RecordType = RecordType.A) -> Optional[tuple[AnyIPAddress, float]]:
+        row: Optional[tuple[str, float]] = self._connection.execute("SELECT ip, observed_at FROM external_ips WHERE type = ?", (record_type.value,)).fetchone()
+        if row is None:
+            return None
+        return ip_address(row[0]), row[1]
+
+    def save_external_ip(self, ip: AnyIPAddress, observed_at: float):
+        # Observed on every tick: the row is only rewritten when the IP changed, which also keeps when it was first observed
+        self._connection.execute("INSERT INTO external_ips (type, ip, observed_at) VALUES (?, ?, ?) "
+                                 "ON CONFLICT (type) DO UPDATE SET ip = excluded.ip, observed_at = excluded.observed_at WHERE ip != excluded.ip",
+                                 (RecordType.of(ip).value, str(ip), observed_at))
+
+    def close(self):
+        self._connection.close()
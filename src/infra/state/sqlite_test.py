@@ -0,0 +1,68 @@
+import asyncio
+from ipaddress import IPv4Address, IPv6Address
+import httpx
+
+from src.domain.value_objects import DNSRecord, RecordType
+from src.infra.clock import ManualClock
+from src.infra.http import create_async_client
+from src.infra.nameserver.cache import RecordCache
+from src.infra.nameserver.cloudflare.cloudflare_async import AsyncCloudflareNameserver
+from src.infra.loggers.standard import Logger, StandardLogger, LogLevel
+from src.infra.state.interface import StoredRecord
+from src.infra.state.sqlite import SqliteStateStore
+
+def test_store_round_trip(tmp_path):
+    path: str = str(tmp_path / "state.db")
+    store = SqliteStateStore(path)
+    store.apply(upserts=[StoredRecord("zone", "a.example.com", RecordType.A, "id-a", IPv4Address("203.0.113.1"), 10),
+                         StoredRecord("zone", "b.example.com", RecordType.A, "id-b", IPv4Address("203.0.113.1"), 10)],
+                deletes=[])
+    store.apply(upserts=[StoredRecord("zone", "a.example.com", RecordType.A, "id-a", IPv4Address("203.0.113.2"), 20)],
+                deletes=[("zone", "b.example.com", RecordType.A)])
+    store.save_external_ip(IPv4Address("203.0.113.2"), observed_at=20)
+    store.save_external_ip(IPv6Address("2001:db8::2"), observed_at=25)
+    # Still the same IP: it keeps being observed since 20
+    store.save_external_ip(IPv4Address("203.0.113.2"), observed_at=30)
+    store.close()
+
+    reopened = SqliteStateStore(path)
+    records: list[StoredRecord] = reopened.load_records()
+    assert [(record.name, record.record_id, record.content, record.fetched_at) for record in records] == [("a.example.com", "id-a", IPv4Address("203.0.113.2"), 20)]
+    assert reopened.last_external_ip() == (IPv4Address("203.0.113.2"), 20)
+    assert reopened.last_external_ip(RecordType.AAAA) == (IPv6Address("2001:db8::2"), 25)
+    reopened.close()
+
+def test_restart_resumes_without_api_calls(tmp_path):
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    path: str = str(tmp_path / "state.db")
+    clock = ManualClock()
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"success": True, "result": [{"id": "abc", "name": "home.example.com", "content": "203.0.113.1"}],
+                                         "result_info": {"count": 1, "page": 1, "per_page": 100, "total_count": 1}})
+
+    async def lookup() -> DNSRecord | None:
+        store = SqliteStateStore(path)
+        try:
+            async with create_async_client(transport=httpx.MockTransport(handler)) as client:
+                nameserver = AsyncCloudflareNameserver(cloudflare_api_key="key", cloudflare_zone_id="zone", client=client,
+                                                       cache=RecordCache(ttl=300, clock=clock, store=store))
+                return await nameserver.get_record_by_name("home.example.com", logger)
+        finally:
+            store.close()
+
+    expected = DNSRecord(ip=IPv4Address("203.0.113.1"), name="home.example.com")
+    assert asyncio.run(lookup()) == expected
+    assert len(requests) == 1
+
+    # Restarted while the entry is fresh: no call at all
+    clock.current = 299
+    assert asyncio.run(lookup()) == expected
+    assert len(requests) == 1
+
+    # A restart never extends the life of an entry
+    clock.current = 300
+    assert asyncio.run(lookup()) == expected
+    assert len(requests) == 2
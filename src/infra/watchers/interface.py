@@ -0,0 +1,28 @@
+from abc import ABC, abstractmethod
+
+from src.infra.loggers.interface import Logger
+
+class ChangeWatcher(ABC):
+    """
+    Source of events signalling that the external IP may have changed, so a refresh can run right away
+    instead of waiting for the next poll.
+    """
+    @abstractmethod
+    def start(self, logger: Logger) -> bool:
+        """Starts listening for events. Returns False if the watcher is not supported on this host."""
+        pass
+
+    @abstractmethod
+    async def wait_for_change(self, timeout: float) -> bool:
+        """
+        Waits until an event arrives or `timeout` seconds pass. Events received while no one was
+        waiting are not lost, and a burst of events results in a single wake-up.
+
+        Returns:
+            bool: True if woken up by an event, False on timeout.
+        """
+        pass
+
+    @abstractmethod
+    def stop(self):
+        pass
@@ -0,0 +1,171 @@
+import asyncio
+import socket
+import struct
+from enum import Enum
+from ipaddress import ip_address, IPv4Address, IPv6Address
+from typing import Optional
+
+from src.infra.loggers.interface import Logger
+from src.infra.watchers.interface import ChangeWatcher
+
+# linux/rtnetlink.h
+RTMGRP_IPV4_IFADDR: int = 0x10
+RTMGRP_IPV6_IFADDR: int = 0x100
+RTM_NEWADDR: int = 20
+RTM_DELADDR: int = 21
+RT_SCOPE_UNIVERSE: int = 0
+# linux/if_addr.h
+IFA_ADDRESS: int = 1
+IFA_LOCAL: int = 2
+
+NLMSGHDR = struct.Struct("=LHHLL")
+"""length, type, flags, sequence, port id"""
+IFADDRMSG = struct.Struct("=BBBBI")
+"""family, prefix length, flags, scope, interface index"""
+RTATTR = struct.Struct("=HH")
+"""length, type"""
+
+class AddressEventKind(Enum):
+    ADDED = RTM_NEWADDR
+    REMOVED = RTM_DELADDR
+
+class AddressEvent:
+    __slots__ = ("kind", "interface_index", "scope", "address")
+
+    def __init__(self, kind: AddressEventKind, interface_index: int, scope: int, address: Optional[IPv4Address | IPv6Address]):
+        self.kind = kind
+        self.interface_index = interface_index
+        self.scope = scope
+        self.address = address
+
+    def __repr__(self) -> str:
+        return f"AddressEvent({self.kind.name}, interface={self.interface_index}, scope={self.scope}, address={self.address})"
+
+def _align(length: int) -> int:
+    return (length + 3) & ~3
+
+def parse_address_events(data: bytes) -> list[AddressEvent]:
+    """Decodes the RTM_NEWADDR / RTM_DELADDR messages of a netlink datagram, skipping any other message."""
+    events: list[AddressEvent] = []
+    offset: int = 0
+    while offset + NLMSGHDR.size <= len(data):
+        message_length, message_type, _, _, _ = NLMSGHDR.unpack_from(data, offset)
+        if message_length < NLMSGHDR.size:
+            break
+        end: int = min(offset + message_length, len(data))
+
+        if message_type in (RTM_NEWADDR, RTM_DELADDR) and offset + NLMSGHDR.size + IFADDRMSG.size <= end:
+            family, _, _, scope, interface_index = IFADDRMSG.unpack_from(data, offset + NLMSGHDR.size)
+            address: Optional[IPv4Address | IPv6Address] = None
+            attribute_offset: int = offset + NLMSGHDR.size + IFADDRMSG.size
+            while attribute_offset + RTATTR.size <= end:
+                attribute_length, attribute_type = RTATTR.unpack_from(data, attribute_offset)
+                if attribute_length < RTATTR.size:
+                    break
+                value: bytes = data[attribute_offset + RTATTR.size:attribute_offset + attribute_length]
+                # IFA_LOCAL is the address of the interface, IFA_ADDRESS the peer on point-to-point links (PPPoE)
+                if (attribute_type == IFA_LOCAL or (attribute_type == IFA_ADDRESS and address is None)) and \
+                   ((family == socket.AF_INET and len(value) == 4) or (family == socket.AF_INET6 and len(value) == 16)):
+                    address = ip_address(value)
+                attribute_offset += _align(attribute_length)
+            events.append(AddressEvent(AddressEventKind(message_type), interface_index, scope, address))
+
+        offset += _align(message_length)
+    return events
+
+class NetlinkAddressWatcher(ChangeWatcher):
+    """
+    Wakes the refresh loop up as soon as the kernel reports an address being added to or removed from
+    an interface (Linux rtnetlink). Useful on hosts holding the public address directly, such as PPPoE
+    links or cloud VMs with public NICs, where it reduces the detection latency from the polling
+    interval to well under a second.
+
+    Arguments:
+        interface (Optional[str]): Only react to this interface. Every interface by default.
+        global_only (bool): Ignore link-local, private and other non-global addresses.
+        settle (float): Seconds to wait after an event so a burst of changes (e.g. remove + add) wakes the loop once.
+    """
+    _interface: Optional[str]
+    _interface_index: Optional[int]
+    _global_only: bool
+    _settle: float
+    _socket: Optional[socket.socket]
+    _event: asyncio.Event
+    _logger: Optional[Logger]
+
+    def __init__(self, interface: Optional[str] = None, global_only: bool = True, settle: float = 0.5):
+        self._interface = interface
+        self._interface_index = None
+        self._global_only = global_only
+        self._settle = settle
+        self._socket = None
+        self._event = asyncio.Event()
+        self._logger = None
+
+    def start(self, logger: Logger) -> bool:
+        self._logger = logger
+        if not hasattr(socket, "AF_NETLINK"):
+            logger.warning("Netlink is not available on this platform. Falling back to polling")
+            return False
+        try:
+            if self._interface is not None:
+                self._interface_index = socket.if_nametoindex(self._interface)
+            netlink_socket = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW | socket.SOCK_NONBLOCK, socket.NETLINK_ROUTE) # type: ignore
+            netlink_socket.bind((0, RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR))
+        except OSError as e:
+            logger.warning("Could not subscribe to netlink address events: %s. Falling back to polling", e)
+            return False
+
+        self._socket = netlink_socket
+        asyncio.get_running_loop().add_reader(netlink_socket.fileno(), self._on_readable)
+        logger.info("Listening for netlink address events on %s", self._interface or 'every interface')
+        return True
+
+    async def wait_for_change(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        await asyncio.sleep(self._settle)
+        self._event.clear()
+        return True
+
+    def stop(self):
+        if self._socket is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self._socket.fileno())
+        except RuntimeError:
+            pass
+        self._socket.close()
+        self._socket = None
+
+    def _on_readable(self):
+        if self._socket is None:
+            return
+        while True:
+            try:
+                data: bytes = self._socket.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                # ENOBUFS: the kernel dropped events, so something may have changed
+                if self._logger:
+                    self._logger.warning("Netlink socket error: %s", e)
+                self._event.set()
+                return
+            for address_event in parse_address_events(data):
+                if self._is_relevant(address_event):
+                    if self._logger:
+                        self._logger.info("Address change detected: %s", address_event)
+                    self._event.set()
+
+    def _is_relevant(self, address_event: AddressEvent) -> bool:
+        if self._interface_index is not None and address_event.interface_index != self._interface_index:
+            return False
+        if self._global_only:
+            if address_event.scope != RT_SCOPE_UNIVERSE:
+                return False
+            if address_event.address is not None and not address_event.address.is_global:
+                return False
+        return True
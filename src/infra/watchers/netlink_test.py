@@ -0,0 +1,55 @@
+import asyncio
+import socket
+import struct
+from ipaddress import IPv4Address
+
+from src.infra.watchers.netlink import (NetlinkAddressWatcher, AddressEventKind, parse_address_events,
+                                        NLMSGHDR, IFADDRMSG, RTATTR, RTM_NEWADDR, RTM_DELADDR, IFA_LOCAL, RT_SCOPE_UNIVERSE)
+
+def _address_message(message_type: int, address: str, interface_index: int = 2, scope: int = RT_SCOPE_UNIVERSE) -> bytes:
+    attribute: bytes = RTATTR.pack(RTATTR.size + 4, IFA_LOCAL) + socket.inet_aton(address)
+    body: bytes = IFADDRMSG.pack(socket.AF_INET, 24, 0, scope, interface_index) + attribute
+    return NLMSGHDR.pack(NLMSGHDR.size + len(body), message_type, 0, 0, 0) + body
+
+def test_parse_address_events():
+    other_message: bytes = NLMSGHDR.pack(NLMSGHDR.size + 4, 16, 0, 0, 0) + struct.pack("=I", 0)
+    data: bytes = _address_message(RTM_DELADDR, "203.0.113.1") + other_message + _address_message(RTM_NEWADDR, "203.0.113.2", interface_index=3)
+
+    events = parse_address_events(data)
+
+    assert [(e.kind, e.interface_index, e.address) for e in events] == [
+        (AddressEventKind.REMOVED, 2, IPv4Address("203.0.113.1")),
+        (AddressEventKind.ADDED, 3, IPv4Address("203.0.113.2")),
+    ]
+
+def test_burst_of_events_wakes_up_once():
+    async def run() -> list[bool]:
+        watcher = NetlinkAddressWatcher(settle=0.01)
+        read_end, write_end = socket.socketpair()
+        read_end.setblocking(False)
+        watcher._socket = read_end
+        write_end.send(_address_message(RTM_DELADDR, "93.184.216.34") + _address_message(RTM_NEWADDR, "93.184.216.35"))
+        write_end.send(_address_message(RTM_NEWADDR, "10.0.0.2"))
+        watcher._on_readable()
+
+        outcomes: list[bool] = [await watcher.wait_for_change(timeout=1), await watcher.wait_for_change(timeout=0.05)]
+        read_end.close()
+        write_end.close()
+        return outcomes
+
+    assert asyncio.run(run()) == [True, False]
+
+def test_private_addresses_are_ignored():
+    async def run() -> bool:
+        watcher = NetlinkAddressWatcher(settle=0)
+        read_end, write_end = socket.socketpair()
+        read_end.setblocking(False)
+        watcher._socket = read_end
+        write_end.send(_address_message(RTM_NEWADDR, "192.168.1.20"))
+        watcher._on_readable()
+        woken: bool = await watcher.wait_for_change(timeout=0.05)
+        read_end.close()
+        write_end.close()
+        return woken
+
+    assert asyncio.run(run()) is False
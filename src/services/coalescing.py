@@ -0,0 +1,201 @@
+import asyncio
+import time
+from typing import Optional
+from pydantic import BaseModel, Field, ConfigDict
+
+from src.domain.reconciliation import record_key
+from src.domain.value_objects import AnyIPAddress, RecordType, ReconciliationResult, RefreshOutcome, RefreshStatus
+from src.infra.ip.interface import AsyncExternalIpInterface
+from src.infra.loggers.interface import Logger
+from src.infra.nameserver.interface import AsyncNameserverInterface
+from src.infra.state.interface import StateStore
+from src.services.dampening import WriteDampener
+from src.services.services import async_reconcile_records, merge_outcomes, reconciliation_outcome, save_external_ip
+
+class RecordRefreshStatus(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    name: str
+    type: RecordType
+    in_flight: bool = Field(..., description="Whether a refresh of the record is running")
+    pending: bool = Field(..., description="Whether another refresh will run once the current one completes")
+    last_status: Optional[RefreshStatus] = Field(default=None, description="Outcome of the last completed refresh")
+    last_run_at: Optional[float] = Field(default=None, description="Completion of the last refresh, in seconds since the epoch")
+
+class _RecordState:
+    __slots__ = ("running", "running_ip", "follow_up", "follow_up_ip", "last_status", "last_run_at")
+
+    def __init__(self):
+        self.running: Optional[asyncio.Task[RefreshOutcome]] = None
+        self.running_ip: Optional[AnyIPAddress] = None
+        self.follow_up: Optional[asyncio.Future[RefreshOutcome]] = None
+        self.follow_up_ip: Optional[AnyIPAddress] = None
+        self.last_status: Optional[RefreshStatus] = None
+        self.last_run_at: Optional[float] = None
+
+class RefreshCoordinator:
+    """
+    Refreshes records on demand, coalescing bursts of requests into at most one in-flight refresh per
+    record. A refresh reconciles the record like a scheduled tick does (see `async_reconcile_records`), so it
+    creates the record if missing and repairs it where providers disagree. Dual-stack, the A and AAAA records of a domain are refreshed concurrently, each
+    coalesced on its own.
+
+    A request for a record already being refreshed to the same IP simply waits for that refresh. Any
+    other request is folded into a single follow-up refresh, started once the current one completes
+    with the latest IP requested. However many requests arrive meanwhile, a record gets at most one
+    refresh running and one waiting. Concurrent requests without a known IP also share
+    a single external IP lookup per address family.
+
+    Arguments:
+        external_ip_service (AsyncExternalIpInterface): Used when a request does not carry the IP.
+        ipv6_service (Optional[AsyncExternalIpInterface]): Same, for the AAAA records. Only the A records are
+            refreshed by the requests without an IP when None.
+        nameserver (AsyncNameserverInterface): Holds the records.
+        domain_names (list[str]): The records that can be refreshed.
+        state (Optional[StateStore]): Where the observed external IP is saved, if anywhere.
+        dampener (Optional[WriteDampener]): Holds back the writes of an unstable external IP, if set. Share
+            it with the refresh loop, so pushed IPs and polled ones are dampened together.
+    """
+    _ip_services: dict[RecordType, AsyncExternalIpInterface]
+    _nameserver: AsyncNameserverInterface
+    _domain_names: dict[str, str]
+    _state: Optional[StateStore]
+    _dampener: Optional[WriteDampener]
+    _records: dict[tuple[str, RecordType], _RecordState]
+    _ip_lookups: dict[RecordType, asyncio.Task[Optional[AnyIPAddress]]]
+    requests: int
+    refreshes: int
+
+    def __init__(self, external_ip_service: AsyncExternalIpInterface, nameserver: AsyncNameserverInterface, domain_names: list[str], state: Optional[StateStore] = None,
+                 dampener: Optional[WriteDampener] = None, ipv6_service: Optional[AsyncExternalIpInterface] = None):
+        self._ip_services = {RecordType.A: external_ip_service}
+        if ipv6_service is not None:
+            self._ip_services[RecordType.AAAA] = ipv6_service
+        self._nameserver = nameserver
+        self._domain_names = {record_key(domain_name, RecordType.A)[0]: domain_name for domain_name in domain_names}
+        self._state = state
+        self._dampener = dampener
+        self._records = {(domain_name, record_type): _RecordState() for domain_name in self._domain_names.values() for record_type in self._ip_services}
+        self._ip_lookups = {}
+        self.requests = 0
+        self.refreshes = 0
+
+    @property
+    def domain_names(self) -> list[str]:
+        return list(self._domain_names.values())
+
+    def resolve(self, name: str) -> Optional[str]:
+        """The managed domain name matching name (case-insensitively), or None if it is not managed."""
+        return self._domain_names.get(record_key(name, RecordType.A)[0])
+
+    async def refresh(self, domain_names: list[str], logger: Logger, ip: Optional[AnyIPAddress] = None) -> dict[str, RefreshOutcome]:
+        """
+        Refreshes the records of domain_names, which must be managed ones, and waits for their outcome.
+
+        Arguments:
+            domain_names (list[str]): Records to refresh, as returned by `resolve`.
+            logger (Logger): Logger instance for recording operations and errors.
+            ip (Optional[AnyIPAddress]): The external IP, when the caller knows it. Only the records of its family
+                (A for IPv4, AAAA for IPv6) are refreshed then. Otherwise, the IP of every family is looked up.
+
+        Returns:
+            dict[str, RefreshOutcome]: The outcome of the refresh covering this request, per domain name. Dual-stack,
+            the outcomes of its A and AAAA records are merged, see `merge_outcomes`.
+        """
+        self.requests += 1
+        ips: dict[RecordType, Optional[AnyIPAddress]]
+        if ip is None:
+            record_types: list[RecordType] = list(self._ip_services)
+            ips = dict(zip(record_types, await asyncio.gather(*(self._lookup_ip(record_type, logger) for record_type in record_types))))
+        else:
+            ips = {RecordType.of(ip): ip}
+            save_external_ip(self._state, ip)
+
+        futures: dict[str, list[asyncio.Future[RefreshOutcome]]] = {domain_name: [] for domain_name in domain_names}
+        for record_type, family_ip in ips.items():
+            if family_ip is None:
+                logger.critical("Could not obtain a valid %s address from the External IP Service", record_type.value)
+                continue
+            if record_type not in self._ip_services:
+                logger.warning("IPv6 records are not managed: %s ignored", family_ip)
+                continue
+            for domain_name in domain_names:
+                futures[domain_name].append(self._schedule(domain_name, record_type, family_ip, logger))
+
+        # Shielded: a client disconnecting must not cancel a refresh other requests are waiting for
+        outcomes: list[list[RefreshOutcome]] = await asyncio.gather(
+            *(asyncio.gather(*(asyncio.shield(future) for future in domain_futures)) for domain_futures in futures.values()))
+        return {domain_name: merge_outcomes(domain_outcomes) if domain_outcomes else RefreshOutcome(status=RefreshStatus.FAILED)
+                for domain_name, domain_outcomes in zip(futures, outcomes)}
+
+    def status(self) -> list[RecordRefreshStatus]:
+        return [RecordRefreshStatus(name=domain_name,
+                                    type=record_type,
+                                    in_flight=record.running is not None,
+                                    pending=record.follow_up is not None,
+                                    last_status=record.last_status,
+                                    last_run_at=record.last_run_at)
+                for (domain_name, record_type), record in self._records.items()]
+
+    def _schedule(self, domain_name: str, record_type: RecordType, ip: AnyIPAddress, logger: Logger) -> asyncio.Future[RefreshOutcome]:
+        record: _RecordState = self._records[(domain_name, record_type)]
+        if record.running is None:
+            return self._start(domain_name, record_type, ip, logger)
+        if record.follow_up is None and ip == record.running_ip:
+            # The refresh in flight already points the record to this IP
+            return record.running
+        # Folded into the follow-up refresh, which uses the latest IP requested
+        record.follow_up_ip = ip
+        if record.follow_up is None:
+            record.follow_up = asyncio.get_running_loop().create_future()
+        logger.debug("Refresh of the %s record of %s already in flight. Coalesced into the next one", record_type.value, domain_name)
+        return record.follow_up
+
+    def _start(self, domain_name: str, record_type: RecordType, ip: AnyIPAddress, logger: Logger) -> asyncio.Task[RefreshOutcome]:
+        record: _RecordState = self._records[(domain_name, record_type)]
+        self.refreshes += 1
+        record.running = asyncio.create_task(self._run(domain_name, record_type, ip, logger))
+        record.running_ip = ip
+        record.running.add_done_callback(lambda task: self._on_done(domain_name, record_type, task, logger))
+        return record.running
+
+    async def _run(self, domain_name: str, record_type: RecordType, ip: AnyIPAddress, logger: Logger) -> RefreshOutcome:
+        try:
+            result: Optional[ReconciliationResult] = await async_reconcile_records([ip], self._nameserver, [domain_name], logger, dampener=self._dampener)
+            return reconciliation_outcome(result, self._nameserver, self._dampener)
+        except Exception as e:
+            logger.error("Unexpected error during the refresh of the %s record of %s: %r", record_type.value, domain_name, e)
+            return RefreshOutcome(status=RefreshStatus.FAILED)
+
+    def _on_done(self, domain_name: str, record_type: RecordType, task: asyncio.Task[RefreshOutcome], logger: Logger):
+        record: _RecordState = self._records[(domain_name, record_type)]
+        record.running = None
+        record.running_ip = None
+        record.last_run_at = time.time()
+        record.last_status = RefreshStatus.FAILED if task.cancelled() else task.result().status
+
+        if record.follow_up is None or record.follow_up_ip is None:
+            return
+        follow_up: asyncio.Future[RefreshOutcome] = record.follow_up
+        next_run: asyncio.Task[RefreshOutcome] = self._start(domain_name, record_type, record.follow_up_ip, logger)
+        record.follow_up = None
+        record.follow_up_ip = None
+        next_run.add_done_callback(lambda task: _propagate(task, follow_up))
+
+    async def _lookup_ip(self, record_type: RecordType, logger: Logger) -> Optional[AnyIPAddress]:
+        lookup: Optional[asyncio.Task[Optional[AnyIPAddress]]] = self._ip_lookups.get(record_type)
+        if lookup is None or lookup.done():
+            lookup = self._ip_lookups[record_type] = asyncio.create_task(self._ip_services[record_type].get_ip(logger))
+        ip: Optional[AnyIPAddress] = await asyncio.shield(lookup)
+        if ip is None or RecordType.of(ip) != record_type:
+            return None
+        save_external_ip(self._state, ip)
+        return ip
+
+def _propagate(task: asyncio.Task[RefreshOutcome], future: asyncio.Future[RefreshOutcome]):
+    if future.done():
+        return
+    if task.cancelled():
+        future.cancel()
+    else:
+        future.set_result(task.result())
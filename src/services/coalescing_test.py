@@ -0,0 +1,64 @@
+import asyncio
+from ipaddress import IPv4Address
+
+from src.domain.value_objects import RefreshOutcome, RefreshStatus
+from src.infra.http import create_async_client
+from src.infra.nameserver.cloudflare.cloudflare_async import AsyncCloudflareNameserver
+from src.infra.nameserver.fanout import FanOutNameserver
+from src.infra.nameserver.rfc2136.rfc2136 import Rfc2136Nameserver
+from src.infra.loggers.standard import Logger, StandardLogger, LogLevel
+from src.infra.ip.ipify import AsyncIpify
+from src.services.coalescing import RefreshCoordinator
+from src.benchmarks.fakes import FakeCloudflareApi, FakeDnsServer, FakeIpify, fake_transport
+
+def test_bursts_are_coalesced_per_record():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    cloudflare = FakeCloudflareApi(latency=0.05)
+    cloudflare.add_record("home.example.com", "198.51.100.1")
+    ipify = FakeIpify(ip=IPv4Address("198.51.100.7"), latency=0.05)
+
+    async def run() -> tuple[list[dict[str, RefreshOutcome]], int]:
+        async with create_async_client(transport=fake_transport(cloudflare, ipify)) as client:
+            nameserver = AsyncCloudflareNameserver(cloudflare_api_key="key", cloudflare_zone_id=cloudflare.zone_id, client=client)
+            coordinator = RefreshCoordinator(AsyncIpify(client=client), nameserver, ["home.example.com"])
+            # A noisy router: many lookups triggered at once, then two pushes while they are in flight
+            burst = [asyncio.create_task(coordinator.refresh(["home.example.com"], logger)) for _ in range(10)]
+            await asyncio.sleep(0.07)
+            pushes = [asyncio.create_task(coordinator.refresh(["home.example.com"], logger, ip=IPv4Address(ip))) for ip in ("203.0.113.1", "203.0.113.2")]
+            outcomes: list[dict[str, RefreshOutcome]] = await asyncio.gather(*burst, *pushes)
+            return outcomes, coordinator.refreshes
+
+    outcomes, refreshes = asyncio.run(run())
+
+    # One shared lookup of the IP, one refresh for the burst, one follow-up for both pushes
+    assert ipify.calls == 1
+    assert refreshes == 2
+    assert all(outcome["home.example.com"].status == RefreshStatus.CHANGED for outcome in outcomes)
+    assert cloudflare.content_of("home.example.com") == "203.0.113.2"
+
+def test_a_pushed_ip_creates_and_repairs_records_across_providers():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    cloudflare = FakeCloudflareApi()
+    cloudflare.add_record("home.example.com", "198.51.100.1")
+    dns_server = FakeDnsServer("example.com")
+    # The providers disagree on home, and neither holds vpn yet
+    dns_server.add_record("home.example.com", "198.51.100.2")
+
+    async def run() -> dict[str, RefreshOutcome]:
+        await dns_server.start()
+        try:
+            async with create_async_client(transport=fake_transport(cloudflare)) as client:
+                nameserver = FanOutNameserver({
+                    "cloudflare": AsyncCloudflareNameserver(cloudflare_api_key="key", cloudflare_zone_id=cloudflare.zone_id, client=client),
+                    "rfc2136": Rfc2136Nameserver("example.com", "127.0.0.1", port=dns_server.port, timeout=1)
+                }, timeout=5)
+                coordinator = RefreshCoordinator(AsyncIpify(client=client), nameserver, ["home.example.com", "vpn.example.com"])
+                return await coordinator.refresh(["home.example.com", "vpn.example.com"], logger, ip=IPv4Address("203.0.113.1"))
+        finally:
+            await dns_server.close()
+
+    outcomes: dict[str, RefreshOutcome] = asyncio.run(run())
+
+    assert all(outcome.status == RefreshStatus.CHANGED for outcome in outcomes.values())
+    for name in ("home.example.com", "vpn.example.com"):
+        assert cloudflare.content_of(name) == dns_server.content_of(name) == "203.0.113.1"
@@ -0,0 +1,136 @@
+from collections import deque
+from typing import Optional
+
+from src.domain.reconciliation import RecordKey, record_key
+from src.domain.value_objects import AnyIPAddress, DNSRecord, RecordType
+from src.infra.clock import Clock, SystemClock
+from src.infra.loggers.interface import Logger
+from src.infra.metrics.instruments import WRITES_DEFERRED, WRITES_SUPPRESSED
+
+RATE_PERIOD: float = 3600
+"""Seconds `max_writes_per_hour` applies to."""
+
+class _RecordWrites:
+    __slots__ = ("known_ip", "held_ip", "held_since", "writes")
+
+    def __init__(self):
+        self.known_ip: Optional[AnyIPAddress] = None
+        self.held_ip: Optional[AnyIPAddress] = None
+        self.held_since: float = 0
+        self.writes: deque[float] = deque()
+
+class WriteDampener:
+    """
+    Decides, on every observation of a record, whether the write it needs may go now, so that an
+    external IP bouncing between two addresses turns into at most one write per window.
+
+    A write is held back while any of these applies, and the latest IP observed wins when it is let through:
+    - The IP has been observed for less than `min_stable` seconds.
+    - The record was written less than `window` seconds ago.
+    - The record was already written `max_writes_per_hour` times in the last hour.
+
+    A held write that is no longer needed (the IP went back to the one the record holds) or that
+    is superseded by another IP is counted as suppressed.
+
+    Arguments:
+        min_stable (float): Seconds a new IP must be observed before being written.
+        window (float): Seconds after a write during which the record is not written again.
+        max_writes_per_hour (int): Most writes of a record per hour. Unlimited when 0.
+    """
+    _min_stable: float
+    _window: float
+    _max_writes_per_hour: int
+    _clock: Clock
+    _records: dict[RecordKey, _RecordWrites]
+    _observed_since: dict[RecordType, tuple[AnyIPAddress, float]]
+
+    def __init__(self, min_stable: float = 0, window: float = 0, max_writes_per_hour: int = 0, clock: Optional[Clock] = None):
+        self._min_stable = min_stable
+        self._window = window
+        self._max_writes_per_hour = max_writes_per_hour
+        self._clock = clock if clock is not None else SystemClock()
+        self._records = {}
+        self._observed_since = {}
+
+    def resume(self, ip: AnyIPAddress, observed_for: float):
+        """
+        ip has already been the external IP of its family for `observed_for` seconds, e.g. before a restart:
+        it counts towards `min_stable`, instead of the observations starting over.
+        """
+        self._observed_since[RecordType.of(ip)] = (ip, self._clock.now() - max(0.0, observed_for))
+
+    def hold(self, dns_record: DNSRecord, current_ip: Optional[AnyIPAddress], logger: Logger) -> Optional[float]:
+        """
+        Observation of the IP dns_record should point to.
+
+        Arguments:
+            dns_record (DNSRecord): The record as it should be.
+            current_ip (Optional[AnyIPAddress]): The IP the nameserver holds, or None to use the last one known.
+
+        Returns:
+            Optional[float]: None if the record may be written now (or needs no write). Otherwise, the
+            seconds until it may be.
+        """
+        record: _RecordWrites = self._record(dns_record)
+        now: float = self._clock.now()
+        if current_ip is not None:
+            record.known_ip = current_ip
+        if record.known_ip is None or dns_record.ip == record.known_ip:
+            if record.held_ip is not None:
+                WRITES_SUPPRESSED.inc("reverted")
+                logger.info("DNS Record %s points to %s again. Held write to %s dropped", dns_record.name, dns_record.ip, record.held_ip)
+            record.held_ip = None
+            return None
+
+        if record.held_ip != dns_record.ip:
+            if record.held_ip is not None:
+                WRITES_SUPPRESSED.inc("coalesced")
+            record.held_ip = dns_record.ip
+            record.held_since = now
+            resumed: Optional[tuple[AnyIPAddress, float]] = self._observed_since.get(dns_record.type)
+            if resumed is not None and resumed[0] == dns_record.ip:
+                record.held_since = min(now, resumed[1])
+
+        reason, wait = self._wait(record, now)
+        if wait <= 0:
+            return None
+
+        WRITES_DEFERRED.inc(reason)
+        logger.info("Write of the DNS Record %s to %s held back for %.0fs (%s)", dns_record.name, dns_record.ip, wait, reason)
+        return wait
+
+    def next_write(self) -> Optional[float]:
+        """Seconds until the first write held back may go. None if no write is held back."""
+        now: float = self._clock.now()
+        waits: list[float] = [self._wait(record, now)[1] for record in self._records.values() if record.held_ip is not None]
+        return max(0.0, min(waits)) if waits else None
+
+    def written(self, dns_record: DNSRecord):
+        """The nameserver now holds dns_record."""
+        record: _RecordWrites = self._record(dns_record)
+        record.known_ip = dns_record.ip
+        record.held_ip = None
+        record.writes.append(self._clock.now())
+
+    def learn(self, dns_record: DNSRecord):
+        """The nameserver holds dns_record, without it having been written."""
+        record: _RecordWrites = self._record(dns_record)
+        record.known_ip = dns_record.ip
+        record.held_ip = None
+
+    def _record(self, dns_record: DNSRecord) -> _RecordWrites:
+        return self._records.setdefault(record_key(dns_record.name, dns_record.type), _RecordWrites())
+
+    def _wait(self, record: _RecordWrites, now: float) -> tuple[str, float]:
+        """The longest of the waits holding the write of record back, with its reason."""
+        waits: dict[str, float] = {"unstable": record.held_since + self._min_stable - now}
+        self._forget_old_writes(record, now)
+        if record.writes:
+            waits["window"] = record.writes[-1] + self._window - now
+        if self._max_writes_per_hour > 0 and len(record.writes) >= self._max_writes_per_hour:
+            waits["rate"] = record.writes[-self._max_writes_per_hour] + RATE_PERIOD - now
+        return max(waits.items(), key=lambda item: item[1])
+
+    def _forget_old_writes(self, record: _RecordWrites, now: float):
+        while record.writes and record.writes[0] <= now - RATE_PERIOD:
+            record.writes.popleft()
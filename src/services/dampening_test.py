@@ -0,0 +1,71 @@
+import asyncio
+from ipaddress import IPv4Address
+
+from src.domain.value_objects import DNSRecord, RefreshOutcome, RefreshStatus
+from src.infra.clock import ManualClock
+from src.infra.http import create_async_client
+from src.infra.nameserver.cloudflare.cloudflare_async import AsyncCloudflareNameserver
+from src.infra.loggers.standard import Logger, StandardLogger, LogLevel
+from src.infra.ip.ipify import AsyncIpify
+from src.infra.metrics.instruments import WRITES_SUPPRESSED
+from src.services.dampening import WriteDampener
+from src.services.services import async_refresh_service
+from src.benchmarks.fakes import FakeCloudflareApi, FakeIpify, fake_transport
+
+PRIMARY = IPv4Address("198.51.100.1")
+BACKUP = IPv4Address("203.0.113.9")
+
+def test_flapping_uplink_writes_at_most_once_per_window():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    clock = ManualClock()
+    cloudflare = FakeCloudflareApi()
+    cloudflare.add_record("home.example.com", str(PRIMARY))
+    ipify = FakeIpify(ip=PRIMARY)
+    dampener = WriteDampener(min_stable=30, window=600, clock=clock)
+
+    async def run() -> list[RefreshOutcome]:
+        async with create_async_client(transport=fake_transport(cloudflare, ipify)) as client:
+            nameserver = AsyncCloudflareNameserver(cloudflare_api_key="key", cloudflare_zone_id=cloudflare.zone_id, client=client)
+            outcomes: list[RefreshOutcome] = []
+            # An hour of polls every 10 seconds, the uplink failing over every 50 seconds
+            for tick in range(360):
+                clock.current = tick * 10
+                ipify.ip = BACKUP if (tick // 5) % 2 else PRIMARY
+                outcomes.append(await async_refresh_service(AsyncIpify(client=client), nameserver, "home.example.com", logger, dampener=dampener))
+            return outcomes
+
+    outcomes = asyncio.run(run())
+
+    writes: int = sum(1 for outcome in outcomes if outcome.status == RefreshStatus.CHANGED)
+    assert 1 <= writes <= 6
+    assert cloudflare.calls["PATCH record"] == writes
+    assert all(outcome.retry_after is not None for outcome in outcomes if outcome.status == RefreshStatus.DEFERRED)
+
+def test_held_write_is_dropped_when_the_ip_reverts():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    clock = ManualClock()
+    dampener = WriteDampener(min_stable=60, clock=clock)
+    reverted: float = WRITES_SUPPRESSED.value("reverted")
+    coalesced: float = WRITES_SUPPRESSED.value("coalesced")
+
+    assert dampener.hold(DNSRecord(ip=BACKUP, name="home.example.com"), PRIMARY, logger) == 60
+    clock.current = 20
+    assert dampener.hold(DNSRecord(ip=IPv4Address("192.0.2.4"), name="home.example.com"), PRIMARY, logger) == 60
+    assert dampener.next_write() == 60
+    clock.current = 40
+    assert dampener.hold(DNSRecord(ip=PRIMARY, name="home.example.com"), PRIMARY, logger) is None
+    assert dampener.next_write() is None
+
+    assert WRITES_SUPPRESSED.value("coalesced") == coalesced + 1
+    assert WRITES_SUPPRESSED.value("reverted") == reverted + 1
+
+def test_an_ip_observed_before_a_restart_counts_towards_stability():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    clock = ManualClock()
+    clock.current = 1000
+    dampener = WriteDampener(min_stable=60, clock=clock)
+    dampener.resume(BACKUP, observed_for=45)
+
+    assert dampener.hold(DNSRecord(ip=BACKUP, name="home.example.com"), PRIMARY, logger) == 15
+    # Another IP starts over
+    assert dampener.hold(DNSRecord(ip=IPv4Address("192.0.2.4"), name="home.example.com"), PRIMARY, logger) == 60
@@ -0,0 +1,129 @@
+import asyncio
+import contextlib
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from src.infra.clock import Clock, SystemClock
+from src.infra.lease.interface import LeaseBackend
+from src.infra.loggers.interface import Logger
+from src.infra.metrics.instruments import LEADER, LEADER_CHANGES, LEASE_CALL_DURATION
+
+T = TypeVar("T")
+
+class LeaderElector:
+    """
+    Competes for a lease with the other replicas, so that only one of them (the leader) polls and writes.
+
+    Every `renew_interval` seconds, the leader extends the lease and followers try to take it. A leader
+    that cannot renew steps down before its lease expires, and a follower takes the lease over once it
+    expires: a dead leader is replaced within one `lease_duration` (plus one `renew_interval`).
+
+    Arguments:
+        backend (LeaseBackend): Where the lease is kept.
+        holder (str): Name of this replica, unique among them.
+        lease_duration (float): Seconds a lease lasts without being renewed.
+        renew_interval (Optional[float]): Seconds between attempts. A third of `lease_duration` by default.
+    """
+    _backend: LeaseBackend
+    _holder: str
+    _lease_duration: float
+    _renew_interval: float
+    _clock: Clock
+    _valid_until: float
+    _leading: asyncio.Event
+    _following: asyncio.Event
+
+    def __init__(self, backend: LeaseBackend, holder: str, lease_duration: float = 15, renew_interval: Optional[float] = None, clock: Optional[Clock] = None):
+        self._backend = backend
+        self._holder = holder
+        self._lease_duration = lease_duration
+        self._renew_interval = renew_interval if renew_interval is not None else lease_duration / 3
+        self._clock = clock if clock is not None else SystemClock()
+        self._valid_until = 0
+        self._leading = asyncio.Event()
+        self._following = asyncio.Event()
+        self._following.set()
+        LEADER.set(0)
+
+    @property
+    def holder(self) -> str:
+        return self._holder
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leading.is_set() and self._clock.now() < self._valid_until
+
+    async def run(self, logger: Logger):
+        """Competes for the lease until cancelled, then releases it if held."""
+        try:
+            while True:
+                await self.step(logger)
+                await self._clock.sleep(self._renew_interval)
+        finally:
+            if self._leading.is_set():
+                self._set_leading(False, logger)
+                await self._backend.release(self._holder, logger)
+
+    async def step(self, logger: Logger) -> bool:
+        """Makes one attempt to take or renew the lease. Returns whether this replica leads afterwards."""
+        operation: str = "renew" if self._leading.is_set() else "acquire"
+        # The lease is counted from before the attempt, so this replica never believes it lasts longer than it does
+        attempted_at: float = self._clock.now()
+        started: float = time.perf_counter()
+        try:
+            acquired: bool = await asyncio.wait_for(self._backend.acquire(self._holder, self._lease_duration, logger), timeout=self._renew_interval)
+        except asyncio.TimeoutError:
+            logger.warning("The lease backend did not answer within %.1fs", self._renew_interval)
+            acquired = False
+        LEASE_CALL_DURATION.observe(time.perf_counter() - started, operation)
+
+        if acquired:
+            self._valid_until = attempted_at + self._lease_duration
+            self._set_leading(True, logger)
+        elif self._leading.is_set() and self._clock.now() + self._renew_interval >= self._valid_until:
+            # The next attempt would come too late: step down while the lease still protects the last writes
+            self._set_leading(False, logger)
+        elif self._leading.is_set():
+            logger.warning("Could not renew the lease. Still leading until %.0f", self._valid_until)
+        return self.is_leader
+
+    async def wait_for_leadership(self):
+        await self._leading.wait()
+
+    async def wait_for_loss(self):
+        await self._following.wait()
+
+    def _set_leading(self, leading: bool, logger: Logger):
+        if leading == self._leading.is_set():
+            return
+        if leading:
+            self._leading.set()
+            self._following.clear()
+            logger.info("%s took the lease and now leads", self._holder)
+        else:
+            self._leading.clear()
+            self._following.set()
+            logger.warning("%s lost the lease and now follows", self._holder)
+        LEADER.set(1 if leading else 0)
+        LEADER_CHANGES.inc("acquired" if leading else "lost")
+
+async def run_as_leader(elector: LeaderElector, run: Callable[[], Awaitable[T]], logger: Logger) -> T:
+    """
+    Runs `run` whenever elector leads, cancelling it as soon as leadership is lost. Followers only wait.
+    Returns once `run` itself returns.
+    """
+    while True:
+        await elector.wait_for_leadership()
+        task: asyncio.Task[T] = asyncio.ensure_future(run())
+        lost: asyncio.Task[None] = asyncio.create_task(elector.wait_for_loss())
+        try:
+            await asyncio.wait({task, lost}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            lost.cancel()
+            if not task.done():
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+        if task.done() and not task.cancelled():
+            return task.result()
+        logger.info("Refreshes stopped until %s leads again", elector.holder)
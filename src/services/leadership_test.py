@@ -0,0 +1,61 @@
+import asyncio
+
+from src.infra.clock import ManualClock
+from src.infra.lease.sqlite import SqliteLease
+from src.infra.loggers.standard import Logger, StandardLogger, LogLevel
+from src.infra.metrics.instruments import LEADER_CHANGES
+from src.services.leadership import LeaderElector, run_as_leader
+
+def test_follower_takes_over_within_one_lease(tmp_path):
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    clock = ManualClock()
+    path: str = str(tmp_path / "lease.db")
+    leader = LeaderElector(SqliteLease(path, clock=clock), "a", lease_duration=15, clock=clock)
+    follower = LeaderElector(SqliteLease(path, clock=clock), "b", lease_duration=15, clock=clock)
+    acquired: float = LEADER_CHANGES.value("acquired")
+
+    async def run() -> float:
+        assert await leader.step(logger)
+        assert not await follower.step(logger)
+        # The leader dies at 5s: the follower keeps trying every renew interval
+        clock.current = 5
+        while not await follower.step(logger):
+            clock.current += 5
+        return clock.current
+
+    took_over_at: float = asyncio.run(run())
+
+    assert 15 <= took_over_at <= 5 + 15
+    assert not leader.is_leader
+    assert LEADER_CHANGES.value("acquired") == acquired + 2
+
+def test_refreshes_only_run_while_leading(tmp_path):
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    clock = ManualClock()
+    path: str = str(tmp_path / "lease.db")
+    elector = LeaderElector(SqliteLease(path, clock=clock), "a", lease_duration=15, clock=clock)
+    rival = SqliteLease(path, clock=clock)
+    ticks: list[float] = []
+
+    async def refresh_loop():
+        while True:
+            ticks.append(clock.now())
+            await asyncio.sleep(0)
+
+    async def run():
+        await elector.step(logger)
+        leading = asyncio.create_task(run_as_leader(elector, refresh_loop, logger))
+        await asyncio.sleep(0.01)
+        # The leader was paused past its lease, which another replica took over
+        clock.current = 16
+        await rival.acquire("b", 15, logger)
+        await elector.step(logger)
+        await asyncio.sleep(0.01)
+        stopped_at: int = len(ticks)
+        await asyncio.sleep(0.01)
+        leading.cancel()
+        return stopped_at
+
+    stopped_at: int = asyncio.run(run())
+    assert ticks and len(ticks) == stopped_at
+    assert not elector.is_leader
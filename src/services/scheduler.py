@@ -0,0 +1,110 @@
+import random
+from typing import Optional
+from pydantic import BaseModel, Field, ConfigDict
+
+from src.domain.value_objects import RefreshOutcome, RefreshStatus
+from src.infra.clock import Clock, SystemClock
+
+class ScheduleDecision(BaseModel):
+    """When the next refresh will run, and why."""
+    model_config = ConfigDict(frozen=True)
+
+    delay: float = Field(..., ge=0, description="Seconds until the next run")
+    run_at: float = Field(..., description="Time of the next run, in seconds since the epoch")
+    reason: str = Field(..., description="Why this delay was chosen")
+
+class RefreshScheduler:
+    """
+    Decides how long to wait before the next refresh, depending on what the previous one observed.
+
+    - **Failures** back off exponentially, using decorrelated jitter, up to `max_backoff`.
+    - **Rate limiting** waits at least as long as the nameserver asked to (`Retry-After`), backing off as any failure.
+    - **Deferred writes** (dampening) run again as soon as the write may go, without backing off.
+    - **Changes** start a fast-follow period of `fast_follow_duration` seconds, polling every `fast_interval`
+      seconds so the settling of the change is seen quickly.
+    - **No change** polls every `interval` seconds, relaxing to `idle_interval` once nothing changed for `relax_after` seconds.
+
+    Every delay is spread by a random `jitter` fraction, so a fleet of instances started together never
+    synchronises into bursts against the API.
+    """
+    _interval: float
+    _idle_interval: float
+    _fast_interval: float
+    _fast_follow_duration: float
+    _relax_after: float
+    _min_backoff: float
+    _max_backoff: float
+    _jitter: float
+    _clock: Clock
+    _random: random.Random
+    _backoff: float
+    _consecutive_failures: int
+    _fast_follow_until: float
+    _last_change: float
+    _last_decision: Optional[ScheduleDecision]
+
+    def __init__(self, interval: float, idle_interval: Optional[float] = None, fast_interval: Optional[float] = None,
+                 fast_follow_duration: float = 120, relax_after: float = 3600, min_backoff: Optional[float] = None,
+                 max_backoff: float = 900, jitter: float = 0.1, clock: Optional[Clock] = None, rng: Optional[random.Random] = None):
+        self._interval = interval
+        self._idle_interval = idle_interval if idle_interval is not None else interval * 4
+        self._fast_interval = fast_interval if fast_interval is not None else min(interval, 15)
+        self._fast_follow_duration = fast_follow_duration
+        self._relax_after = relax_after
+        self._min_backoff = min_backoff if min_backoff is not None else min(interval, 5)
+        self._max_backoff = max(max_backoff, self._min_backoff)
+        self._jitter = jitter
+        self._clock = clock if clock is not None else SystemClock()
+        self._random = rng if rng is not None else random.Random()
+        self._backoff = self._min_backoff
+        self._consecutive_failures = 0
+        self._fast_follow_until = 0
+        self._last_change = self._clock.now()
+        self._last_decision = None
+
+    @property
+    def last_decision(self) -> Optional[ScheduleDecision]:
+        return self._last_decision
+
+    def initial_delay(self) -> ScheduleDecision:
+        """Random delay before the first run, so instances deployed together do not poll in lockstep."""
+        return self._decide(self._random.uniform(0, self._interval * self._jitter), "initial spread")
+
+    def next_run(self, outcome: RefreshOutcome) -> ScheduleDecision:
+        now: float = self._clock.now()
+
+        if outcome.status in (RefreshStatus.FAILED, RefreshStatus.RATE_LIMITED):
+            self._consecutive_failures += 1
+            # Decorrelated jitter: uniformly between the minimum and three times the previous backoff
+            self._backoff = min(self._max_backoff, self._random.uniform(self._min_backoff, self._backoff * 3))
+            if outcome.status == RefreshStatus.RATE_LIMITED and outcome.retry_after is not None:
+                retry_after: float = outcome.retry_after * (1 + self._random.uniform(0, self._jitter))
+                if retry_after >= self._backoff:
+                    return self._decide(retry_after, f"rate limited, retry after {outcome.retry_after:.1f}s")
+            return self._decide(self._backoff, f"backoff after {self._consecutive_failures} consecutive failure(s)")
+
+        self._consecutive_failures = 0
+        self._backoff = self._min_backoff
+
+        if outcome.status == RefreshStatus.DEFERRED and outcome.retry_after is not None:
+            # Jitter only delays, so the write is never attempted before it may go
+            delay: float = min(outcome.retry_after * (1 + self._random.uniform(0, self._jitter)), self._spread(self._interval))
+            return self._decide(delay, f"write deferred by {outcome.retry_after:.1f}s")
+
+        if outcome.status == RefreshStatus.CHANGED:
+            self._last_change = now
+            self._fast_follow_until = now + self._fast_follow_duration
+            return self._decide(self._spread(self._fast_interval), "fast-follow after a change")
+
+        if now < self._fast_follow_until:
+            return self._decide(self._spread(self._fast_interval), "fast-follow after a change")
+        if now - self._last_change >= self._relax_after:
+            return self._decide(self._spread(self._idle_interval), f"idle, no change for {now - self._last_change:.0f}s")
+        return self._decide(self._spread(self._interval), "steady")
+
+    def _spread(self, delay: float) -> float:
+        return delay * self._random.uniform(1 - self._jitter, 1 + self._jitter)
+
+    def _decide(self, delay: float, reason: str) -> ScheduleDecision:
+        self._last_decision = ScheduleDecision(delay=delay, run_at=self._clock.now() + delay, reason=reason)
+        return self._last_decision
@@ -0,0 +1,60 @@
+import random
+
+from src.domain.value_objects import RefreshOutcome, RefreshStatus
+from src.infra.clock import ManualClock
+from src.services.scheduler import RefreshScheduler
+
+UNCHANGED = RefreshOutcome(status=RefreshStatus.UNCHANGED)
+CHANGED = RefreshOutcome(status=RefreshStatus.CHANGED)
+FAILED = RefreshOutcome(status=RefreshStatus.FAILED)
+
+def _scheduler(clock: ManualClock, seed: int = 0) -> RefreshScheduler:
+    return RefreshScheduler(interval=60, idle_interval=600, fast_interval=5, fast_follow_duration=30,
+                            relax_after=3600, min_backoff=5, max_backoff=300, jitter=0.1, clock=clock, rng=random.Random(seed))
+
+def test_fast_follow_then_steady_then_idle():
+    clock = ManualClock()
+    scheduler = _scheduler(clock)
+
+    decision = scheduler.next_run(CHANGED)
+    assert 4.5 <= decision.delay <= 5.5 and decision.reason == "fast-follow after a change"
+    assert decision.run_at == clock.now() + decision.delay
+
+    clock.current = 20
+    assert scheduler.next_run(UNCHANGED).reason == "fast-follow after a change"
+    clock.current = 40
+    decision = scheduler.next_run(UNCHANGED)
+    assert 54 <= decision.delay <= 66 and decision.reason == "steady"
+    clock.current = 3700
+    decision = scheduler.next_run(UNCHANGED)
+    assert 540 <= decision.delay <= 660 and decision.reason.startswith("idle")
+
+def test_failures_back_off_up_to_the_maximum_and_reset():
+    clock = ManualClock()
+    scheduler = _scheduler(clock)
+
+    delays: list[float] = [scheduler.next_run(FAILED).delay for _ in range(20)]
+    assert all(5 <= delay <= 300 for delay in delays)
+    assert max(delays[10:]) > 60
+    assert scheduler.next_run(UNCHANGED).reason == "steady"
+
+def test_rate_limit_is_honoured():
+    scheduler = _scheduler(ManualClock())
+    decision = scheduler.next_run(RefreshOutcome(status=RefreshStatus.RATE_LIMITED, retry_after=120))
+    assert 120 <= decision.delay <= 132
+    assert decision.reason.startswith("rate limited")
+
+def test_instances_do_not_synchronise():
+    clock = ManualClock()
+    schedulers = [_scheduler(clock, seed) for seed in range(50)]
+    delays = {round(scheduler.next_run(UNCHANGED).delay, 3) for scheduler in schedulers}
+    assert len(delays) == 50
+
+def test_deferred_write_runs_again_when_it_may_go():
+    clock = ManualClock()
+    scheduler = _scheduler(clock)
+
+    scheduler.next_run(FAILED)
+    decision = scheduler.next_run(RefreshOutcome(status=RefreshStatus.DEFERRED, retry_after=20))
+    assert 20 <= decision.delay <= 22 and decision.reason.startswith("write deferred")
+    assert scheduler.next_run(UNCHANGED).reason == "steady"
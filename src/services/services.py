@@ -1,11 +1,15 @@
+import asyncio
+import time
 from ipaddress import IPv4Address
 from typing import Optional
 
-from src.domain.value_objects import DNSRecord
+from src.domain.value_objects import AnyIPAddress, DNSRecord, RecordType, ReconciliationResult, RefreshOutcome, RefreshStatus
 
-from src.infra.ip.interface import ExternalIpInterface
-from src.infra.nameserver.interface import NameserverInterface
+from src.infra.ip.interface import ExternalIpInterface, AsyncExternalIpInterface
+from src.infra.nameserver.interface import NameserverInterface, AsyncNameserverInterface
 from src.infra.loggers.interface import Logger
+from src.infra.state.interface import StateStore
+from src.services.dampening import WriteDampener
 
 def refresh_service(external_ip_service: ExternalIpInterface, nameserver: NameserverInterface, domain_name: str, logger: Logger):
     """
@@ -46,8 +50,254 @@ def refresh_service(external_ip_service: ExternalIpInterface, nameserver: Namese
         return
     
     if external_ip != current_dns_record.ip:
-        nameserver.set_record(dns_record=DNSRecord(ip=external_ip, name=domain_name), logger=logger)
-        logger.info(f"External IP changed. Successfully changed the content of the DNS Record {current_dns_record.name} to {external_ip}")
+        if not nameserver.set_record(dns_record=DNSRecord(ip=external_ip, name=domain_name), logger=logger):
+            logger.critical("External IP changed, but the DNS Record %s could not be updated to %s", current_dns_record.name, external_ip)
+            return
+        logger.info("External IP changed. Successfully changed the content of the DNS Record %s to %s", current_dns_record.name, external_ip)
         return
     
     logger.debug("Refresh service ran. No external IP change detected.")
+
+def reconcile_service(external_ip_service: ExternalIpInterface, nameserver: NameserverInterface, domain_names: list[str], logger: Logger) -> Optional[ReconciliationResult]:
+    """
+    Points every domain in `domain_names` to the current external IP address, writing only the records that changed.
+
+    Unlike `refresh_service`, which looks up and writes one record at a time, this function hands the whole
+    set of desired records to `nameserver.reconcile`, so nameservers able to list a zone and write in batches
+    keep the number of API calls per run roughly constant as the number of domains grows.
+
+    Arguments:
+        external_ip_service (ExternalIpInterface): Service used to retrieve the current external IP address.
+        nameserver (NameserverInterface): Service used to manage the DNS records of the zone.
+        domain_names (list[str]): The domain names whose DNS records should point to the external IP.
+        logger (Logger): Logger instance for recording operations and errors.
+
+    Returns:
+        Optional[ReconciliationResult]: What was created, updated, left unchanged or failed. None if the
+        external IP or the current records could not be obtained.
+    """
+
+    external_ip: Optional[IPv4Address] = external_ip_service.get_ip(logger)
+    if external_ip is None:
+        logger.critical("Could not obtain a valid IP address from the External IP Service")
+        return None
+
+    desired_records: list[DNSRecord] = [DNSRecord(ip=external_ip, name=domain_name) for domain_name in domain_names]
+    result: Optional[ReconciliationResult] = nameserver.reconcile(dns_records=desired_records, logger=logger)
+    if result is None:
+        logger.critical("Could not reconcile the DNS records")
+        return None
+
+    if result.failed:
+        logger.error("Failed to write %s DNS Records: %s", len(result.failed), [dns_record.name for dns_record in result.failed])
+    if result.created or result.updated:
+        logger.info("External IP changed. Pointed %s DNS Records to %s", len(result.created) + len(result.updated), external_ip)
+    elif not result.failed:
+        logger.debug("Reconcile service ran. No external IP change detected.")
+    return result
+
+async def async_refresh_service(external_ip_service: AsyncExternalIpInterface, nameserver: AsyncNameserverInterface, domain_name: str, logger: Logger, state: Optional[StateStore] = None,
+                                dampener: Optional[WriteDampener] = None, ipv6_service: Optional[AsyncExternalIpInterface] = None) -> RefreshOutcome:
+    """
+    Non-blocking variant of `refresh_service`.
+
+    The external IP and the current DNS record are independent, so both are fetched concurrently:
+    a run takes as long as the slowest of the two lookups instead of their sum, and the event loop
+    remains free to run other work while waiting for the network.\n
+    With `ipv6_service`, the A and AAAA records are refreshed concurrently, each on its own: an IPv6
+    failure does not hold back the IPv4 update.
+
+    Arguments:
+        external_ip_service (AsyncExternalIpInterface): Service used to retrieve the current external IPv4 address.
+        nameserver (AsyncNameserverInterface): Service used to manage DNS records for the domain.
+        domain_name (str): The domain name whose DNS record should be updated if needed.
+        logger (Logger): Logger instance for recording operations and errors.
+        state (Optional[StateStore]): Where the observed external IP is saved, if anywhere.
+        dampener (Optional[WriteDampener]): Holds back the writes of an unstable external IP, if set.
+        ipv6_service (Optional[AsyncExternalIpInterface]): Service used to retrieve the current external IPv6
+            address, for dual-stack hosts. Only the A record is refreshed when None.
+
+    Returns:
+        RefreshOutcome: Whether the records were unchanged, changed, deferred, or the run failed or was rate limited.
+        Dual-stack, the outcomes of both records are merged, see `merge_outcomes`.
+    """
+    families: dict[RecordType, AsyncExternalIpInterface] = {RecordType.A: external_ip_service}
+    if ipv6_service is not None:
+        families[RecordType.AAAA] = ipv6_service
+    outcomes: list[RefreshOutcome | BaseException] = await asyncio.gather(
+        *(async_refresh_record(ip_service, nameserver, domain_name, record_type, logger, state, dampener) for record_type, ip_service in families.items()),
+        return_exceptions=True)
+
+    merged: list[RefreshOutcome] = []
+    for record_type, outcome in zip(families, outcomes):
+        if isinstance(outcome, asyncio.CancelledError):
+            raise outcome
+        if isinstance(outcome, BaseException):
+            logger.error("Unexpected error during the refresh of the %s record of %s: %r", record_type.value, domain_name, outcome)
+            outcome = RefreshOutcome(status=RefreshStatus.FAILED)
+        merged.append(outcome)
+    return merge_outcomes(merged)
+
+async def async_refresh_record(external_ip_service: AsyncExternalIpInterface, nameserver: AsyncNameserverInterface, domain_name: str, record_type: RecordType, logger: Logger,
+                               state: Optional[StateStore] = None, dampener: Optional[WriteDampener] = None) -> RefreshOutcome:
+    """
+    Refreshes the record of domain_name of a single address family, see `async_refresh_service`.
+
+    Arguments:
+        external_ip_service (AsyncExternalIpInterface): Answers addresses of the family of record_type.
+        record_type (RecordType): A or AAAA.
+    """
+    external_ip, current_dns_record = await asyncio.gather(
+        external_ip_service.get_ip(logger),
+        nameserver.get_record_by_name(name=domain_name, logger=logger, record_type=record_type))
+    if external_ip is None:
+        logger.critical("Could not obtain a valid %s address from the External IP Service", record_type.value)
+        return failure_outcome(nameserver)
+    if RecordType.of(external_ip) != record_type:
+        logger.critical("The External IP Service answered %s, which does not fit a %s record", external_ip, record_type.value)
+        return failure_outcome(nameserver)
+    save_external_ip(state, external_ip)
+
+    if current_dns_record is None:
+        logger.critical("Could not obtain the current %s DNS record", record_type.value)
+        return failure_outcome(nameserver)
+
+    desired_record: DNSRecord = DNSRecord(ip=external_ip, name=domain_name, type=record_type)
+    if dampener is not None:
+        wait: Optional[float] = dampener.hold(desired_record, current_dns_record.ip, logger)
+        if wait is not None:
+            return RefreshOutcome(status=RefreshStatus.DEFERRED, retry_after=wait)
+
+    if external_ip != current_dns_record.ip:
+        if not await nameserver.set_record(dns_record=desired_record, logger=logger):
+            logger.critical("External IP changed, but the DNS Record %s could not be updated to %s", current_dns_record.name, external_ip)
+            return failure_outcome(nameserver)
+        if dampener is not None:
+            dampener.written(desired_record)
+        logger.info("External IP changed. Successfully changed the content of the DNS Record %s to %s", current_dns_record.name, external_ip)
+        return RefreshOutcome(status=RefreshStatus.CHANGED)
+
+    logger.debug("Refresh service ran. No external IP change detected.")
+    return RefreshOutcome(status=RefreshStatus.UNCHANGED)
+
+def merge_outcomes(outcomes: list[RefreshOutcome]) -> RefreshOutcome:
+    """
+    A single outcome for the records of a domain refreshed together (A and AAAA). The most urgent wins:
+    rate limited, failed, deferred (retried when the first held write may go), changed, then unchanged.
+    """
+    for status in (RefreshStatus.RATE_LIMITED, RefreshStatus.FAILED, RefreshStatus.DEFERRED):
+        matching: list[RefreshOutcome] = [outcome for outcome in outcomes if outcome.status == status]
+        if matching:
+            retry_afters: list[float] = [outcome.retry_after for outcome in matching if outcome.retry_after is not None]
+            if status == RefreshStatus.RATE_LIMITED:
+                return RefreshOutcome(status=status, retry_after=max(retry_afters) if retry_afters else None)
+            return RefreshOutcome(status=status, retry_after=min(retry_afters) if retry_afters else None)
+    if any(outcome.status == RefreshStatus.CHANGED for outcome in outcomes):
+        return RefreshOutcome(status=RefreshStatus.CHANGED)
+    return RefreshOutcome(status=RefreshStatus.UNCHANGED)
+
+async def async_reconcile_service(external_ip_service: AsyncExternalIpInterface, nameserver: AsyncNameserverInterface, domain_names: list[str], logger: Logger, state: Optional[StateStore] = None,
+                                  dampener: Optional[WriteDampener] = None, ipv6_service: Optional[AsyncExternalIpInterface] = None) -> Optional[ReconciliationResult]:
+    """
+    Non-blocking variant of `reconcile_service`.
+
+    With `ipv6_service`, both external IPs are looked up concurrently, and the A and AAAA records are
+    reconciled together, in a single call to the nameserver. The records of a family whose IP could not
+    be obtained are left as they are, without holding back the other family.
+
+    Arguments:
+        external_ip_service (AsyncExternalIpInterface): Service used to retrieve the current external IP address.
+        nameserver (AsyncNameserverInterface): Service used to manage the DNS records of the zone.
+        domain_names (list[str]): The domain names whose DNS records should point to the external IP.
+        logger (Logger): Logger instance for recording operations and errors.
+        state (Optional[StateStore]): Where the observed external IP is saved, if anywhere.
+        dampener (Optional[WriteDampener]): Holds back the writes of an unstable external IP, if set. The
+            records held back are not handed to the nameserver, and are reported as deferred.
+        ipv6_service (Optional[AsyncExternalIpInterface]): Service used to retrieve the current external IPv6
+            address, for dual-stack hosts. Only the A records are reconciled when None.
+
+    Returns:
+        Optional[ReconciliationResult]: What was created, updated, left unchanged, failed or deferred. None if
+        no external IP or the current records could not be obtained.
+    """
+    families: dict[RecordType, AsyncExternalIpInterface] = {RecordType.A: external_ip_service}
+    if ipv6_service is not None:
+        families[RecordType.AAAA] = ipv6_service
+    lookups: list[Optional[AnyIPAddress] | BaseException] = await asyncio.gather(
+        *(ip_service.get_ip(logger) for ip_service in families.values()), return_exceptions=True)
+
+    external_ips: list[AnyIPAddress] = []
+    for record_type, external_ip in zip(families, lookups):
+        if isinstance(external_ip, asyncio.CancelledError):
+            raise external_ip
+        if isinstance(external_ip, BaseException):
+            logger.error("Unexpected error during the lookup of the external %s address: %r", record_type.value, external_ip)
+        elif external_ip is None or RecordType.of(external_ip) != record_type:
+            logger.critical("Could not obtain a valid %s address from the External IP Service", record_type.value)
+        else:
+            external_ips.append(external_ip)
+    if not external_ips:
+        return None
+    for external_ip in external_ips:
+        save_external_ip(state, external_ip)
+    return await async_reconcile_records(external_ips, nameserver, domain_names, logger, dampener)
+
+async def async_reconcile_records(external_ips: list[AnyIPAddress], nameserver: AsyncNameserverInterface, domain_names: list[str], logger: Logger,
+                                  dampener: Optional[WriteDampener] = None) -> Optional[ReconciliationResult]:
+    """
+    Points the records of domain_names to external_ips (one record per address), once they are known, see
+    `async_reconcile_service`. Missing records are created, and records the providers disagree on are repaired.
+
+    Returns:
+        Optional[ReconciliationResult]: What was created, updated, left unchanged, failed or deferred. None if
+        the current records could not be obtained.
+    """
+    desired_records: list[DNSRecord] = [DNSRecord(ip=external_ip, name=domain_name) for external_ip in external_ips for domain_name in domain_names]
+    deferred: list[DNSRecord] = []
+    if dampener is not None:
+        # The nameserver's records are only known once reconciled: the dampener compares with the last ones it saw
+        deferred = [dns_record for dns_record in desired_records if dampener.hold(dns_record, None, logger) is not None]
+        desired_records = [dns_record for dns_record in desired_records if dns_record not in deferred]
+
+    result: Optional[ReconciliationResult] = ReconciliationResult()
+    if desired_records:
+        result = await nameserver.reconcile(dns_records=desired_records, logger=logger)
+    if result is None:
+        logger.critical("Could not reconcile the DNS records")
+        return None
+    if dampener is not None:
+        for dns_record in result.created + result.updated:
+            dampener.written(dns_record)
+        for dns_record in result.unchanged:
+            dampener.learn(dns_record)
+        result = result.model_copy(update={"deferred": deferred})
+
+    if result.failed:
+        logger.error("Failed to write %s DNS Records: %s", len(result.failed), [dns_record.name for dns_record in result.failed])
+    if result.created or result.updated:
+        logger.info("External IP changed. Pointed %s DNS Records to %s", len(result.created) + len(result.updated), ", ".join(map(str, external_ips)))
+    elif not result.failed:
+        logger.debug("Reconcile service ran. No external IP change detected.")
+    return result
+
+def save_external_ip(state: Optional[StateStore], external_ip: AnyIPAddress):
+    """Saved per family: on a dual-stack host the IPv4 and IPv6 addresses are kept side by side."""
+    if state is not None:
+        state.save_external_ip(external_ip, observed_at=time.time())
+
+def reconciliation_outcome(result: Optional[ReconciliationResult], nameserver: AsyncNameserverInterface, dampener: Optional[WriteDampener] = None) -> RefreshOutcome:
+    """Summarizes the result of `async_reconcile_service` as a `RefreshOutcome`."""
+    if result is None or result.failed:
+        return failure_outcome(nameserver)
+    if result.created or result.updated:
+        return RefreshOutcome(status=RefreshStatus.CHANGED)
+    if result.deferred and dampener is not None:
+        return RefreshOutcome(status=RefreshStatus.DEFERRED, retry_after=dampener.next_write())
+    return RefreshOutcome(status=RefreshStatus.UNCHANGED)
+
+def failure_outcome(nameserver: AsyncNameserverInterface) -> RefreshOutcome:
+    """Outcome of a failed run, distinguishing the failures caused by the nameserver's rate limiting."""
+    retry_after: Optional[float] = nameserver.retry_after()
+    if retry_after is not None:
+        return RefreshOutcome(status=RefreshStatus.RATE_LIMITED, retry_after=retry_after)
+    return RefreshOutcome(status=RefreshStatus.FAILED)
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+from ipaddress import IPv4Address, IPv6Address
+from typing import Optional
+
+from src.domain.value_objects import DNSRecord, RefreshOutcome, RefreshStatus, ReconciliationResult
+from src.infra.http import create_async_client
+from src.infra.nameserver.cloudflare.cloudflare_async import AsyncCloudflareNameserver
+from src.infra.nameserver.interface import NameserverInterface
+from src.infra.loggers.standard import Logger, StandardLogger, LogLevel
+from src.infra.ip.interface import ExternalIpInterface
+from src.infra.ip.ipify import AsyncIpify
+from src.services.services import async_reconcile_service, async_refresh_service, reconcile_service
+from src.benchmarks.fakes import IPIFY6_HOST, FakeCloudflareApi, FakeIpify, fake_transport
+
+class StaticIp(ExternalIpInterface):
+    def __init__(self, ip: IPv4Address):
+        self.ip = ip
+
+    def get_ip(self, logger: Logger) -> Optional[IPv4Address]:
+        return self.ip
+
+class InMemoryNameserver(NameserverInterface):
+    """Relies on the default, record by record, `reconcile`."""
+    def __init__(self, *dns_records: DNSRecord, rejected: tuple[str, ...] = ()):
+        self.records = list(dns_records)
+        self.rejected = rejected
+
+    def get_record_by_ip(self, ip: IPv4Address, logger: Logger) -> Optional[DNSRecord]:
+        return next((dns_record for dns_record in self.records if dns_record.ip == ip), None)
+
+    def get_record_by_name(self, name: str, logger: Logger) -> Optional[DNSRecord]:
+        return next((dns_record for dns_record in self.records if dns_record.name == name), None)
+
+    def set_record(self, dns_record: DNSRecord, logger: Logger) -> bool:
+        if dns_record.name in self.rejected:
+            return False
+        self.records = [current for current in self.records if current.name != dns_record.name] + [dns_record]
+        return True
+
+def test_reconcile_logs_the_external_ip(caplog):
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    nameserver = InMemoryNameserver(DNSRecord(ip=IPv4Address("198.51.100.1"), name="home.example.com"))
+
+    with caplog.at_level(logging.INFO):
+        result = reconcile_service(StaticIp(IPv4Address("198.51.100.7")), nameserver, ["home.example.com", "nas.example.com"], logger)
+
+    assert result is not None and len(result.updated) == 1 and len(result.created) == 1
+    assert "External IP changed. Pointed 2 DNS Records to 198.51.100.7" in caplog.messages
+
+def test_rejected_writes_are_reported_as_failed():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    nameserver = InMemoryNameserver(DNSRecord(ip=IPv4Address("198.51.100.1"), name="home.example.com"), rejected=("home.example.com", "new.example.com"))
+
+    result = reconcile_service(StaticIp(IPv4Address("198.51.100.7")), nameserver, ["home.example.com", "new.example.com", "nas.example.com"], logger)
+
+    assert result is not None
+    assert [dns_record.name for dns_record in result.failed] == ["home.example.com", "new.example.com"]
+    assert [dns_record.name for dns_record in result.created] == ["nas.example.com"] and not result.updated
+
+def test_dual_stack_records_are_reconciled_from_a_single_listing(caplog):
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    cloudflare = FakeCloudflareApi()
+    cloudflare.add_record("home.example.com", "198.51.100.1")
+    cloudflare.add_record("home.example.com", "2001:db8::1", type="AAAA")
+    cloudflare.add_record("nas.example.com", "198.51.100.1")
+    ipify = FakeIpify(ip=IPv4Address("198.51.100.7"))
+    ipify6 = FakeIpify(ip=IPv6Address("2001:db8::7"), host=IPIFY6_HOST)
+
+    async def run() -> Optional[ReconciliationResult]:
+        async with create_async_client(transport=fake_transport(cloudflare, ipify, ipify6)) as client:
+            nameserver = AsyncCloudflareNameserver(cloudflare_api_key="key", cloudflare_zone_id=cloudflare.zone_id, client=client)
+            return await async_reconcile_service(AsyncIpify(client=client), nameserver, ["home.example.com", "nas.example.com"], logger,
+                                                 ipv6_service=AsyncIpify(client=client, version=6))
+
+    with caplog.at_level(logging.INFO):
+        result = asyncio.run(run())
+
+    assert result is not None
+    assert len(result.updated) == 3 and len(result.created) == 1
+    assert "External IP changed. Pointed 4 DNS Records to 198.51.100.7, 2001:db8::7" in caplog.messages
+    assert cloudflare.calls["GET records"] == 1
+    assert cloudflare.content_of("home.example.com", "AAAA") == "2001:db8::7"
+    assert cloudflare.content_of("nas.example.com", "AAAA") == "2001:db8::7"
+    assert cloudflare.content_of("nas.example.com") == "198.51.100.7"
+
+def test_ipv6_failure_does_not_hold_back_the_ipv4_update():
+    logger: Logger = StandardLogger(LogLevel.INFO)
+    cloudflare = FakeCloudflareApi()
+    cloudflare.add_record("home.example.com", "198.51.100.1")
+    cloudflare.add_record("home.example.com", "2001:db8::1", type="AAAA")
+    # No stand-in for api6.ipify.org: the IPv6 lookup fails
+    ipify = FakeIpify(ip=IPv4Address("198.51.100.7"))
+
+    async def run() -> RefreshOutcome:
+        async with create_async_client(transport=fake_transport(cloudflare, ipify)) as client:
+            nameserver = AsyncCloudflareNameserver(cloudflare_api_key="key", cloudflare_zone_id=cloudflare.zone_id, client=client)
+            return await async_refresh_service(AsyncIpify(client=client), nameserver, "home.example.com", logger,
+                                               ipv6_service=AsyncIpify(client=client, version=6))
+
+    outcome = asyncio.run(run())
+
+    assert outcome.status == RefreshStatus.FAILED
+    assert cloudflare.content_of("home.example.com") == "198.51.100.7"
+    assert cloudflare.content_of("home.example.com", "AAAA") == "2001:db8::1"